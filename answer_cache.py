@@ -0,0 +1,176 @@
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from collections import OrderedDict
+from fast_path import slot_keys
+import numpy as np
+import pickle
+import re
+import threading
+import time
+import os
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip('?.!; ')
+
+
+class AnswerCache:
+    """
+    Question -> agent answer cache placed in front of ai.call_agent_executor.
+
+    Lookups first try the exact normalized question, then the most similar
+    cached question by embedding (cosine similarity >= threshold) that has
+    the same dates, account numbers and numbers (embeddings barely tell
+    "in 2021" from "in 2022"). Entries are
+    evicted least-recently-used once max_entries is reached and expire after
+    ttl seconds. When persist_path is set the cache, including the question
+    embeddings, is pickled there after every change and reloaded on start.
+    """
+
+    def __init__(self, get_embedding=None, max_entries=500, ttl=3600, threshold=0.95, persist_path=None):
+        self.get_embedding = get_embedding
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.persist_path = persist_path
+        self._lock = threading.RLock()
+        # key -> {"question", "answer", "created", "vector"}, oldest first
+        self._entries = OrderedDict()
+        self._index = None
+        self._indexed = set()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.slot_mismatches = 0
+        self.misses = 0
+        self.evictions = 0
+        if persist_path and os.path.exists(persist_path):
+            self._load()
+
+    def _embed(self, question):
+        if self.get_embedding is None:
+            return None
+        try:
+            # Unit length, so inner product is the cosine similarity
+            vector = np.asarray(self.get_embedding().embed_query(question), dtype='float32')
+            return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+        except Exception as e:
+            print(f"Warning: answer cache could not embed question: {str(e)}")
+            return None
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry["created"] > self.ttl
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if key in self._indexed:
+            self._index.delete([key])
+            self._indexed.discard(key)
+
+    def _add_vector(self, key, vector):
+        if vector is None:
+            return
+        if self._index is None:
+            self._index = FAISS.from_embeddings(
+                [(key, vector)], self.get_embedding(), metadatas=[{"key": key}], ids=[key],
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT)
+        else:
+            self._index.add_embeddings([(key, vector)], metadatas=[{"key": key}], ids=[key])
+        self._indexed.add(key)
+
+    def get(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+            if entry is not None:
+                self._remove(key)
+            has_index = self._index is not None and len(self._entries) > 0
+
+        if has_index:
+            vector = self._embed(key)
+            if vector is not None:
+                with self._lock:
+                    if self._index is not None:
+                        matches = self._index.similarity_search_with_score_by_vector(vector, k=3)
+                        for doc, score in matches:
+                            match_key = doc.metadata["key"]
+                            entry = self._entries.get(match_key)
+                            if entry is not None and score >= self.threshold and not self._expired(entry):
+                                if slot_keys(match_key) != slot_keys(key):
+                                    self.slot_mismatches += 1
+                                    continue
+                                self._entries.move_to_end(match_key)
+                                self.hits += 1
+                                self.semantic_hits += 1
+                                return entry["answer"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question, answer):
+        key = normalize_question(question)
+        vector = self._embed(key)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {"question": question, "answer": answer, "created": time.time(), "vector": vector}
+            self._add_vector(key, vector)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index = None
+            self._indexed.clear()
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "slot_mismatches": self.slot_mismatches,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+                "persisted": bool(self.persist_path),
+            }
+
+    def _save(self):
+        if not self.persist_path:
+            return
+        try:
+            temp_path = f"{self.persist_path}.tmp"
+            with open(temp_path, 'wb') as file:
+                pickle.dump(list(self._entries.items()), file)
+            os.replace(temp_path, self.persist_path)
+        except Exception as e:
+            print(f"Warning: could not persist answer cache: {str(e)}")
+
+    def _load(self):
+        try:
+            with open(self.persist_path, 'rb') as file:
+                items = pickle.load(file)
+        except Exception as e:
+            print(f"Warning: could not load answer cache: {str(e)}")
+            return
+        for key, entry in items:
+            if self._expired(entry):
+                continue
+            self._entries[key] = entry
+            # Stored vectors are reused, nothing is re-embedded on start
+            if self.get_embedding is not None:
+                self._add_vector(key, entry["vector"])
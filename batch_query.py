@@ -0,0 +1,102 @@
+from sqlglot import exp
+import sqlglot
+
+# Clauses that make a SELECT return more (or other) rows than one aggregate row
+_ROW_SHAPING = ('group', 'having', 'order', 'limit', 'offset', 'distinct', 'joins', 'with', 'qualify', 'windows',
+                'laterals', 'pivots')
+
+
+def _aggregate_row(tree):
+    """
+    The (table, filter) a query scans if it returns exactly one row of
+    aliased aggregates over one table, e.g. SELECT sum(x) AS total FROM t
+    WHERE ...; None otherwise
+    """
+    if not isinstance(tree, exp.Select) or any(tree.args.get(clause) for clause in _ROW_SHAPING):
+        return None
+    source = tree.args.get('from')
+    if source is None or not isinstance(source.this, exp.Table):
+        return None
+    for projection in tree.expressions:
+        if not isinstance(projection, exp.Alias) or projection.find(exp.Window, exp.Subquery):
+            return None
+        # Every column has to be inside an aggregate
+        if not projection.find(exp.AggFunc):
+            return None
+        for column in projection.find_all(exp.Column):
+            if column.find_ancestor(exp.AggFunc) is None:
+                return None
+    where = tree.args.get('where')
+    return source.this, where.this if where is not None else None
+
+
+def _column_name(alias, dialect):
+    # PostgreSQL folds unquoted aliases to lower case
+    identifier = alias.args.get('alias')
+    if dialect == 'postgres' and not identifier.quoted:
+        return identifier.name.lower()
+    return identifier.name
+
+
+def plan(queries, combine=True, dialect='postgres'):
+    """
+    The statements to run for a {name: sql} batch. Each is
+    {"sql", "names", "columns"}: queries that return one row of aggregates
+    over the same table and WHERE clause are merged into one SELECT (one
+    scan) and "columns" maps every name to its (column name, merged column)
+    pairs; any other query runs as sent, with "columns" None.
+    """
+    groups = []
+    merged = {}
+    for name, sql in queries.items():
+        scan = None
+        if combine:
+            try:
+                tree = sqlglot.parse_one(sql, read='postgres')
+                scan = _aggregate_row(tree)
+            except sqlglot.errors.ParseError:
+                scan = None
+        if scan is None:
+            groups.append({"sql": sql, "names": [name], "columns": None})
+            continue
+        table, where = scan
+        key = (table.sql(dialect=dialect), where.sql(dialect=dialect) if where is not None else None)
+        group = merged.get(key)
+        if group is None:
+            group = merged[key] = {"table": table, "where": where, "names": [], "columns": {}, "projections": []}
+            groups.append(group)
+        columns = []
+        for projection in tree.expressions:
+            column = f"q{len(group['projections'])}"
+            group["projections"].append(exp.alias_(projection.this.copy(), column))
+            columns.append((_column_name(projection, dialect), column))
+        group["names"].append(name)
+        group["columns"][name] = columns
+
+    statements = []
+    for group in groups:
+        if "projections" not in group:
+            statements.append(group)
+        elif len(group["names"]) == 1:
+            name = group["names"][0]
+            statements.append({"sql": queries[name], "names": [name], "columns": None})
+        else:
+            select = exp.select(*group["projections"]).from_(group["table"].copy())
+            if group["where"] is not None:
+                select = select.where(group["where"].copy())
+            statements.append({"sql": select.sql(dialect=dialect), "names": group["names"],
+                               "columns": group["columns"]})
+    return statements
+
+
+def split(statement, columns, rows):
+    """{name: (columns, rows)} of a statement's result"""
+    if statement["columns"] is None:
+        return {statement["names"][0]: (list(columns), rows)}
+    position = {column: i for i, column in enumerate(columns)}
+    results = {}
+    for name in statement["names"]:
+        names = [original for original, _ in statement["columns"][name]]
+        indexes = [position[merged] for _, merged in statement["columns"][name]]
+        results[name] = (names, [tuple(row[i] for i in indexes) for row in rows])
+    return results
@@ -0,0 +1,62 @@
+"""
+Per-request latency of building the agent on every question (old behaviour)
+versus reusing the agent from the registry in ai.get_agent.
+
+By default a deterministic stub LLM and fake embeddings are used so only the
+setup cost is measured. Pass --ollama to run against a local Ollama server.
+
+    python benchmarks/bench_agent_registry.py --requests 50
+"""
+import argparse
+import os
+import tempfile
+
+from common import build_sqlite_db, print_table, summarize, timed, use_stub_llm
+
+folder = tempfile.mkdtemp()
+os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+
+import ai
+import example_index
+import functions
+
+
+def old_request(question, context, db_path):
+    agent = ai.agent_executor(db_path=db_path)
+    return agent.invoke({"input": question, "table_info": context})
+
+
+def new_request(question, context, db_path):
+    agent = ai.get_agent(db_path=db_path)
+    return agent.invoke({"input": question, "table_info": context})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--ollama', action='store_true', help='use the real Ollama models')
+    args = parser.parse_args()
+
+    if not args.ollama:
+        use_stub_llm(ai)
+        # Keep the fake embedding's index out of files/example_index
+        example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+
+    db_path = build_sqlite_db(os.path.join(folder, f'{functions.IMPORT_DB}.db'), rows=2000)
+    question = 'What is the total amount for CASH IN in account statement table?'
+
+    # The example selector and the schema context are cached in both cases, build them outside the timings
+    ai.warm_up(db_path=db_path)
+    context = ai.table_info(question)
+
+    _, old = timed(old_request, question, context, db_path, repeat=args.requests)
+    _, new = timed(new_request, question, context, db_path, repeat=args.requests)
+
+    print_table('Per-request latency', [
+        ('agent_executor() per request', summarize(old)),
+        ('ai.get_agent() registry', summarize(new)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Dashboard load time with the old fan-out (one /api/direct-query request per
+chart, awaited one after the other as Dashboard.js did) against a single
+/api/batch-query request, with and without merging the total/max/average
+aggregates into one scan. The result cache is off unless --cache is given,
+so every load runs its queries. The time of each query in a combined batch
+is listed as well. The concurrent batch only gains where the database has
+cores to spare for it; merging the aggregates saves scans on any machine.
+
+    python benchmarks/bench_batch_query.py --rows 200000
+    python benchmarks/bench_batch_query.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from common import build_sqlite_db, print_table, summarize
+
+# The Dashboard's queries, with CHANNEL standing in for the merchant
+DASHBOARD = {
+    'services': 'SELECT "TXN_TYPE" FROM {table} as remittance GROUP BY "TXN_TYPE"',
+    'count': '''select {day} as date, COUNT("TXN_AMT") as total_amount from {table} as remittance {where}
+                group by {day} order by date''',
+    'merchants': '''select "CHANNEL", SUM("TXN_AMT") as total_amount from {table} as remittance {where}
+                    GROUP BY "CHANNEL" ORDER BY total_amount DESC LIMIT 10''',
+    'total': 'select sum("TXN_AMT") as total_amount from {table} as remittance {where}',
+    'max': 'select max("TXN_AMT") as max_amount from {table} as remittance {where}',
+    'avg': 'select avg("TXN_AMT") as avg_amount from {table} as remittance {where}',
+}
+
+
+async def fan_out(client, queries):
+    for sql in queries.values():
+        response = await client.post('/api/direct-query', json={"question": sql})
+        response.raise_for_status()
+
+
+async def batch(client, queries, combine):
+    response = await client.post('/api/batch-query', json={"queries": queries, "combine": combine})
+    response.raise_for_status()
+    return response.json()
+
+
+async def bench(args, queries):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        statements = (await batch(client, queries, True))['statements']
+        for label, load in [
+            (f'fan-out ({len(queries)} requests)', lambda: fan_out(client, queries)),
+            ('batch-query', lambda: batch(client, queries, False)),
+            (f'batch-query, combined ({statements} statements)', lambda: batch(client, queries, True)),
+        ]:
+            timings = []
+            for _ in range(args.loads):
+                start = time.perf_counter()
+                await load()
+                timings.append(time.perf_counter() - start)
+            rows.append((label, summarize(timings)))
+        result = await batch(client, queries, True)
+        for name, entry in result['results'].items():
+            combined = f" (with {', '.join(entry['combined_with'])})" if entry.get('combined_with') else ''
+            rows.append((f'  {name}', f"{entry['execution_time'] * 1000:.2f} ms{combined}"))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; account_statement must already exist there')
+    parser.add_argument('--table', default='account_statement')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--loads', type=int, default=20)
+    parser.add_argument('--filter', default='', help="WHERE condition of the filtered charts, e.g. \"\\\"TXN_TYPE\\\" = 'APP'\"")
+    parser.add_argument('--cache', action='store_true', help='leave the result cache on')
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    import ai
+    import functions
+
+    if not args.url:
+        build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows, args.table)
+    ai.result_cache.enabled = args.cache
+    dialect = functions.get_engine(functions.IMPORT_DB).dialect.name
+    day = '"TXN_DATE_TIME"::date' if dialect == 'postgresql' else 'date("TXN_DATE_TIME")'
+    where = f'WHERE {args.filter}' if args.filter else ''
+    queries = {name: ' '.join(sql.format(table=args.table, day=day, where=where).split())
+               for name, sql in DASHBOARD.items()}
+
+    rows = asyncio.run(bench(args, queries))
+    print_table(f'Dashboard load ({dialect}, {args.loads} loads, result cache {"on" if args.cache else "off"})', rows)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
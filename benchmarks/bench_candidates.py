@@ -0,0 +1,206 @@
+"""
+Tail latency of the two ways of writing a question's SQL: the ReAct agent
+(draft, check, retry, up to 3 iterations in a row) against parallel
+candidates (GENERATION_MODE=candidates, candidates.py: --candidates queries
+requested at once, the first one that parses and EXPLAINs against the database
+wins, the agent only runs when none is valid).
+
+Every question of bench_fast_path.py's set is asked --repeat times through
+ai.acall_agent_executor with the answer cache and the fast path off, for
+each --failure-rates value: the probability that the stub LLM writes a
+query the checker rejects (a misspelled table). Reports p50/p95/p99 latency,
+LLM calls per question, how many questions each path answered and execution
+match against the gold SQL on the bench_nl2sql.py fixture.
+
+    python benchmarks/bench_candidates.py
+    python benchmarks/bench_candidates.py --failure-rates 0 0.3 0.6 --llm-ms 1500 --candidates 4
+
+Runs offline: the stub answers every question with its gold SQL (broken
+at the failure rate), sleeping --llm-ms per call (+/- --jitter), so the
+accuracy only counts the questions left without a valid query (the agent's
+iteration limit; its output parser also strips the closing double quote of
+a query ending in a quoted column, so it never gets those right).
+Candidates need as many LLM calls at once, so the scheduler's concurrency
+is set to --candidates unless --concurrency is given; with Ollama that
+also needs OLLAMA_NUM_PARALLEL.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import time
+
+from common import HashingEmbedding, approx_tokens, print_table
+from bench_nl2sql import NoCache, build_fixture, execution_match, folder, llm_stats, result_rows
+from bench_fast_path import QUESTIONS
+
+import ai
+import example_index
+import functions
+import tracing
+
+def failing_llm(answers, delay, jitter, failure_rate, seed=0):
+    """
+    Offline LLM that answers both the agent's ReAct prompts and the candidate
+    prompt with the SQL in answers (question -> SQL), misspelling its table
+    with probability failure_rate. In the ReAct format it checks every query
+    with the checker tool and only gives it as the final answer once the
+    checker found it valid.
+    """
+    from langchain_core.language_models.llms import BaseLLM
+    from langchain_core.outputs import Generation, LLMResult
+
+    rnd = random.Random(seed)
+
+    def draft(prompt):
+        question = prompt.rsplit('Question: ', 1)[-1].split('\n', 1)[0].strip()
+        sql = ' '.join(answers[question].split())
+        if rnd.random() < failure_rate:
+            sql = sql.replace('account_statement', 'account_statment')
+        return sql
+
+    def answer(prompt):
+        if 'Double check the' in prompt:
+            return 'No Mistakes Found'
+        if 'Action Input:' not in prompt:
+            return f'SQL Query: {draft(prompt)}\nDescription: Answers the question'
+        scratchpad = prompt.rsplit('Question: ', 1)[-1]
+        observations = re.findall(r'Observation: (.*)', scratchpad)
+        if observations and observations[-1].startswith('SQL Query is valid'):
+            sql = re.findall(r'Action Input: (.*)', scratchpad)[-1]
+            return f'Thought: I now know the final answer\nFinal Answer: SQL Query: {sql}\nDescription: Checked'
+        return f'Thought: I should check the query\nAction: sql_db_query_checker\nAction Input: {draft(prompt)}'
+
+    def generation(prompt):
+        text = answer(prompt)
+        return [Generation(text=text, generation_info={'prompt_eval_count': approx_tokens(prompt),
+                                                       'eval_count': approx_tokens(text)})]
+
+    def pause():
+        return delay * rnd.uniform(1 - jitter, 1 + jitter)
+
+    class _FailingLLM(BaseLLM):
+        @property
+        def _llm_type(self):
+            return 'failing-stub'
+
+        def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+            generations = []
+            for prompt in prompts:
+                time.sleep(pause())
+                generations.append(generation(prompt))
+            return LLMResult(generations=generations)
+
+        async def _agenerate(self, prompts, stop=None, run_manager=None, **kwargs):
+            generations = []
+            for prompt in prompts:
+                await asyncio.sleep(pause())
+                generations.append(generation(prompt))
+            return LLMResult(generations=generations)
+
+    return _FailingLLM()
+
+
+async def run_question(question, gold_sql):
+    record = {'question': question, 'predicted_sql': None, 'match': None, 'path': None}
+    info = {}
+    with tracing.trace() as trace:
+        start = time.perf_counter()
+        try:
+            answer = await ai.acall_agent_executor(question, info)
+        except Exception as e:
+            answer = None
+            record['error'] = str(e)
+        record['latency_s'] = time.perf_counter() - start
+    record['path'] = info.get('path')
+    record.update(llm_stats(trace.to_dict()['spans']))
+    if answer is None:
+        return record
+    predicted_sql, _ = ai.parse_answer(answer)
+    record['predicted_sql'] = predicted_sql
+    try:
+        predicted_rows = result_rows(ai.clean_query(predicted_sql))
+        record['match'] = execution_match(result_rows(gold_sql), predicted_rows,
+                                          'order by' in ' '.join(gold_sql.lower().split()))
+    except Exception:
+        record['match'] = False
+    return record
+
+
+async def run_all(repeat):
+    return [await run_question(question, gold) for _ in range(repeat) for question, gold, _ in QUESTIONS]
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def summarize(records):
+    latencies = sorted(r['latency_s'] for r in records)
+    return {
+        'n': len(records),
+        'accuracy': sum(1 for r in records if r['match']) / len(records),
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'llm_calls': statistics.mean(r['llm_calls'] for r in records),
+        'by_candidates': sum(1 for r in records if r['path'] == 'candidates'),
+        'by_agent': sum(1 for r in records if r['path'] == 'agent'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the fixture account_statement')
+    parser.add_argument('--llm-ms', type=float, default=1000.0, help='stub latency per LLM call')
+    parser.add_argument('--jitter', type=float, default=0.5, help='stub latency varies by +/- this fraction')
+    parser.add_argument('--failure-rates', type=float, nargs='+', default=[0.0, 0.2, 0.5])
+    parser.add_argument('--candidates', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, help='LLM calls at once (default: --candidates)')
+    parser.add_argument('--repeat', type=int, default=3, help='times every question is asked')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='print every question with its path and SQL')
+    args = parser.parse_args()
+
+    db_path = build_fixture(os.path.join(folder, f'{functions.IMPORT_DB}.db'), args.rows)
+    ai.answer_cache = NoCache()
+    ai.fast_path_router.enabled = False
+    example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+    embedding = HashingEmbedding()
+    ai._embedding = embedding
+    ai.DEFAULT_DB_PATH = db_path
+    ai.get_agent.__defaults__ = (ai.DEFAULT_MODEL, db_path)
+    ai.get_candidate_generator.__defaults__ = (ai.DEFAULT_MODEL, db_path)
+    ai.SQL_CANDIDATES = args.candidates
+    ai.scheduler.max_concurrency = args.concurrency or args.candidates
+
+    rows = []
+    for rate in args.failure_rates:
+        for mode in ('agent', 'candidates'):
+            llm = failing_llm({q: gold for q, gold, _ in QUESTIONS}, args.llm_ms / 1000, args.jitter, rate, args.seed)
+            ai.build_llm = lambda model=ai.DEFAULT_MODEL: (ai.ScheduledLLM(llm=llm, scheduler=ai.scheduler), embedding)
+            ai.build_candidate_llms = lambda model=ai.DEFAULT_MODEL: [ai.ScheduledLLM(llm=llm, scheduler=ai.scheduler)]
+            ai.reload_agents()
+            ai.GENERATION_MODE = mode
+            records = asyncio.run(run_all(args.repeat))
+            rows.append((f'failure {rate:g}, {mode}', summarize(records)))
+            if args.verbose:
+                for r in records:
+                    print(f"  {mode:<10} {r['path']} match={r['match']} {r['latency_s'] * 1000:8.1f} ms  "
+                          f"{r['question']}\n             {r['predicted_sql']}")
+            if mode == 'candidates':
+                stats = ai.candidate_stats()
+                rows.append(('  candidates', {k: stats[k] for k in ('answered', 'no_valid', 'generated',
+                                                                     'cancelled', 'invalid', 'winners')}))
+
+    print_table(f'Agent vs {args.candidates} parallel candidates ({len(QUESTIONS)} questions x {args.repeat}, '
+                f'stub LLM {args.llm_ms:g} ms +/- {args.jitter:.0%} per call, '
+                f'{ai.scheduler.max_concurrency} at once)', rows)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Per-question latency of /api/execute-query for each checker mode.
+
+In 'execute' mode the checker tool runs the final query against the database
+and the endpoint then runs it again; the dry-run modes only validate it.
+A stub LLM (--llm-ms per call) scripts one checker call per question and
+a SQLite stand-in holds --rows transactions for both databases.
+
+    python benchmarks/bench_checker_modes.py --rows 500000
+"""
+import argparse
+import os
+import tempfile
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+folder = tempfile.mkdtemp()
+os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+
+import ai
+import example_index
+
+# Every query should reach the database
+ai.result_cache.enabled = False
+
+QUERY = ('SELECT "TXN_TYPE", "CHANNEL", COUNT(*), SUM("TXN_AMT") FROM account_statement '
+         'GROUP BY "TXN_TYPE", "CHANNEL" ORDER BY 4 DESC')
+RESPONSES = [
+    f'Thought: I should check the query\nAction: sql_db_query_checker\nAction Input: {QUERY}',
+    'No Mistakes Found',
+    f'Thought: I now know the final answer\nFinal Answer: SQL Query: {QUERY}\nDescription: Totals per type and channel',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--llm-ms', type=float, default=0.0)
+    parser.add_argument('--questions', type=int, default=10)
+    args = parser.parse_args()
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from common import stub_llm
+
+    db_path = build_sqlite_db(os.path.join(folder, 'Test.db'), rows=args.rows)
+    embedding = DeterministicFakeEmbedding(size=256)
+    ai._embedding = embedding
+    # Keep the fake embedding's index out of files/example_index
+    example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+
+    def ask(i):
+        answer = ai.call_agent_executor(f'Totals per type and channel #{i}')
+        sql_query, _ = ai.parse_answer(answer)
+        result = ai.fetch(ai.clean_query(sql_query))
+        return list(result)
+
+    results = []
+    for mode in ['execute', 'explain', 'limit0', 'sample']:
+        ai.CHECKER_MODE = mode
+        llm = stub_llm(delay=args.llm_ms / 1000)
+        llm.responses = RESPONSES
+        ai.build_llm = lambda model=ai.DEFAULT_MODEL: (llm, embedding)
+        ai.reload_agents()
+        ai.get_agent(db_path=db_path)
+        ai.DEFAULT_DB_PATH = db_path
+        ai.get_agent.__defaults__ = (ai.DEFAULT_MODEL, db_path)
+        counter = iter(range(10 ** 6))
+        _, timings = timed(lambda: ask(next(counter)), repeat=args.questions)
+        results.append((f'CHECKER_MODE={mode}', summarize(timings)))
+
+    print_table(f'Per-question latency ({args.rows} rows, LLM {args.llm_ms:.0f} ms/call)', results)
+
+
+if __name__ == '__main__':
+    main()
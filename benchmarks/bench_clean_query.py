@@ -0,0 +1,141 @@
+"""
+Micro-benchmark of ai.clean_query (parsed-SQL qualifier) against the previous
+token/column string rewriting, over a corpus of generated queries on tables
+with 12, 100 and 250 columns.
+
+It first checks the scoping cases on a SQLite account_statement: columns of
+a derived table or CTE and select-list aliases must be left for the outer
+query to resolve, so each rewritten query has to run and return the same
+rows as the query as written (SQLite resolves names case-insensitively).
+
+    python benchmarks/bench_clean_query.py --queries 300
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+folder = tempfile.mkdtemp()
+os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+
+from common import build_sqlite_db, print_table
+
+import ai
+import functions
+
+
+def legacy_clean_query(sql, column_names, table='account_statement'):
+    """The token-scanning rewrite ai.clean_query used before, kept for comparison"""
+    clean = sql.split()
+    for i in range(len(clean)):
+        if clean[i] in column_names:
+            clean[i] = f'{table}."{clean[i]}"'
+        for i in column_names:
+            for func in ['MAX', 'MIN', 'SUM', 'AVG', 'COUNT']:
+                if f'{func}({i})' in clean:
+                    clean[clean.index(f'{func}({i})')] = f'{func.lower()}({table}."{i}")'
+            if f'COUNT(DISTINCT {i})' in clean:
+                clean[clean.index(f'COUNT(DISTINCT {i})')] = f'count(distinct {table}."{i}")'
+            if f'{i},' in clean:
+                clean[clean.index(f'{i},')] = f'{table}."{i}",'
+            if f'{i};' in clean:
+                clean[clean.index(f'{i};')] = f'{table}."{i}";'
+    return ' '.join(clean)
+
+
+SCOPE_QUERIES = [
+    ('derived table', 'SELECT TXN_TYPE FROM (SELECT TXN_TYPE, SUM(TXN_AMT) AS s FROM account_statement '
+                      'GROUP BY TXN_TYPE) t ORDER BY TXN_TYPE'),
+    ('qualified derived', 'SELECT t.TXN_TYPE, t.s FROM (SELECT TXN_TYPE, SUM(TXN_AMT) AS s FROM account_statement '
+                          'GROUP BY TXN_TYPE) AS t ORDER BY t.s DESC'),
+    ('CTE', 'WITH x AS (SELECT CHANNEL, COUNT(*) AS n FROM account_statement GROUP BY CHANNEL) '
+            'SELECT CHANNEL, n FROM x ORDER BY CHANNEL'),
+    ('alias in ORDER BY', 'SELECT TXN_TYPE, SUM(TXN_AMT) AS txn_amt FROM account_statement '
+                          'GROUP BY TXN_TYPE ORDER BY txn_amt'),
+    ('correlated subquery', 'SELECT CHANNEL, COUNT(*) FROM account_statement a WHERE TXN_AMT > '
+                            '(SELECT AVG(TXN_AMT) FROM account_statement b WHERE b.CHANNEL = a.CHANNEL) '
+                            'GROUP BY CHANNEL ORDER BY CHANNEL'),
+]
+
+
+def check_scopes():
+    """Run every scoping case as written and after clean_query; prints the ones that differ"""
+    conn = sqlite3.connect(os.path.join(folder, f'{functions.IMPORT_DB}.db'))
+    failed = 0
+    for label, query in SCOPE_QUERIES:
+        cleaned = ai.clean_query(query)
+        try:
+            same = conn.execute(cleaned).fetchall() == conn.execute(query).fetchall()
+            error = None if same else 'different rows'
+        except sqlite3.Error as e:
+            error = str(e)
+        if error:
+            failed += 1
+            print(f'FAIL {label}: {error}\n     {cleaned}')
+    conn.close()
+    print(f'Scoping cases: {len(SCOPE_QUERIES) - failed}/{len(SCOPE_QUERIES)} unchanged by clean_query')
+    return failed
+
+
+def create_table(name, width):
+    columns = [f'COL_{i:03d}' for i in range(width)]
+    conn = sqlite3.connect(os.path.join(folder, f'{functions.IMPORT_DB}.db'))
+    conn.execute(f'CREATE TABLE {name} ({", ".join(f"{c} TEXT" for c in columns)})')
+    conn.commit()
+    conn.close()
+    return columns
+
+
+def generate_queries(table, columns, count, rnd):
+    queries = []
+    for _ in range(count):
+        picked = rnd.sample(columns, rnd.randint(2, 12))
+        agg = rnd.choice(['SUM', 'MAX', 'MIN', 'AVG', 'COUNT'])
+        where = ' AND '.join(f"{c} = '{rnd.randint(1, 99)}'" for c in rnd.sample(columns, rnd.randint(1, 5)))
+        queries.append(
+            f"SELECT {', '.join(picked[:-1])}, {agg}({picked[-1]}) FROM {table} "
+            f"WHERE {where} GROUP BY {', '.join(picked[:-1])} ORDER BY {picked[0]};"
+        )
+    return queries
+
+
+def run(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    build_sqlite_db(os.path.join(folder, f'{functions.IMPORT_DB}.db'), rows=2000)
+    check_scopes()
+
+    rnd = random.Random(7)
+    rows = []
+    for width in [12, 100, 250]:
+        table = f'wide_{width}'
+        columns = create_table(table, width)
+        queries = generate_queries(table, columns, args.queries, rnd)
+        functions.get_table(table, functions.IMPORT_DB)
+
+        legacy = run(lambda q: legacy_clean_query(q, columns, table), queries)
+        ai._qualify.cache_clear()
+        parsed_cold = run(ai.clean_query, queries)
+        parsed_warm = run(ai.clean_query, queries)
+        rows.append((f'{width} columns', {
+            "legacy_us": legacy,
+            "parsed_us": parsed_cold,
+            "parsed_cached_us": parsed_warm,
+        }))
+
+    print_table(f'Mean time per query over {args.queries} generated queries', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Concurrent-request throughput of /api/execute-query and /api/direct-query.
+
+Compares the current handlers (ainvoke + bounded threadpool work) with the
+old style of calling the blocking functions directly inside `async def`
+handlers, which is re-created here as /bench/blocking-* routes. Uses a stub
+LLM with --llm-ms latency and a SQLite stand-in database.
+
+    python benchmarks/bench_concurrency.py --llm-ms 200
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+from common import build_sqlite_db, use_stub_llm
+
+folder = tempfile.mkdtemp()
+os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+os.environ.setdefault('LLM_CONCURRENCY', '16')
+
+import httpx
+
+import ai
+import example_index
+import main
+
+# Every query should reach the database
+ai.result_cache.enabled = False
+
+_question_ids = itertools.count()
+
+QUERY = 'SELECT "TXN_TYPE", SUM("TXN_AMT") FROM account_statement GROUP BY "TXN_TYPE"'
+
+
+@main.app.post("/bench/blocking-execute-query")
+async def blocking_execute_query(request: main.QueryRequest):
+    result = ai.call_agent_executor(request.question)
+    sql_query = result.split('Description: ')[0].replace('SQL Query: ', '').strip()
+    rows = ai.fetch(ai.clean_query(sql_query))
+    return {"data": [dict(zip(rows.keys(), row)) for row in rows]}
+
+
+@main.app.post("/bench/blocking-direct-query")
+async def blocking_direct_query(request: main.QueryRequest):
+    rows = ai.fetch(request.question)
+    return {"data": [dict(zip(rows.keys(), row)) for row in rows]}
+
+
+async def run(client, path, concurrency, total, question):
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            # Unique questions so the answer cache never short-circuits
+            body = {"question": question if 'direct' in path else f"{question} #{next(_question_ids)}"}
+            response = await client.post(path, json=body)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def bench(args):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for label, path, question in [
+            ('execute-query', '/api/execute-query', 'How many transactions per type?'),
+            ('blocking execute-query', '/bench/blocking-execute-query', 'How many transactions per type?'),
+            ('direct-query', '/api/direct-query', QUERY),
+            ('blocking direct-query', '/bench/blocking-direct-query', QUERY),
+        ]:
+            print(f"\n{label} (requests/s)")
+            for concurrency in args.concurrency:
+                rps = await run(client, path, concurrency, args.requests, question)
+                print(f"  concurrency {concurrency:<4} {rps:8.1f}")
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--llm-ms', type=float, default=200.0)
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    build_sqlite_db(os.path.join(folder, 'Test.db'), rows=20000)
+    answer = f'Final Answer: SQL Query: {QUERY};\nDescription: Amount per type'
+    use_stub_llm(ai, answer=answer, delay=args.llm_ms / 1000)
+    # Keep the fake embedding's index out of files/example_index
+    example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+    ai.warm_up(db_path=os.path.join(folder, 'Test.db'))
+    ai.DEFAULT_DB_PATH = os.path.join(folder, 'Test.db')
+    ai.get_agent.__defaults__ = (ai.DEFAULT_MODEL, ai.DEFAULT_DB_PATH)
+
+    asyncio.run(bench(args))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,65 @@
+"""
+Load test for the pooled engine registry (functions.get_engine).
+
+Runs the same small query from several threads, once creating a new engine
+per call (old behaviour) and once through the shared pool, and prints the
+number of physical connections opened for each.
+
+    python benchmarks/bench_engine_pool.py                       # SQLite stand-in
+    python benchmarks/bench_engine_pool.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+from sqlalchemy import create_engine, event, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}/{dbuser}, defaults to a SQLite file')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        folder = tempfile.mkdtemp()
+        build_sqlite_db(os.path.join(folder, 'bench.db'), rows=1000)
+        os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+
+    import functions
+    url = functions.engineURL('bench', 'postgres')
+    query = text('SELECT COUNT(*) FROM account_statement')
+
+    connects = {"count": 0}
+
+    def per_call_engine():
+        engine = create_engine(url)
+        event.listen(engine, 'connect', lambda *a: connects.__setitem__("count", connects["count"] + 1))
+        with engine.connect() as connection:
+            connection.execute(query).scalar()
+        engine.dispose()
+
+    def pooled():
+        with functions.get_engine('bench').connect() as connection:
+            connection.execute(query).scalar()
+
+    results = []
+    for name, func in [('create_engine per call', per_call_engine), ('functions.get_engine pool', pooled)]:
+        with ThreadPoolExecutor(args.threads) as pool:
+            timings = list(pool.map(lambda _: timed(func)[1][0], range(args.requests)))
+        results.append((name, summarize(timings)))
+
+    print_table(f'{args.requests} requests over {args.threads} threads', results)
+    print(f"\n  connections opened without pool: {connects['count']}")
+    for stats in functions.pool_stats():
+        print(f"  pool stats: {stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Time to first answer with and without the persisted few-shot example index.
+
+Each run starts from a fresh Python process (like a server restart); the
+"cold" case deletes the artifact first so every example is embedded again.
+The stub embedding sleeps --embed-ms per text to mimic Ollama; pass --ollama
+to use the real models instead.
+
+    python benchmarks/bench_example_index.py --embed-ms 25
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR, build_sqlite_db
+
+CHILD = '''
+import json, sys, time
+sys.path.insert(0, {bench_dir!r})
+start = time.perf_counter()
+from common import SlowFakeEmbedding, use_stub_llm
+import ai, example_index
+example_index.INDEX_DIR = {index_dir!r}
+if not {ollama!r}:
+    use_stub_llm(ai, embedding=SlowFakeEmbedding(delay={delay!r}))
+question = "What is the total amount for CASH IN in account statement table?"
+agent = ai.get_agent(db_path={db_path!r})
+agent.invoke({{"input": question, "table_info": ai.table_info(question)}})
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+'''
+
+
+def first_answer(index_dir, db_path, delay, ollama):
+    code = CHILD.format(bench_dir=os.path.join(ROOT_DIR, 'benchmarks'), index_dir=index_dir,
+                        db_path=db_path, delay=delay, ollama=ollama)
+    env = {**os.environ, 'DB_URL': f'sqlite:///{os.path.dirname(db_path)}/{{dbname}}.db'}
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT_DIR, check=True,
+                         env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])["seconds"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--embed-ms', type=float, default=25.0, help='simulated embedding latency per text')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--ollama', action='store_true')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    index_dir = os.path.join(folder, 'example_index')
+    # The child processes read it as their IMPORT_DB
+    db_path = build_sqlite_db(os.path.join(folder, 'Test.db'), rows=500)
+
+    print("\nTime to first answer (fresh process)")
+    for label, keep in [('without artifact (cold)', False), ('with artifact', True)]:
+        timings = []
+        for _ in range(args.runs):
+            if not keep:
+                shutil.rmtree(index_dir, ignore_errors=True)
+            elif not os.path.isdir(index_dir):
+                first_answer(index_dir, db_path, args.embed_ms / 1000, args.ollama)
+            timings.append(first_answer(index_dir, db_path, args.embed_ms / 1000, args.ollama))
+        print(f"  {label:<32} " + ", ".join(f"{t:.2f}s" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Payload size and time to stream a whole table through /api/fetch-data in each
+stream_format: the JSON row dicts (column names repeated in every row)
+against the Arrow IPC, Parquet and CSV exports, for a narrow and a wide table.
+
+    python benchmarks/bench_export.py --rows 200000
+    python benchmarks/bench_export.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from common import ACCOUNT_STATEMENT_DDL, build_sqlite_db, print_table
+
+FORMATS = ['json', 'ndjson', 'csv', 'arrow', 'parquet']
+
+
+def add_wide_columns(path, table, extra=28):
+    """Copy `table` into `<table>_wide` with `extra` more numeric and text columns"""
+    conn = sqlite3.connect(path)
+    names = [f'amount_{i}' if i % 2 else f'channel_{i}' for i in range(extra)]
+    ddl = ACCOUNT_STATEMENT_DDL.replace('account_statement', f'{table}_wide', 1).rstrip().rstrip(')')
+    ddl += ''.join(f',\n    {name} {"DOUBLE PRECISION" if name.startswith("amount") else "TEXT"}' for name in names) + ')'
+    values = ', '.join(f'"TXN_AMT" * {i}' if i % 2 else f'"CHANNEL" || \'_{i}\'' for i in range(extra))
+    conn.execute(f'DROP TABLE IF EXISTS {table}_wide')
+    conn.execute(ddl)
+    conn.execute(f'INSERT INTO {table}_wide SELECT *, {values} FROM {table}')
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; the tables must already exist there')
+    parser.add_argument('--table', default='bench_export')
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    from fastapi.testclient import TestClient
+    import functions
+    import main as app_module
+
+    if not args.url:
+        path = build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows, args.table)
+        add_wide_columns(path, args.table)
+
+    client = TestClient(app_module.app)
+    rows = []
+    for table in (args.table, f'{args.table}_wide'):
+        baseline = None
+        for fmt in FORMATS:
+            start = time.perf_counter()
+            response = client.post('/api/fetch-data', json={
+                'table': table, 'db_name': functions.IMPORT_DB, 'stream': True, 'stream_format': fmt})
+            seconds = time.perf_counter() - start
+            assert response.status_code == 200, response.text
+            size = len(response.content)
+            baseline = baseline or size
+            rows.append((f'{table}: {fmt}', {
+                'MB': size / 1e6,
+                'vs_json': f'{size / baseline:.0%}',
+                'seconds': seconds,
+            }))
+    print_table(f'{args.rows} rows streamed per format ({functions.get_engine(functions.IMPORT_DB).dialect.name})', rows)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
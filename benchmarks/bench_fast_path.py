@@ -0,0 +1,150 @@
+"""
+Latency and accuracy of the few-shot fast path (fast_path.py) against the
+agent: a set of paraphrases and slot variants (other dates, accounts,
+amounts) of the questions in files/examples.xlsx, plus questions the router
+must hand to the agent (other filter values, slots the example SQL doesn't
+use, unrelated questions), run once with the fast path on and once with it
+off. Execution match against the gold SQL is checked on the same SQLite
+fixture as bench_nl2sql.py.
+
+    python benchmarks/bench_fast_path.py
+    python benchmarks/bench_fast_path.py --llm-ms 2000 --threshold 0.85
+
+Runs offline: the agent is the few_shot_llm stand-in, sleeping --llm-ms per
+call, and the embedding is a bag-of-words HashingEmbedding so paraphrases
+land close together as with a real embedding model. The stand-in copies the
+closest example's SQL verbatim, so its accuracy on slot variants says little
+about a real model; compare the fast path's accuracy with the gold SQL and
+the latency of both paths.
+"""
+import argparse
+import os
+import statistics
+
+from common import HashingEmbedding, few_shot_llm, print_table
+from bench_nl2sql import NoCache, build_fixture, folder, run_question
+
+import ai
+import example_index
+import functions
+
+# (question, gold SQL, the path it should take)
+QUESTIONS = [
+    ('what is the total amount for cash in in the account statement table',
+     '''select sum("TXN_AMT") from account_statement where "TXN_TYPE" = 'CASH IN' ''', 'fast_path'),
+    ('number of APP transactions in the account statement table',
+     '''select count(*) from account_statement where "TXN_TYPE" = 'APP' ''', 'fast_path'),
+    ('Total amount of cash out from 01-03-2019 to 15-08-2019?',
+     '''select "TXN_TYPE", sum("TXN_AMT") from account_statement
+        where "TXN_TYPE" = 'CASH OUT' and "TXN_DATE_TIME" between '2019-03-01' and '2019-08-15' ''', 'fast_path'),
+    ('Give me the data for 05-02-2027',
+     '''select * from account_statement
+        where "TXN_DATE_TIME" >= '2027-02-05 00:00:00' and "TXN_DATE_TIME" < '2027-02-06 00:00:00' ''', 'fast_path'),
+    ('Give me the data for march 2024',
+     '''select * from account_statement
+        where "TXN_DATE_TIME" >= '2024-03-01 00:00:00' and "TXN_DATE_TIME" < '2024-04-01 00:00:00' ''', 'fast_path'),
+    ('give me the data for 1711000000',
+     '''select * from account_statement where "STATEMENT_FOR_ACC" = 1711000000''', 'fast_path'),
+    ('give me all the data for 1822334455 from may 2019 to june 2020',
+     '''select * from account_statement where "STATEMENT_FOR_ACC" = 1822334455
+        and "TXN_DATE_TIME" between '2019-05-01' and '2020-06-30' ''', 'fast_path'),
+    ('Get the number of transactions where the amount is greater than 25000',
+     '''select count(*) from account_statement where "TXN_AMT" > 25000''', 'fast_path'),
+    ('Give me the top 5 Maximum amount for each transaction type in account_statement table?',
+     '''select "TXN_TYPE", max("TXN_AMT") from account_statement group by "TXN_TYPE"
+        order by max("TXN_AMT") desc limit 5''', 'fast_path'),
+    ('give me the number of transactions for the account 1933445566',
+     '''select count(*) from account_statement where "STATEMENT_FOR_ACC" = 1933445566''', 'fast_path'),
+    ('Give me the total CASH OUT amount for march 2022',
+     '''select "TXN_TYPE", sum("TXN_AMT") from account_statement
+        where "TXN_TYPE" = 'CASH OUT' and "TXN_DATE_TIME" between '2022-03-01' and '2022-03-31' ''', 'fast_path'),
+    ('minimum for each transaction type in october 2025',
+     '''select "TXN_TYPE", min("TXN_AMT") from account_statement
+        where "TXN_DATE_TIME" between '2025-10-01' and '2025-10-31' group by "TXN_TYPE"''', 'fast_path'),
+    ('show me the average transaction amount that has been reversed',
+     '''select avg("TXN_AMT") from account_statement where "STATUS" = 'REVERSED' ''', 'fast_path'),
+    ('for august 2026, give me the maximum transaction amount for each transaction type.',
+     '''select "TXN_TYPE", max("TXN_AMT") from account_statement
+        where "TXN_DATE_TIME" between '2026-08-01' and '2026-08-31' group by "TXN_TYPE"''', 'fast_path'),
+    ('Amount/Volume of transaction between january 2020 to march 2021',
+     '''select count(*) from account_statement
+        where "TXN_DATE_TIME" between '2020-01-01' and '2021-03-31' ''', 'fast_path'),
+    # Other filter values than the closest example
+    ('Number of USSD transactions in account statement table?',
+     '''select count(*) from account_statement where "CHANNEL" = 'USSD' ''', 'agent'),
+    ('Give me the data for cash in',
+     '''select * from account_statement where "TXN_TYPE" = 'CASH IN' ''', 'agent'),
+    # The example's SQL doesn't use the date the question changes
+    ('average transaction in 2021',
+     '''select avg("TXN_AMT") from account_statement
+        where "TXN_DATE_TIME" between '2021-01-01' and '2021-12-31' ''', 'agent'),
+    ('Give me the top 3 Minimum amount for each transaction type in account statement table for 2019?',
+     '''select "TXN_TYPE", min("TXN_AMT") from account_statement where "TXN_DATE_TIME" between '2019-01-01'
+        and '2019-12-31' group by "TXN_TYPE" order by min("TXN_AMT") asc limit 3''', 'agent'),
+    # Nothing close enough
+    ('how many failed transactions were made over the web channel last year',
+     '''select count(*) from account_statement where "STATUS" = 'FAILED' and "CHANNEL" = 'WEB' ''', 'agent'),
+]
+
+
+def summarize(records):
+    latencies = sorted(r['latency_s'] for r in records)
+    scored = [r for r in records if r['match'] is not None]
+    return {
+        'n': len(records),
+        'accuracy': sum(1 for r in scored if r['match']) / len(scored) if scored else 0.0,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0.0,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else 0.0,
+        'llm_calls': statistics.mean(r['llm_calls'] for r in records) if records else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the fixture account_statement')
+    parser.add_argument('--llm-ms', type=float, default=1000.0, help='stub latency per LLM call')
+    parser.add_argument('--threshold', type=float, default=0.85, help='fast path cosine similarity threshold')
+    parser.add_argument('--verbose', action='store_true', help='print every question with its path and similarity')
+    args = parser.parse_args()
+
+    db_path = build_fixture(os.path.join(folder, f'{functions.IMPORT_DB}.db'), args.rows)
+    ai.answer_cache = NoCache()
+    # Keep the persisted index of the real embedding model out of it
+    example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+    embedding = HashingEmbedding()
+    ai._embedding = embedding
+    llm = few_shot_llm(args.llm_ms / 1000)
+    ai.build_llm = lambda model=ai.DEFAULT_MODEL: (ai.ScheduledLLM(llm=llm, scheduler=ai.scheduler), embedding)
+    ai.DEFAULT_DB_PATH = db_path
+    ai.get_agent.__defaults__ = (ai.DEFAULT_MODEL, db_path)
+    ai.fast_path_router.threshold = args.threshold
+    ai.warm_up(ai.DEFAULT_MODEL, db_path)
+
+    rows = []
+    for enabled in (False, True):
+        ai.fast_path_router.enabled = enabled
+        records = [run_question(i, question, gold) for i, (question, gold, _) in enumerate(QUESTIONS, 1)]
+        label = 'fast path on' if enabled else 'fast path off'
+        rows.append((f'{label}, all', summarize(records)))
+        if not enabled:
+            continue
+        for path in ('fast_path', 'agent'):
+            answered = [r for r in records if r['path'] == path]
+            rows.append((f'{label}, answered by {path}', summarize(answered)))
+        routed = sum(1 for r, (_, _, expected) in zip(records, QUESTIONS) if r['path'] == expected)
+        if args.verbose:
+            for r in records:
+                print(f"  {r['path']:<9} sim={r['similarity']} match={r['match']} "
+                      f"{r['latency_s'] * 1000:8.1f} ms  {r['question']}")
+                if r['path'] == 'fast_path' and not r['match']:
+                    print(f"            {r['predicted_sql']}")
+
+    print_table(f'Fast path vs agent ({len(QUESTIONS)} questions, threshold {args.threshold:g}, '
+                f'stub LLM {args.llm_ms:g} ms per call)', rows)
+    print(f'\n{routed}/{len(QUESTIONS)} questions took the expected path; router stats: {ai.fast_path_router.stats()}')
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
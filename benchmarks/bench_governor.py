@@ -0,0 +1,89 @@
+"""
+What the query governor costs on ordinary queries and what it saves on
+runaway ones: latency of small queries through ai.fetch with the governor
+off and on (statement timeout, EXPLAIN cost check, registry), and how long
+a runaway cross join holds a connection with and without it (--skip-ungoverned
+on big tables, where it may not finish).
+
+    python benchmarks/bench_governor.py --rows 20000
+    python benchmarks/bench_governor.py --url "postgresql://postgres:pw@localhost:5432/{dbname}" --skip-ungoverned
+
+Without --url, a SQLite stand-in is used: no EXPLAIN costs there, so the
+runaway query is stopped by the timeout instead of being rejected up front.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+SMALL = [
+    'SELECT COUNT(*) FROM {table}',
+    'SELECT "TXN_TYPE", SUM("TXN_AMT") FROM {table} GROUP BY "TXN_TYPE"',
+    'SELECT * FROM {table} WHERE "TXN_AMT" > 9000 ORDER BY "TXN_AMT" DESC LIMIT 20',
+]
+RUNAWAY = 'SELECT COUNT(*) FROM {table} a, {table} b'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; account_statement must already exist there')
+    parser.add_argument('--table', default='account_statement')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--skip-ungoverned', action='store_true')
+    parser.add_argument('--timeout', type=float, default=2.0)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    import ai
+    import functions
+    import governor
+
+    # Every query should reach the database
+    ai.result_cache.enabled = False
+
+    if not args.url:
+        build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows, args.table)
+    settings = (governor.QUERY_TIMEOUT, governor.QUERY_MAX_ROWS, governor.QUERY_MAX_COST)
+
+    def governed(on):
+        if on:
+            governor.QUERY_TIMEOUT, governor.QUERY_MAX_ROWS, governor.QUERY_MAX_COST = settings
+        else:
+            governor.QUERY_TIMEOUT, governor.QUERY_MAX_ROWS, governor.QUERY_MAX_COST = 0, 0, 0
+
+    rows = []
+    for on in (False, True):
+        governed(on)
+        timings = []
+        for sql in SMALL:
+            _, t = timed(lambda: list(ai.fetch(sql.format(table=args.table))), repeat=args.repeat)
+            timings += t
+        rows.append((f'small queries, governor {"on" if on else "off"}', summarize(timings)))
+
+    for on in (False, True):
+        if not on and args.skip_ungoverned:
+            continue
+        governed(on)
+        start = time.perf_counter()
+        try:
+            list(ai.fetch(RUNAWAY.format(table=args.table), timeout=args.timeout if on else None))
+            outcome = 'ran to completion'
+        except (governor.QueryRejected, governor.QueryTimeout) as e:
+            outcome = type(e).__name__
+        rows.append((f'runaway cross join, governor {"on" if on else "off"}',
+                     {'seconds': time.perf_counter() - start, 'outcome': outcome}))
+
+    print_table(f'Query governor ({functions.get_engine(functions.IMPORT_DB).dialect.name}, '
+                f'timeout {args.timeout:g} s, max cost {settings[2]:g})', rows)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Import throughput and peak memory: functions.import_file_to_db (chunked
+COPY FROM STDIN into a staging table) against the previous whole-file
+DataFrame + to_sql path. Each import runs in its own process so the peak
+RSS numbers are independent.
+
+    python benchmarks/bench_import.py --rows 1000000 --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+
+Without --url a SQLite stand-in is used, where both paths load with to_sql.
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR, account_statement_rows
+
+HEADER = ['Sl', 'TXN_DATE_TIME', 'TXN_ID', 'TXN_TYPE', 'STATEMENT_FOR_ACC', 'TXN_WITH_ACC', 'CHANNEL',
+          'REFERENCE', 'TXN_TYPE_DR_CR', 'TXN_AMT', 'AVAILABLE_BLC_AFTER_TXN', 'STATUS']
+
+CHILD = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import functions
+start = time.time()
+if {method!r} == 'copy':
+    result = functions.import_file_to_db({path!r}, 'bench_import')
+    rows = result['row_count']
+else:
+    import re
+    import pandas as pd
+    from sqlalchemy import text
+    engine = functions.get_engine(functions.IMPORT_DB)
+    df = pd.read_csv({path!r})
+    df.columns = [re.sub(r'[^a-zA-Z0-9]', '_', c.strip().upper()) for c in df.columns]
+    for col in df.columns:
+        if 'DATE' in col or 'TIME' in col:
+            df[col] = pd.to_datetime(df[col])
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col].astype(str).str.len().max()
+    df.to_sql('bench_import', engine, if_exists='replace', index=False)
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT COUNT(*) FROM "bench_import"')).scalar()
+        connection.execute(text('SELECT * FROM "bench_import" LIMIT 5')).fetchall()
+seconds = time.time() - start
+print(json.dumps({{"rows": rows, "seconds": seconds,
+                  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+
+def run(method, path, env):
+    code = CHILD.format(root=ROOT_DIR, method=method, path=path)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--url', help='engine URL template with {dbname}, defaults to a SQLite file')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    env = dict(os.environ, DB_URL=args.url or f'sqlite:///{folder}/{{dbname}}.db')
+    path = os.path.join(folder, 'statement.csv')
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(account_statement_rows(args.rows))
+    print(f"CSV with {args.rows} rows: {os.path.getsize(path) / 1e6:.0f} MB")
+
+    for label, method in [('DataFrame + to_sql (old)', 'to_sql'), ('chunked COPY (import_file_to_db)', 'copy')]:
+        stats = run(method, path, env)
+        print(f"  {label:<34} {stats['seconds']:7.1f}s  {stats['rows'] / stats['seconds']:9.0f} rows/s"
+              f"  peak RSS {stats['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Bursty load against a stub Ollama server (benchmarks/stub_ollama.py), calling
+the real OllamaLLM client directly and through llm_scheduler.ScheduledLLM.
+
+  burst     - N distinct prompts at once with a client timeout: direct calls
+              all pile up inside the server, scheduled calls beyond the queue
+              bound are rejected straight away and the rest meet the deadline
+  coalesce  - N requests over a few distinct prompts: generate calls made
+  priority  - queue wait of high priority calls submitted behind a backlog
+  cancel    - half of the queued callers give up: generate calls made
+
+    python benchmarks/bench_llm_scheduler.py --burst 40 --delay 0.25 --timeout 4
+"""
+import argparse
+import asyncio
+import time
+
+from common import print_table, summarize
+import stub_ollama
+
+from langchain_ollama import OllamaLLM
+import llm_scheduler
+
+
+async def timed_call(coro):
+    start = time.perf_counter()
+    try:
+        await coro
+        return 'ok', time.perf_counter() - start
+    except llm_scheduler.SchedulerFull:
+        return 'rejected', time.perf_counter() - start
+    except (llm_scheduler.DeadlineExceeded, asyncio.TimeoutError):
+        return 'timed out', time.perf_counter() - start
+    except Exception as e:
+        # httpx timeouts from the direct client
+        return 'timed out' if 'timed out' in str(e).lower() or 'timeout' in type(e).__name__.lower() else 'error', \
+            time.perf_counter() - start
+
+
+def outcome(results, server, before):
+    ok = [seconds for status, seconds in results if status == 'ok']
+    counts = {status: sum(1 for s, _ in results if s == status) for status in ('ok', 'rejected', 'timed out', 'error')}
+    stats = {**counts, "generate_calls": server.stats["generate"] - before}
+    if ok:
+        summary = summarize(ok)
+        stats.update(ok_p50_ms=summary["p50_ms"], ok_p95_ms=summary["p95_ms"])
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--burst', type=int, default=40)
+    parser.add_argument('--delay', type=float, default=0.25, help='seconds per generation in the stub')
+    parser.add_argument('--timeout', type=float, default=4.0, help='per-request deadline in seconds')
+    parser.add_argument('--queue', type=int, default=12)
+    args = parser.parse_args()
+
+    server = stub_ollama.serve(delay=args.delay, parallel=1)
+    rows = []
+
+    def direct_llm():
+        return OllamaLLM(model='stub', base_url=server.url, client_kwargs={"timeout": args.timeout})
+
+    def scheduled_llm(max_queue=args.queue, timeout=args.timeout):
+        scheduler = llm_scheduler.LLMScheduler(max_concurrency=1, max_queue=max_queue, timeout=timeout)
+        return llm_scheduler.ScheduledLLM(llm=OllamaLLM(model='stub', base_url=server.url), scheduler=scheduler)
+
+    # burst
+    before = server.stats["generate"]
+    llm = direct_llm()
+    results = await asyncio.gather(*[timed_call(llm.ainvoke(f'question {i}')) for i in range(args.burst)])
+    rows.append(('burst: direct', outcome(results, server, before)))
+    # The stub keeps working through the abandoned requests; wait for it to go idle
+    await asyncio.sleep(args.burst * args.delay)
+
+    before = server.stats["generate"]
+    llm = scheduled_llm()
+    results = await asyncio.gather(*[timed_call(llm.ainvoke(f'question {i}')) for i in range(args.burst)])
+    rows.append(('burst: scheduled', outcome(results, server, before)))
+    await asyncio.sleep(1)
+
+    # coalesce: 4 distinct prompts
+    prompts = [f'same question {i % 4}' for i in range(args.burst // 2)]
+    before = server.stats["generate"]
+    llm = direct_llm()
+    results = await asyncio.gather(*[timed_call(llm.ainvoke(p)) for p in prompts])
+    rows.append((f'coalesce: direct ({len(prompts)} req)', outcome(results, server, before)))
+    await asyncio.sleep(len(prompts) * args.delay)
+
+    before = server.stats["generate"]
+    llm = scheduled_llm(max_queue=len(prompts), timeout=None)
+    results = await asyncio.gather(*[timed_call(llm.ainvoke(p)) for p in prompts])
+    rows.append((f'coalesce: scheduled ({len(prompts)} req)', outcome(results, server, before)))
+
+    # priority: a backlog of low priority calls, then two high priority ones
+    llm = scheduled_llm(max_queue=100, timeout=None)
+
+    async def ask(prompt, priority):
+        with llm_scheduler.request_context(priority=priority):
+            return await timed_call(llm.ainvoke(prompt))
+
+    low = [asyncio.ensure_future(ask(f'low {i}', 0)) for i in range(10)]
+    await asyncio.sleep(0.05)
+    high = [asyncio.ensure_future(ask(f'high {i}', 10)) for i in range(2)]
+    low_results, high_results = await asyncio.gather(asyncio.gather(*low), asyncio.gather(*high))
+    rows.append(('priority: low (10 queued first)', summarize([s for _, s in low_results])))
+    rows.append(('priority: high (2 queued after)', summarize([s for _, s in high_results])))
+
+    # cancel: half of the waiting callers go away (e.g. client disconnects)
+    before = server.stats["generate"]
+    llm = scheduled_llm(max_queue=100, timeout=None)
+    tasks = [asyncio.ensure_future(llm.ainvoke(f'cancel {i}')) for i in range(10)]
+    await asyncio.sleep(0.05)
+    for task in tasks[5:]:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    rows.append(('cancel: 10 queued, 5 cancelled', {"generate_calls": server.stats["generate"] - before,
+                                                      **{k: v for k, v in llm.scheduler.metrics().items()
+                                                         if k in ('completed', 'cancelled', 'queue_depth')}}))
+
+    print_table(f'{args.burst} request burst, {args.delay}s per generation, server parallel=1', rows)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,340 @@
+"""
+Accuracy and latency of the NL2SQL agent over a question set.
+
+Every question of the set (an .xlsx with input/output columns, e.g.
+files/train.xlsx or files/examples.xlsx) is sent through
+ai.call_agent_executor by --workers parallel workers, with the answer cache
+bypassed. For each question the run records what answered it (the fast path
+or the agent; --no-fast-path sends everything to the agent), the latency,
+the LLM calls and agent iterations, the prompt/completion tokens, and whether the generated SQL
+returns the same rows as the gold SQL on a SQLite fixture (execution match;
+row order only counts when the gold query has an ORDER BY).
+
+The results are written as JSON and Markdown. With --baseline the run is
+compared against an earlier JSON report and exits with status 1 when
+accuracy drops or p95 latency / tokens per question grow beyond the allowed
+margins. A missing baseline file is created from the run.
+
+    python benchmarks/bench_nl2sql.py --stub
+    python benchmarks/bench_nl2sql.py --stub --questions files/examples.xlsx --baseline benchmarks/nl2sql_baseline.json
+    python benchmarks/bench_nl2sql.py --model gemma2:2b --workers 2
+
+--stub answers with a deterministic few-shot stand-in (common.few_shot_llm)
+and a fake embedding (for the agent and the GENERATION_MODE=candidates
+LLMs), so the run needs no network; without it the agent
+uses Ollama as configured in ai.py.
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from common import ROOT_DIR, build_sqlite_db, few_shot_llm
+
+folder = tempfile.mkdtemp()
+os.environ['DB_URL'] = f'sqlite:///{folder}/{{dbname}}.db'
+
+import ai
+import example_index
+import functions
+import pandas as pd
+import tracing
+
+DEFAULT_QUESTIONS = os.path.join(ROOT_DIR, 'files', 'train.xlsx')
+DEFAULT_REPORT = os.path.join(ROOT_DIR, 'benchmarks', 'reports', 'nl2sql')
+
+
+class NoCache:
+    """Stands in for ai.answer_cache so every question reaches the agent"""
+
+    def get(self, question):
+        return None
+
+    def put(self, question, answer):
+        pass
+
+    def clear(self):
+        pass
+
+
+def build_fixture(path, rows):
+    """
+    account_statement with `rows` synthetic transactions, spread over
+    2017-2029 and with the statuses, types and account the examples ask about
+    """
+    build_sqlite_db(path, rows)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        UPDATE account_statement SET "TXN_DATE_TIME" = datetime("TXN_DATE_TIME", '+' || ("Sl" % 9) || ' years');
+        UPDATE account_statement SET "STATUS" = 'APPROVED' WHERE "STATUS" = 'SUCCESS' AND "Sl" % 2 = 0;
+        UPDATE account_statement SET "STATUS" = 'REVERSED' WHERE "Sl" % 7 = 0;
+        UPDATE account_statement SET "TXN_TYPE" = 'P2P' WHERE "Sl" % 11 = 0;
+        UPDATE account_statement SET "TXN_TYPE" = 'TOP UP (VIA USER)' WHERE "Sl" % 13 = 0;
+    ''')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def read_questions(path, limit=None):
+    """(question, gold SQL) pairs; column names are matched case-insensitively"""
+    frame = pd.read_excel(path)
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    pairs = [(str(row['input']).strip(), str(row['output']).replace('\\"', '"').strip())
+             for row in frame.to_dict(orient='records')]
+    return pairs[:limit] if limit else pairs
+
+
+def _value(value):
+    if isinstance(value, (float, Decimal)):
+        value = float(value)
+        return None if math.isnan(value) else round(value, 4)
+    return value
+
+
+def result_rows(sql):
+    """The rows of a query as comparable tuples"""
+    return [tuple(_value(value) for value in row) for row in ai.fetch(sql)]
+
+
+def execution_match(gold_rows, predicted_rows, ordered):
+    if ordered:
+        return gold_rows == predicted_rows
+    return sorted(gold_rows, key=repr) == sorted(predicted_rows, key=repr)
+
+
+def llm_stats(spans):
+    """LLM calls, agent iterations (calls outside tool runs) and tokens from a trace's spans"""
+    llm = [s for s in spans if s['name'] == 'llm']
+    tools = [(s['start_ms'], s['start_ms'] + s['duration_ms']) for s in spans if s['name'].startswith('tool:')]
+    iterations = sum(1 for s in llm if not any(start <= s['start_ms'] <= end for start, end in tools))
+    return {
+        'llm_calls': len(llm),
+        'iterations': iterations,
+        'prompt_tokens': sum(s.get('prompt_eval_count', 0) for s in llm),
+        'completion_tokens': sum(s.get('eval_count', 0) for s in llm),
+    }
+
+
+def run_question(index, question, gold_sql):
+    record = {'index': index, 'question': question, 'gold_sql': gold_sql, 'predicted_sql': None,
+              'match': None, 'error': None, 'path': None}
+    info = {}
+    with tracing.trace() as trace:
+        start = time.perf_counter()
+        try:
+            answer = ai.call_agent_executor(question, info)
+        except Exception as e:
+            answer = None
+            record['error'] = f'agent: {e}'
+        record['latency_s'] = time.perf_counter() - start
+    spans = trace.to_dict()['spans']
+    record['path'] = info.get('path')
+    record['similarity'] = next((s.get('similarity') for s in spans if s['name'] == 'fast_path'), None)
+    record.update(llm_stats(spans))
+    if answer is None:
+        return record
+
+    try:
+        gold_rows = result_rows(gold_sql)
+    except Exception as e:
+        # Broken gold SQL doesn't count against the agent
+        record['error'] = f'gold: {e}'
+        return record
+    predicted_sql, _ = ai.parse_answer(answer)
+    record['predicted_sql'] = predicted_sql
+    try:
+        predicted_rows = result_rows(ai.clean_query(predicted_sql))
+        record['match'] = execution_match(gold_rows, predicted_rows, 'order by' in ' '.join(gold_sql.lower().split()))
+    except Exception as e:
+        record['match'] = False
+        record['error'] = f'predicted: {e}'
+    return record
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def summarize_run(records, wall_seconds):
+    scored = [r for r in records if r['match'] is not None]
+    latencies = [r['latency_s'] for r in records]
+
+    def mean(key):
+        return statistics.mean(r[key] for r in records) if records else None
+
+    return {
+        'questions': len(records),
+        'scored': len(scored),
+        'gold_errors': sum(1 for r in records if (r['error'] or '').startswith('gold:')),
+        'agent_errors': sum(1 for r in records if (r['error'] or '').startswith('agent:')),
+        'accuracy': sum(1 for r in scored if r['match']) / len(scored) if scored else None,
+        'fast_path_share': sum(1 for r in records if r['path'] == 'fast_path') / len(records) if records else None,
+        'latency_p50_s': _percentile(latencies, 0.5),
+        'latency_p95_s': _percentile(latencies, 0.95),
+        'latency_mean_s': statistics.mean(latencies) if latencies else None,
+        'llm_calls_mean': mean('llm_calls'),
+        'iterations_mean': mean('iterations'),
+        'prompt_tokens_mean': mean('prompt_tokens'),
+        'completion_tokens_mean': mean('completion_tokens'),
+        'wall_s': wall_seconds,
+        'questions_per_s': len(records) / wall_seconds if wall_seconds else None,
+    }
+
+
+def compare(summary, baseline, max_accuracy_drop, max_latency_increase, max_token_increase):
+    """Regressions of the run against the baseline summary, as readable lines"""
+    regressions = []
+    if summary['accuracy'] is not None and baseline.get('accuracy') is not None:
+        if summary['accuracy'] < baseline['accuracy'] - max_accuracy_drop:
+            regressions.append(f"accuracy {summary['accuracy']:.1%} < baseline {baseline['accuracy']:.1%}")
+    for key, margin in (('latency_p95_s', max_latency_increase), ('prompt_tokens_mean', max_token_increase),
+                        ('completion_tokens_mean', max_token_increase)):
+        if summary.get(key) is not None and baseline.get(key):
+            if summary[key] > baseline[key] * (1 + margin):
+                regressions.append(f"{key} {summary[key]:.3f} > baseline {baseline[key]:.3f} (+{margin:.0%} allowed)")
+    return regressions
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return str(value)
+
+
+def markdown(report):
+    summary = report['summary']
+    lines = [
+        f"# NL2SQL benchmark ({report['config']['model']})",
+        '',
+        f"{report['created']} - {summary['questions']} questions from `{report['config']['questions']}`, "
+        f"{report['config']['workers']} workers",
+        '',
+        '| metric | value | baseline |',
+        '|---|---|---|',
+    ]
+    baseline = report.get('baseline') or {}
+    for key, value in summary.items():
+        lines.append(f'| {key} | {_format(value)} | {_format(baseline.get(key))} |')
+    if report.get('regressions'):
+        lines += ['', '**Regressions**', ''] + [f'- {line}' for line in report['regressions']]
+    lines += ['', '| # | match | path | latency s | iterations | tokens | question | error |',
+              '|---|---|---|---|---|---|---|---|']
+    for r in report['results']:
+        match = {True: 'yes', False: 'no', None: '-'}[r['match']]
+        tokens = r['prompt_tokens'] + r['completion_tokens']
+        question = r['question'].replace('|', '\\|')
+        error = (r['error'] or '').replace('|', '\\|').replace('\n', ' ')[:120]
+        lines.append(f"| {r['index']} | {match} | {r['path'] or '-'} | {r['latency_s']:.3f} | {r['iterations']} | {tokens} | {question} | {error} |")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', default=DEFAULT_QUESTIONS, help='.xlsx with input/output columns')
+    parser.add_argument('--limit', type=int, help='only the first N questions')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the fixture account_statement')
+    parser.add_argument('--stub', action='store_true', help='deterministic offline LLM and embedding')
+    parser.add_argument('--stub-check', action=argparse.BooleanOptionalAction, default=True,
+                        help='stub sends its query to the checker tool before answering')
+    parser.add_argument('--llm-ms', type=float, default=0.0, help='stub latency per LLM call')
+    parser.add_argument('--model', default=ai.DEFAULT_MODEL)
+    parser.add_argument('--fast-path', action=argparse.BooleanOptionalAction, default=True,
+                        help='answer close matches of few-shot examples without the agent')
+    parser.add_argument('--report', default=DEFAULT_REPORT, help='path prefix of the .json and .md reports')
+    parser.add_argument('--baseline', help='JSON report to compare against (written if missing)')
+    parser.add_argument('--update-baseline', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.0)
+    parser.add_argument('--max-latency-increase', type=float, default=0.25)
+    parser.add_argument('--max-token-increase', type=float, default=0.10)
+    args = parser.parse_args()
+
+    db_path = build_fixture(os.path.join(folder, f'{functions.IMPORT_DB}.db'), args.rows)
+    questions = read_questions(args.questions, args.limit)
+
+    ai.answer_cache = NoCache()
+    ai.fast_path_router.enabled = args.fast_path
+    if args.stub:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        # Keep the persisted index of the real embedding model out of it
+        example_index.INDEX_DIR = os.path.join(folder, 'example_index')
+        embedding = DeterministicFakeEmbedding(size=256)
+        ai._embedding = embedding
+        llm = few_shot_llm(args.llm_ms / 1000, check=args.stub_check)
+        ai.build_llm = lambda model=ai.DEFAULT_MODEL: (ai.ScheduledLLM(llm=llm, scheduler=ai.scheduler), embedding)
+        ai.build_candidate_llms = lambda model=ai.DEFAULT_MODEL: [ai.ScheduledLLM(llm=llm, scheduler=ai.scheduler)]
+        model = 'stub'
+    else:
+        model = args.model
+    # The agent's checker tool dry-runs queries against the fixture
+    ai.DEFAULT_DB_PATH = db_path
+    ai.get_agent.__defaults__ = (args.model, db_path)
+    ai.warm_up(args.model, db_path)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        records = list(pool.map(lambda item: run_question(item[0], *item[1]), enumerate(questions, 1)))
+    wall_seconds = time.perf_counter() - start
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'model': model,
+            'questions': os.path.relpath(args.questions, ROOT_DIR),
+            'workers': args.workers,
+            'fixture_rows': args.rows,
+            'checker_mode': ai.CHECKER_MODE,
+            'fast_path': args.fast_path,
+            'llm_ms': args.llm_ms if args.stub else None,
+        },
+        'summary': summarize_run(records, wall_seconds),
+        'results': records,
+    }
+
+    failed = False
+    if args.baseline:
+        if os.path.exists(args.baseline) and not args.update_baseline:
+            with open(args.baseline) as file:
+                report['baseline'] = json.load(file)['summary']
+            report['regressions'] = compare(report['summary'], report['baseline'], args.max_accuracy_drop,
+                                            args.max_latency_increase, args.max_token_increase)
+            failed = bool(report['regressions'])
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+            with open(args.baseline, 'w') as file:
+                json.dump(report, file, indent=2, default=str)
+            print(f'Baseline written to {args.baseline}')
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(f'{args.report}.json', 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    with open(f'{args.report}.md', 'w') as file:
+        file.write(markdown(report))
+
+    summary = report['summary']
+    accuracy = f"{summary['accuracy']:.1%}" if summary['accuracy'] is not None else '-'
+    print(f"\n{summary['questions']} questions ({model}, {args.workers} workers): accuracy {accuracy} "
+          f"of {summary['scored']} scored, p50 {summary['latency_p50_s']:.3f} s, p95 {summary['latency_p95_s']:.3f} s, "
+          f"{summary['iterations_mean']:.2f} iterations, {summary['fast_path_share']:.0%} on the fast path, "
+          f"{summary['prompt_tokens_mean'] + summary['completion_tokens_mean']:.0f} tokens per question")
+    print(f'Report: {args.report}.json, {args.report}.md')
+    for line in report.get('regressions', []):
+        print(f'REGRESSION: {line}')
+    functions.dispose_engines()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
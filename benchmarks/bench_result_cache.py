@@ -0,0 +1,95 @@
+"""
+Dashboard page loads through ai.fetch with and without the result cache.
+
+A page load runs the Dashboard's aggregate queries (per-day counts, top
+channels, sum/max/avg of the amount). The script measures repeated loads with
+the cache off, with it on, and with it on while every --write-every-th load
+inserts a row through functions.execute_sql, which bumps the table's version
+so the next load must re-run the queries. Each cached load is checked
+against a fresh run of the same queries. The inserted rows (TXN_TYPE
+'BENCH') are deleted at the end.
+
+    python benchmarks/bench_result_cache.py --rows 200000
+    python benchmarks/bench_result_cache.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import os
+import tempfile
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+PAGE = [
+    '''select date("TXN_DATE_TIME") as date, count("TXN_AMT") as total_amount
+       from {table} group by date("TXN_DATE_TIME") order by date''',
+    '''select "CHANNEL", sum("TXN_AMT") as total_amount from {table}
+       group by "CHANNEL" order by total_amount desc limit 10''',
+    'select sum("TXN_AMT") as total_amount from {table}',
+    'select max("TXN_AMT") as max_amount from {table}',
+    'select avg("TXN_AMT") as avg_amount from {table}',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; account_statement must already exist there')
+    parser.add_argument('--table', default='account_statement')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--loads', type=int, default=30)
+    parser.add_argument('--write-every', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    import ai
+    import functions
+
+    if not args.url:
+        build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows, args.table)
+    page = [' '.join(sql.format(table=args.table).split()) for sql in PAGE]
+    if functions.get_engine(functions.IMPORT_DB).dialect.name == 'postgresql':
+        page[0] = page[0].replace('date("TXN_DATE_TIME")', '"TXN_DATE_TIME"::date')
+
+    def load(cache=True):
+        return [list(ai.fetch(sql, cache=cache)) for sql in page]
+
+    def insert(i):
+        functions.execute_sql(args.table, 'insert', ['TXN_TYPE~BENCH', 'CHANNEL~APP', f'TXN_AMT~{i + 1}'],
+                              db_name=functions.IMPORT_DB)
+
+    rows = []
+    ai.result_cache.enabled = False
+    _, timings = timed(load, repeat=args.loads)
+    rows.append(('cache off', summarize(timings)))
+
+    ai.result_cache.enabled = True
+    ai.result_cache.clear()
+    _, timings = timed(load, repeat=args.loads)
+    rows.append(('cache on', {**summarize(timings), 'hit_ratio': ai.result_cache.stats()['hit_ratio']}))
+
+    ai.result_cache.clear()
+    before = ai.result_cache.stats()
+    timings, mismatches = [], 0
+    for i in range(args.loads):
+        if i and i % args.write_every == 0:
+            insert(i)
+        result, t = timed(load)
+        timings += t
+        mismatches += result != load(cache=False)
+    after = ai.result_cache.stats()
+    hits, misses = after['hits'] - before['hits'], after['misses'] - before['misses']
+    rows.append((f'cache on, insert every {args.write_every} loads', {
+        **summarize(timings), 'hit_ratio': hits / (hits + misses), 'stale': after['stale'] - before['stale'],
+        'mismatches': mismatches}))
+
+    functions.execute_sql(args.table, 'delete', ['"TXN_TYPE" = \'BENCH\''], db_name=functions.IMPORT_DB)
+    print_table(f'Dashboard page loads ({len(page)} queries, {args.rows} rows, '
+                f'{functions.get_engine(functions.IMPORT_DB).dialect.name})', rows)
+    print(f'\nCache: {ai.result_cache.stats()}')
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
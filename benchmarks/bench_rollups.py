@@ -0,0 +1,104 @@
+"""
+Aggregate queries over account_statement through ai.fetch, scanning the
+table (rollups off) against the rollup tables (rollups.py), as the table
+grows. Below ROLLUP_MIN_ROWS rows nothing is routed (routed False) and both
+columns scan. Also reports the time of a full refresh and of inserting rows
+with and without the rollups kept in step. The result cache is off.
+
+    python benchmarks/bench_rollups.py --sizes 10000 100000 1000000
+    python benchmarks/bench_rollups.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+
+With --url the existing account_statement is measured at its current size;
+the rows inserted for the write timings (TXN_ID 'ROLLUP BENCH') are deleted
+at the end.
+"""
+import argparse
+import os
+import tempfile
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+DAY = '"TXN_DATE_TIME"::date'
+
+QUERIES = {
+    'per day': f'select {DAY} as date, count("TXN_AMT") as total_amount from account_statement '
+               f'group by {DAY} order by date',
+    'top channels': 'select "CHANNEL", sum("TXN_AMT") as total_amount from account_statement '
+                    'group by "CHANNEL" order by total_amount desc limit 10',
+    'sum/max/avg': 'select sum("TXN_AMT") as total, max("TXN_AMT") as high, avg("TXN_AMT") as average '
+                   'from account_statement',
+    'type, one month': '''select "TXN_TYPE", count(*) as n, sum("TXN_AMT") as total from account_statement
+                          where "TXN_DATE_TIME" >= '2018-03-01' and "TXN_DATE_TIME" < '2018-04-01'
+                          group by "TXN_TYPE"''',
+    'account x type': 'select "STATEMENT_FOR_ACC", "TXN_TYPE", count(*) as n from account_statement '
+                      'group by "STATEMENT_FOR_ACC", "TXN_TYPE"',
+}
+
+
+def measure(ai, functions, label, repeat, write_rows):
+    manager = ai.rollup_manager
+    queries = {name: ai.clean_query(' '.join(sql.split())) for name, sql in QUERIES.items()}
+    refresh, seconds = timed(manager.refresh)
+    rows = [(f'{label}: refresh', f"{seconds[0] * 1000:.1f} ms, rollup rows "
+                                  f"{ {t.split('__')[-1]: info['rows'] for t, info in refresh['tables'].items()} }")]
+    for name, sql in queries.items():
+        timings = {}
+        for enabled in (False, True):
+            manager.enabled = enabled
+            _, t = timed(ai.fetch, sql, cache=False, repeat=repeat)
+            timings[enabled] = summarize(t)['p50_ms']
+        routed = ai.rollup_manager.route(sql, ai.sqlglot_dialect(functions.get_engine(functions.IMPORT_DB))) != sql
+        rows.append((f'  {name}', {'scan_ms': timings[False], 'rollup_ms': timings[True],
+                                   'speedup': timings[False] / timings[True], 'routed': routed}))
+
+    inserts = [{"function": "insert", "values": {"TXN_ID": "ROLLUP BENCH", "TXN_TYPE": "APP", "CHANNEL": "WEB",
+                                                 "TXN_AMT": float(i), "TXN_DATE_TIME": "2018-03-15"}}
+               for i in range(write_rows)]
+    timings = {}
+    for enabled in (False, True):
+        manager.enabled = enabled
+        # Refreshed and current before each write, as between imports
+        manager.refresh()
+        _, t = timed(functions.execute_batch, 'account_statement', inserts, db_name=functions.IMPORT_DB)
+        timings[enabled] = t[0] * 1000
+    rows.append((f'  insert {write_rows} rows', {'without_ms': timings[False], 'with_rollups_ms': timings[True],
+                                                 'still_current': manager.stats()['current']}))
+    functions.execute_sql('account_statement', 'delete', ['"TXN_ID" = \'ROLLUP BENCH\''], db_name=functions.IMPORT_DB)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; account_statement must already exist there')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 10000, 100000, 500000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--write-rows', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    # Refreshed explicitly below
+    os.environ['ROLLUP_REFRESH_DELAY'] = '3600'
+    import ai
+    import functions
+
+    ai.result_cache.enabled = False
+    dialect = functions.get_engine(functions.IMPORT_DB).dialect.name
+    rows = []
+    if args.url:
+        rows += measure(ai, functions, 'existing table', args.repeat, args.write_rows)
+    for size in ([] if args.url else args.sizes):
+        functions.dispose_engines()
+        build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), size)
+        functions.invalidate_schema(db_name=functions.IMPORT_DB)
+        rows += measure(ai, functions, f'{size} rows', args.repeat, args.write_rows)
+
+    print_table(f'Scan vs rollup, p50 of {args.repeat} runs ({dialect})', rows)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
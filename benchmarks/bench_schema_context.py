@@ -0,0 +1,124 @@
+"""
+Prompt size and LLM latency with the schema rendered by SQLDatabase with 20
+sample rows per table against the pre-rendered schema context
+(schema_context.py) of the tables selected for each question, for databases
+of 1, 10 and 50 tables.
+
+Latency is measured with the real OllamaLLM client against the stub server
+(benchmarks/stub_ollama.py), which charges `--prefill` seconds per 1000
+prompt tokens; the stub's hash embeddings make table selection arbitrary, so
+only its cost is meaningful here, not its accuracy.
+
+    python benchmarks/bench_schema_context.py --tables 1 10 50 --prefill 1.0
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from common import approx_tokens, build_sqlite_db, print_table, summarize
+import stub_ollama
+
+QUESTIONS = [
+    'How many successful cash in transactions were there in 2019?',
+    'What is the total amount sent by account 1794747109?',
+    'Show the 10 largest payments made through the app',
+    'Average transaction amount per channel',
+    'Which month had the most failed transactions?',
+]
+
+DOMAINS = ['loan_repayment', 'merchant_settlement', 'customer_profile', 'agent_float', 'card_authorization',
+           'bill_payment', 'remittance', 'refund', 'chargeback', 'kyc_review']
+
+
+def add_tables(path, count, rows=200, seed=7):
+    """Add `count` unrelated tables with a mix of id, date, amount and category columns"""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    for i in range(count):
+        name = f'{DOMAINS[i % len(DOMAINS)]}_{i}'
+        categories = [f'{name.upper()}_{c}' for c in 'ABCDE']
+        conn.execute(f'CREATE TABLE {name} (id BIGINT, created_date DATE, account BIGINT, amount DOUBLE PRECISION, '
+                     f'category TEXT, note TEXT, status TEXT)')
+        conn.executemany(f'INSERT INTO {name} VALUES (?, ?, ?, ?, ?, ?, ?)', [
+            (r, f'2020-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}', rnd.randint(1700000000, 1999999999),
+             round(rnd.uniform(1, 10000), 2), rnd.choice(categories), f'note {rnd.random():.8f}',
+             rnd.choice(['OPEN', 'CLOSED'])) for r in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--prefill', type=float, default=1.0, help='stub seconds per 1000 prompt tokens')
+    parser.add_argument('--delay', type=float, default=0.2, help='stub seconds per generation')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    from langchain_community.utilities import SQLDatabase
+    from langchain_ollama import OllamaLLM, OllamaEmbeddings
+    import ai
+    import functions
+    import schema_context
+
+    server = stub_ollama.serve(delay=args.delay, prefill=args.prefill, parallel=1)
+    llm = OllamaLLM(model='stub', base_url=server.url)
+    embedding = OllamaEmbeddings(model='stub', base_url=server.url)
+
+    def prompt(table_info, question):
+        return ai.system_prefix.replace('{table_info}', table_info) + f'\nQuestion: {question}'
+
+    def latency(prompts):
+        timings = []
+        for text in prompts:
+            start = time.perf_counter()
+            llm.invoke(text)
+            timings.append(time.perf_counter() - start)
+        return summarize(timings)["mean_ms"]
+
+    rows = []
+    for count in args.tables:
+        path = build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), rows=1000)
+        add_tables(path, count - 1)
+        functions.dispose_engines()
+        functions.invalidate_schema()
+        schema_context.invalidate()
+
+        db = SQLDatabase(functions.get_engine(functions.IMPORT_DB), sample_rows_in_table_info=20)
+        start = time.perf_counter()
+        sampled = db.get_table_info()
+        sampled_ms = (time.perf_counter() - start) * 1000
+        sampled_prompts = [prompt(sampled, q) for q in QUESTIONS]
+        rows.append((f'{count} tables: 20 sample rows', {
+            "prompt_tokens": approx_tokens(sampled_prompts[0]),
+            "render_ms": sampled_ms,
+            "llm_ms": latency(sampled_prompts),
+        }))
+
+        start = time.perf_counter()
+        schema_context.get_store(embedding)
+        build_ms = (time.perf_counter() - start) * 1000
+        selected, select_ms = [], []
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            selected.append(prompt(schema_context.table_info(question, embedding), question))
+            select_ms.append(time.perf_counter() - start)
+        rows.append((f'{count} tables: schema context', {
+            "prompt_tokens": round(sum(approx_tokens(p) for p in selected) / len(selected)),
+            "build_ms": build_ms,
+            "select_ms": summarize(select_ms)["mean_ms"],
+            "llm_ms": latency(selected),
+        }))
+
+    print_table(f'Prompt per question (k={schema_context.CONTEXT_TABLES}, prefill {args.prefill}s/1k tokens, '
+                f'generation {args.delay}s)', rows)
+    server.shutdown()
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
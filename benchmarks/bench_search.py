@@ -0,0 +1,70 @@
+"""
+fetch_data search latency against table size, without a search index and
+with each mode of functions.create_search_index ('trgm', 'tsvector').
+
+Each size is imported from a generated CSV through functions.import_file_to_db,
+then the DataPage query (search term, limit 50) is timed for a selective
+term, a common term and a term that matches nothing.
+
+    python benchmarks/bench_search.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+    python benchmarks/bench_search.py --sizes 10000,100000      # SQLite stand-in, no index modes
+"""
+import argparse
+import csv
+import os
+import tempfile
+
+from common import account_statement_rows, print_table, summarize, timed
+from bench_import import HEADER
+
+TERMS = [('selective', 'TXN0000001234'), ('common', 'cash out'), ('no match', 'zzzz')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}, defaults to a SQLite file')
+    parser.add_argument('--sizes', default='10000,100000,500000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    os.environ['DB_URL'] = args.url or f'sqlite:///{folder}/{{dbname}}.db'
+    import functions
+
+    table = 'bench_search'
+    postgres = functions.get_engine(functions.IMPORT_DB).dialect.name == 'postgresql'
+    modes = [None] + (list(functions.SEARCH_INDEX_MODES) if postgres else [])
+
+    for size in [int(n) for n in args.sizes.split(',')]:
+        path = os.path.join(folder, 'statement.csv')
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            writer.writerows(account_statement_rows(size))
+        functions.import_file_to_db(path, table)
+
+        results = []
+        for mode in modes:
+            if mode:
+                created = functions.create_search_index(table, mode)
+                if created['status'] != 'success':
+                    results.append((f"{mode}", created['message'].splitlines()[0]))
+                    continue
+                label = f"{mode} (built in {created['seconds']:.1f}s)"
+            else:
+                functions.drop_search_index(table) if postgres else None
+                label = 'no index (ILIKE scan)'
+            for name, term in TERMS:
+                fetch = lambda: functions.fetch_data(table, db_name=functions.IMPORT_DB, search=term, limit=50)
+                fetch()
+                (rows, _), timings = timed(fetch, repeat=args.repeat)
+                results.append((f"{label}: {name}", {**summarize(timings), "rows": len(rows)}))
+        if postgres:
+            functions.drop_search_index(table)
+        print_table(f"{size} rows", results)
+
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
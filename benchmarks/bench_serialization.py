@@ -0,0 +1,76 @@
+"""
+Time and size of turning a large query result into the JSON response body:
+the previous path (a dict per row, FastAPI's jsonable_encoder, json.dumps)
+against orjson with the records and compact row formats, in-process and
+through /api/fetch-data.
+
+    python benchmarks/bench_serialization.py --rows 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from common import build_sqlite_db, print_table, summarize, timed
+
+
+def legacy_dumps(columns, rows):
+    from fastapi.encoders import jsonable_encoder
+
+    def default(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    payload = {"data": [dict(zip(columns, row)) for row in rows], "columns": list(columns)}
+    return json.dumps(jsonable_encoder(payload), default=default).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--table', default='bench_serialization')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+    import functions
+    import main as app_module
+    import serialization
+
+    build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows, args.table)
+    with functions.get_engine(functions.IMPORT_DB).connect() as conn:
+        result = conn.execute(text(f'SELECT * FROM {args.table}'))
+        columns = list(result.keys())
+        rows = result.fetchall()
+
+    encoders = [
+        ('json + jsonable_encoder', lambda: legacy_dumps(columns, rows)),
+        ('orjson records', lambda: serialization.dumps(serialization.rows_payload(columns, rows))),
+        ('orjson compact', lambda: serialization.dumps(serialization.rows_payload(columns, rows, 'compact'))),
+    ]
+    table = []
+    for name, encode in encoders:
+        body, timings = timed(encode, repeat=args.repeat)
+        table.append((name, {'MB': len(body) / 1e6, **summarize(timings)}))
+    print_table(f'Encode {args.rows} rows x {len(columns)} columns', table)
+
+    client = TestClient(app_module.app)
+    table = []
+    for row_format in serialization.ROW_FORMATS:
+        request = {'table': args.table, 'db_name': functions.IMPORT_DB, 'limit': args.rows, 'row_format': row_format}
+        response, timings = timed(client.post, '/api/fetch-data', json=request, repeat=args.repeat)
+        assert response.status_code == 200, response.text
+        table.append((f'fetch-data {row_format}', {'MB': len(response.content) / 1e6, **summarize(timings)}))
+    print_table(f'/api/fetch-data, limit {args.rows}', table)
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Write throughput: N single-row calls to /api/execute-sql (one statement and
+one commit each) against one /api/execute-sql/batch call with the same N
+operations, for inserts and for updates.
+
+    python benchmarks/bench_write_batch.py --rows 10000
+    python benchmarks/bench_write_batch.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import print_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}, defaults to a SQLite file')
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    os.environ['DB_URL'] = args.url or f'sqlite:///{tempfile.mkdtemp()}/{{dbname}}.db'
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+    import functions
+    import main as app_module
+
+    client = TestClient(app_module.app)
+    engine = functions.get_engine(functions.IMPORT_DB)
+    table = 'bench_write'
+
+    def reset():
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+            connection.execute(text(f'CREATE TABLE {table} (id BIGINT PRIMARY KEY, name TEXT, amount DOUBLE PRECISION)'))
+        functions.invalidate_schema(table, functions.IMPORT_DB)
+
+    def single(function, **body):
+        response = client.post('/api/execute-sql', json={
+            'table': table, 'function': function, 'db_name': functions.IMPORT_DB, **body})
+        assert response.status_code == 200, response.text
+
+    def batch(operations):
+        response = client.post('/api/execute-sql/batch', json={
+            'table': table, 'db_name': functions.IMPORT_DB, 'operations': operations})
+        assert response.status_code == 200, response.text
+
+    results = []
+    n = args.rows
+
+    reset()
+    start = time.perf_counter()
+    for i in range(n):
+        single('insert', condition=[f'id~{i}', f'name~row {i}', f'amount~{i * 1.5}'])
+    results.append((f'insert: {n} single calls', {'seconds': time.perf_counter() - start}))
+
+    reset()
+    start = time.perf_counter()
+    batch([{'function': 'insert', 'values': {'id': i, 'name': f'row {i}', 'amount': i * 1.5}} for i in range(n)])
+    results.append((f'insert: 1 batch of {n}', {'seconds': time.perf_counter() - start}))
+
+    start = time.perf_counter()
+    for i in range(n):
+        single('update', condition=[f'id = {i}'], update_values={'amount': i * 2.0})
+    results.append((f'update: {n} single calls', {'seconds': time.perf_counter() - start}))
+
+    start = time.perf_counter()
+    batch([{'function': 'update', 'values': {'amount': i * 3.0}, 'where': {'id': i}} for i in range(n)])
+    results.append((f'update: 1 batch of {n}', {'seconds': time.perf_counter() - start}))
+
+    for name, stats in results:
+        stats['rows_per_second'] = round(n / stats['seconds'])
+    print_table(f'{n} operations ({engine.dialect.name})', results)
+
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+    functions.dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Equivalence check of the rollup routing (rollups.py): every query below runs
+once on account_statement as written and once as ai.fetch would run it, and
+both results must be identical (same columns, same values and types; floats
+within 1e-9 relative, since a sum of sums adds in another order). Queries
+marked False must not be routed at all.
+
+The check is repeated after inserts through functions.execute_sql and
+execute_batch (applied to the rollups in the same transaction, so they must
+still be routed), after an update (the rollups are stale until refreshed, so
+nothing may be routed), after the refresh, after an insert on a connection
+of its own (a write from outside the server: the change counters must stop
+the routing) and after the refresh that follows. The rows it writes (TXN_ID
+'ROLLUP CHECK') are deleted at the end. Exits with status 1 on any mismatch.
+
+    python benchmarks/check_rollups.py --rows 50000
+    python benchmarks/check_rollups.py --url "postgresql://postgres:pw@localhost:5432/{dbname}"
+"""
+import argparse
+import decimal
+import math
+import os
+import sys
+import tempfile
+
+from common import build_sqlite_db
+
+DAY = '"TXN_DATE_TIME"::date'
+
+# (query in PostgreSQL syntax, should it be routed to a rollup)
+QUERIES = [
+    # The Dashboard's charts
+    ('SELECT "TXN_TYPE" FROM account_statement as remittance GROUP BY "TXN_TYPE"', True),
+    (f'select {DAY} as date, COUNT("TXN_AMT") as total_amount from account_statement as remittance '
+     f'group by {DAY} order by date', True),
+    ('select "CHANNEL", SUM("TXN_AMT") as total_amount from account_statement as remittance '
+     'GROUP BY "CHANNEL" ORDER BY total_amount DESC LIMIT 10', True),
+    ('select sum("TXN_AMT") as total_amount from account_statement', True),
+    ('select max("TXN_AMT") as max_amount from account_statement', True),
+    ('select avg("TXN_AMT") as avg_amount from account_statement', True),
+    (f'''select {DAY} as date, COUNT("TXN_AMT") as total_amount from account_statement
+         where "TXN_TYPE" = 'APP' group by {DAY} order by date''', True),
+    # Groupings and filters on the dimensions
+    ('''select "TXN_TYPE", count(*) as n, sum("TXN_AMT") as total, min("TXN_AMT") as low, max("TXN_AMT") as high,
+        avg("TXN_AMT") as average from account_statement group by "TXN_TYPE"''', True),
+    ('''select "STATEMENT_FOR_ACC", "TXN_TYPE", count(*) as n, sum("TXN_AMT") as total
+        from account_statement group by "STATEMENT_FOR_ACC", "TXN_TYPE"''', True),
+    ('''select count(*), sum("TXN_AMT") from account_statement
+        where "TXN_TYPE" = 'APP' and "CHANNEL" in ('USSD', 'WEB')''', True),
+    ('''select "CHANNEL", count("CHANNEL") as n from account_statement
+        where "TXN_TYPE" = 'CASH IN' or "CHANNEL" = 'WEB' group by "CHANNEL"''', True),
+    ('''select "TXN_TYPE", max("TXN_AMT") from account_statement group by "TXN_TYPE"
+        order by max("TXN_AMT") desc limit 3''', True),
+    ('''select "CHANNEL", sum("TXN_AMT") as total from account_statement group by 1
+        having count(*) > 10 order by total''', True),
+    ('select count(distinct "TXN_TYPE") as types, count(*) as n from account_statement', True),
+    ('select distinct "CHANNEL" from account_statement', True),
+    ('select avg("TXN_AMT") * 2 as twice, 100 / avg("TXN_AMT") as ratio from account_statement', True),
+    # Whole days of TXN_DATE_TIME
+    ('''select count(*) as n, sum("TXN_AMT") as total from account_statement
+        where "TXN_DATE_TIME" >= '2018-03-01' and "TXN_DATE_TIME" < '2018-04-01 00:00:00' ''', True),
+    ('''select "TXN_TYPE", count(*) as n, avg("TXN_AMT") as average from account_statement
+        where "TXN_DATE_TIME" >= '2019-01-01' and "TXN_DATE_TIME" < '2020-01-01' group by "TXN_TYPE"''', True),
+    (f'''select {DAY} as day, sum("TXN_AMT") as total from account_statement
+         where "STATEMENT_FOR_ACC" = 1711000000 and {DAY} >= '2018-06-01' and {DAY} < '2018-07-01'
+         group by {DAY} order by day''', True),
+    (f'select min({DAY}) as first_day, max({DAY}) as last_day from account_statement', True),
+    # Nothing matches
+    ('''select count(*) as n, sum("TXN_AMT") as total, avg("TXN_AMT") as average from account_statement
+        where "TXN_TYPE" = 'NO SUCH TYPE' ''', True),
+    # Need the transaction rows
+    ('''select count(*) as n from account_statement
+        where "TXN_DATE_TIME" between '2018-03-01' and '2018-03-31' ''', False),
+    ('''select count(*) as n from account_statement where "TXN_DATE_TIME" > '2018-03-01' ''', False),
+    ('''select count(*) as n from account_statement where "STATUS" = 'FAILED' ''', False),
+    ('select count(*) as n from account_statement where "TXN_AMT" > 25000', False),
+    ('select count(distinct "TXN_ID") as n from account_statement', False),
+    ('select sum("AVAILABLE_BLC_AFTER_TXN") as total from account_statement', False),
+    ('select "TXN_TYPE", "TXN_AMT" from account_statement where "CHANNEL" = \'WEB\' limit 5', False),
+]
+
+
+def same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    if isinstance(a, decimal.Decimal) and isinstance(b, decimal.Decimal):
+        return abs(a - b) <= abs(a) * decimal.Decimal('1e-9')
+    return type(a) is type(b) and a == b
+
+
+def run(ai, functions, sql, routed):
+    """(query, error or None) for one query on the base table against ai.fetch's version"""
+    from sqlalchemy import text
+
+    engine = functions.get_engine(functions.IMPORT_DB)
+    cleaned = ai.clean_query(' '.join(sql.split()))
+    rewritten = ai.rollup_manager.route(cleaned, ai.sqlglot_dialect(engine))
+    if (rewritten != cleaned) != routed:
+        return cleaned, f"{'not ' if routed else ''}routed, expected {'' if routed else 'not '}to be"
+    with engine.connect() as connection:
+        expected = connection.execute(text(cleaned))
+        columns, rows = list(expected.keys()), expected.fetchall()
+        actual = connection.execute(text(rewritten))
+        actual_columns, actual_rows = list(actual.keys()), actual.fetchall()
+    if columns != actual_columns:
+        return cleaned, f"columns {actual_columns}, expected {columns}"
+    if 'ORDER BY' not in cleaned.upper():
+        rows, actual_rows = sorted(rows, key=repr), sorted(actual_rows, key=repr)
+    if len(rows) != len(actual_rows):
+        return cleaned, f"{len(actual_rows)} rows, expected {len(rows)}"
+    for row, actual_row in zip(rows, actual_rows):
+        if not all(same(a, b) for a, b in zip(row, actual_row)):
+            return cleaned, f"row {tuple(actual_row)}, expected {tuple(row)}"
+    return cleaned, None
+
+
+def check(ai, functions, label, routed=True):
+    failures = 0
+    for sql, expect in QUERIES:
+        query, error = run(ai, functions, sql, expect and routed)
+        if error:
+            failures += 1
+            print(f"  FAIL {query}\n       {error}")
+    print(f"{label}: {len(QUERIES) - failures}/{len(QUERIES)} queries equivalent "
+          f"(rollups {'current' if ai.rollup_manager.stats()['current'] else 'stale'})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='engine URL template with {dbname}; account_statement must already exist there')
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DB_URL'] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ['DB_URL'] = f'sqlite:///{directory}/{{dbname}}.db'
+    # Only the refreshes below; no background rebuild in the middle of a check
+    os.environ['ROLLUP_REFRESH_DELAY'] = '3600'
+    # Every rollup is used, however small the table
+    os.environ['ROLLUP_MAX_RATIO'] = '1000'
+    os.environ['ROLLUP_MIN_ROWS'] = '0'
+    # Read the change counters on every query
+    os.environ['ROLLUP_MAX_AGE'] = '0'
+    import ai
+    import functions
+
+    if not args.url:
+        build_sqlite_db(os.path.join(directory, f'{functions.IMPORT_DB}.db'), args.rows)
+    table, db = 'account_statement', functions.IMPORT_DB
+    manager = ai.rollup_manager
+    manager.refresh()
+    print(f"Rollups: { {t: info['rows'] for t, info in manager.stats()['tables'].items()} }")
+
+    failures = check(ai, functions, 'after refresh')
+
+    # A new group, and one without an amount in an existing group (both without a day: execute_sql can't
+    # insert a date string on SQLite)
+    functions.execute_sql(table, 'insert', ['TXN_ID~ROLLUP CHECK', 'TXN_TYPE~ROLLUP CHECK', 'CHANNEL~WEB',
+                                            'TXN_AMT~1234.5', 'STATEMENT_FOR_ACC~1711000000'], db_name=db)
+    functions.execute_sql(table, 'insert', ['TXN_ID~ROLLUP CHECK', 'TXN_TYPE~APP', 'CHANNEL~USSD',
+                                            'STATEMENT_FOR_ACC~1711000000'], db_name=db)
+    failures += check(ai, functions, 'after execute_sql inserts')
+
+    functions.execute_batch(table, [
+        {"function": "insert", "values": {"TXN_ID": "ROLLUP CHECK", "TXN_TYPE": "ROLLUP CHECK", "CHANNEL": "APP", "TXN_AMT": amount,
+                                          "STATEMENT_FOR_ACC": 1822334455, "TXN_DATE_TIME": f"2019-0{i + 1}-01"}}
+        for i, amount in enumerate([99999.0, 0.01, 42.0])], db_name=db)
+    failures += check(ai, functions, 'after execute_batch inserts')
+
+    functions.execute_sql(table, 'update', ['"TXN_ID" = \'ROLLUP CHECK\''], {"TXN_AMT": 7.0}, db_name=db)
+    failures += check(ai, functions, 'after an update', routed=False)
+    manager.refresh()
+    failures += check(ai, functions, 'after the refresh')
+
+    from sqlalchemy import create_engine, text
+    outside = create_engine(os.environ['DB_URL'].format(dbname=db))
+    with outside.begin() as connection:
+        connection.execute(text(f'''INSERT INTO "{table}" ("TXN_ID", "TXN_TYPE", "CHANNEL", "TXN_AMT")
+                                    VALUES ('ROLLUP CHECK', 'APP', 'WEB', 5)'''))
+    outside.dispose()
+    failures += check(ai, functions, 'after an outside insert', routed=False)
+    manager.refresh()
+    failures += check(ai, functions, 'after the refresh')
+
+    functions.execute_sql(table, 'delete', ['"TXN_ID" = \'ROLLUP CHECK\''], db_name=db)
+    manager.refresh()
+    print(f"\n{manager.stats()}")
+    functions.dispose_engines()
+    if failures:
+        print(f"\n{failures} mismatches")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
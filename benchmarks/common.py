@@ -0,0 +1,240 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against a local SQLite stand-in for the account_statement
+table so they can be executed without PostgreSQL or Ollama.
+"""
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Make the backend modules importable when running `python benchmarks/<script>.py`
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+TXN_TYPES = ['CASH IN', 'CASH OUT', 'SEND MONEY', 'PAYMENT', 'APP', 'MOBILE RECHARGE']
+CHANNELS = ['APP', 'USSD', 'AGENT', 'WEB']
+
+ACCOUNT_STATEMENT_DDL = '''
+CREATE TABLE account_statement (
+    "Sl" BIGINT,
+    "TXN_DATE_TIME" TIMESTAMP,
+    "TXN_ID" TEXT,
+    "TXN_TYPE" TEXT,
+    "STATEMENT_FOR_ACC" BIGINT,
+    "TXN_WITH_ACC" TEXT,
+    "CHANNEL" TEXT,
+    "REFERENCE" DOUBLE PRECISION,
+    "TXN_TYPE_DR_CR" TEXT,
+    "TXN_AMT" DOUBLE PRECISION,
+    "AVAILABLE_BLC_AFTER_TXN" DOUBLE PRECISION,
+    "STATUS" TEXT
+)
+'''
+
+
+def account_statement_rows(n, seed=42):
+    rnd = random.Random(seed)
+    start = datetime(2017, 1, 1)
+    balance = 0.0
+    for i in range(n):
+        amount = round(rnd.uniform(10, 50000), 2)
+        dr_cr = rnd.choice(['DR', 'CR'])
+        balance += amount if dr_cr == 'CR' else -amount
+        yield (
+            i + 1,
+            (start + timedelta(minutes=rnd.randint(0, 60 * 24 * 365 * 4))).strftime('%Y-%m-%d %H:%M:%S'),
+            f'TXN{i:010d}',
+            rnd.choice(TXN_TYPES),
+            rnd.choice([1794747109, 1711000000, 1822334455, 1933445566]),
+            f'0{rnd.randint(1700000000, 1999999999)}',
+            rnd.choice(CHANNELS),
+            float(rnd.randint(1000, 9999)),
+            dr_cr,
+            amount,
+            round(balance, 2),
+            rnd.choice(['SUCCESS', 'SUCCESS', 'SUCCESS', 'FAILED']),
+        )
+
+
+def build_sqlite_db(path, rows=1000, table='account_statement'):
+    """Create (or replace) a SQLite file holding `rows` synthetic transactions"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(ACCOUNT_STATEMENT_DDL.replace('account_statement', table, 1))
+    conn.executemany(f'INSERT INTO {table} VALUES ({",".join("?" * 12)})', account_statement_rows(rows))
+    conn.commit()
+    conn.close()
+    return path
+
+
+STUB_ANSWER = 'Final Answer: SQL Query: select count(*) from account_statement;\nDescription: Counts all transactions'
+
+
+def SlowFakeEmbedding(size=256, delay=0.0):
+    """Deterministic embedding that sleeps per text to mimic an Ollama round trip"""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    class _SlowFakeEmbedding(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            time.sleep(delay * len(texts))
+            return super().embed_documents(texts)
+
+        def embed_query(self, text):
+            time.sleep(delay)
+            return super().embed_query(text)
+
+    return _SlowFakeEmbedding(size=size)
+
+
+def HashingEmbedding(size=1024):
+    """
+    Bag-of-words embedding: every word is hashed to a dimension, so texts
+    sharing most of their words (paraphrases) get close vectors, unlike
+    DeterministicFakeEmbedding where any change gives an unrelated vector
+    """
+    import hashlib
+    from langchain_core.embeddings import Embeddings
+
+    class _HashingEmbedding(Embeddings):
+        def embed_query(self, text):
+            vector = [0.0] * size
+            for word in re.findall(r'<\w+>|\w+', text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % size] += 1.0
+            norm = sum(v * v for v in vector) ** 0.5 or 1.0
+            return [v / norm for v in vector]
+
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+    return _HashingEmbedding()
+
+
+def stub_llm(answer=STUB_ANSWER, delay=0.0):
+    """Fixed-answer LLM that takes `delay` seconds per call (sync and async)"""
+    import asyncio
+    from langchain_core.language_models import FakeListLLM
+
+    class _StubLLM(FakeListLLM):
+        def _call(self, *args, **kwargs):
+            time.sleep(delay)
+            return super()._call(*args, **kwargs)
+
+        async def _acall(self, *args, **kwargs):
+            await asyncio.sleep(delay)
+            return await super()._acall(*args, **kwargs)
+
+    return _StubLLM(responses=[answer])
+
+
+def use_stub_llm(ai, answer=STUB_ANSWER, embedding=None, delay=0.0):
+    """Point ai.build_llm at a fixed-answer LLM and a fake embedding model"""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    embedding = embedding or DeterministicFakeEmbedding(size=256)
+    ai._embedding = embedding
+
+    def build_llm(model=ai.DEFAULT_MODEL):
+        # Still construct the real client so its setup cost is part of the measurement
+        ai.OllamaLLM(model=model, temperature=0.1)
+        return stub_llm(answer, delay), embedding
+
+    ai.build_llm = build_llm
+
+
+def approx_tokens(text):
+    """Rough token count (words and punctuation); close enough to compare prompt sizes"""
+    return len(re.findall(r'\w+|[^\w\s]', text))
+
+
+def _words(text):
+    return set(re.findall(r'\w+', text.lower()))
+
+
+def few_shot_llm(delay=0.0, check=True):
+    """
+    Deterministic, offline stand-in for the agent's LLM that answers from the
+    prompt itself: the SQL of the few-shot example whose input shares the most
+    words with the question. With check=True it first sends that SQL to the
+    checker tool (and answers the checker's own prompt with "No Mistakes
+    Found"), like a model following the ReAct format; candidate prompts
+    (GENERATION_MODE=candidates) get the SQL straight away. Each call sleeps
+    `delay` seconds and reports approximate prompt/completion token counts
+    the way Ollama does (prompt_eval_count / eval_count).
+    """
+    from langchain_core.language_models.llms import BaseLLM
+    from langchain_core.outputs import Generation, LLMResult
+
+    example_re = re.compile(r'User input: (.*?)\nSQL output: (.*?)(?=\nDescription: |\n\n|\Z)', re.S)
+
+    def answer(prompt):
+        if 'Double check the' in prompt:
+            return 'No Mistakes Found'
+        question = prompt.rsplit('Question: ', 1)[-1].split('\n', 1)[0]
+        examples = example_re.findall(prompt)
+        if not examples:
+            return "Final Answer: SQL Query: None\nDescription: I don't know"
+        best = max(examples, key=lambda example: len(_words(example[0]) & _words(question)))
+        sql = ' '.join(best[1].split())
+        if 'sql_db_query_checker' not in prompt:
+            # A candidate prompt (GENERATION_MODE=candidates): no tools, just the answer
+            return f'SQL Query: {sql}\nDescription: Answers "{best[0]}"'
+        if check and 'Observation:' not in prompt.rsplit('Question: ', 1)[-1]:
+            return f'Thought: I should check the query\nAction: sql_db_query_checker\nAction Input: {sql}'
+        return f'Thought: I now know the final answer\nFinal Answer: SQL Query: {sql}\nDescription: Answers "{best[0]}"'
+
+    class _FewShotLLM(BaseLLM):
+        @property
+        def _llm_type(self):
+            return 'few-shot-stub'
+
+        def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+            generations = []
+            for prompt in prompts:
+                time.sleep(delay)
+                text = answer(prompt)
+                generations.append([Generation(text=text, generation_info={
+                    'prompt_eval_count': approx_tokens(prompt),
+                    'eval_count': approx_tokens(text),
+                })])
+            return LLMResult(generations=generations)
+
+    return _FewShotLLM()
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """Run func `repeat` times and return (last_result, list_of_seconds)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    for name, stats in rows:
+        if isinstance(stats, dict):
+            parts = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items())
+        else:
+            parts = str(stats)
+        print(f"  {name:<32} {parts}")
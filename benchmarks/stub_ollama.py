@@ -0,0 +1,124 @@
+"""
+Minimal stand-in for the Ollama HTTP API (/api/generate, /api/embed), so the
+real OllamaLLM/OllamaEmbeddings clients and the LLM scheduler can be exercised
+without Ollama or a model.
+
+Every generate call sleeps `delay` seconds and answers with a fixed text, plus
+`prefill` seconds per 1000 prompt tokens to model prompt evaluation. Like
+Ollama, only `parallel` generations run at once and the rest wait inside the
+server. Point the app at it with OLLAMA_HOST:
+
+    python benchmarks/stub_ollama.py --port 11555 --delay 0.5 --parallel 1
+    OLLAMA_HOST=http://127.0.0.1:11555 uvicorn main:app
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import STUB_ANSWER, approx_tokens
+
+
+def _vector(text, size=64):
+    digest = hashlib.sha256(text.encode()).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(size)]
+
+
+def serve(port=0, answer=STUB_ANSWER, delay=0.5, parallel=1, prefill=0.0):
+    """Start the stub in a background thread; returns the server (server.url, server.stats)"""
+    slots = threading.Semaphore(parallel)
+    stats = {"generate": 0, "embed": 0, "disconnected": 0, "prompt_tokens": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, body):
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._json({"models": []})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if self.path == '/api/embed':
+                with lock:
+                    stats["embed"] += 1
+                texts = body.get('input') or []
+                texts = [texts] if isinstance(texts, str) else texts
+                self._json({"model": body.get('model'), "embeddings": [_vector(t) for t in texts]})
+                return
+            if self.path != '/api/generate':
+                self.send_error(404)
+                return
+
+            with slots:
+                prompt_tokens = approx_tokens(body.get('prompt', ''))
+                with lock:
+                    stats["generate"] += 1
+                    stats["prompt_tokens"] += prompt_tokens
+                time.sleep(prefill * prompt_tokens / 1000)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                created = datetime.now(timezone.utc).isoformat()
+                words = answer.split(' ')
+                try:
+                    for i, word in enumerate(words):
+                        # Spread the delay over the tokens, like a real generation
+                        time.sleep(delay / len(words))
+                        self._chunk({"model": body.get('model'), "created_at": created,
+                                     "response": word + (' ' if i < len(words) - 1 else ''), "done": False})
+                    self._chunk({"model": body.get('model'), "created_at": created, "response": "",
+                                 "done": True, "done_reason": "stop", "prompt_eval_count": prompt_tokens,
+                                 "eval_count": len(words), "eval_duration": int(delay * 1e9)})
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away; a real server stops generating here too
+                    with lock:
+                        stats["disconnected"] += 1
+
+        def _chunk(self, message):
+            data = (json.dumps(message) + '\n').encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=11555)
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds per generate call')
+    parser.add_argument('--parallel', type=int, default=1, help='generations served at once')
+    parser.add_argument('--prefill', type=float, default=0.0, help='seconds per 1000 prompt tokens')
+    args = parser.parse_args()
+
+    server = serve(args.port, delay=args.delay, parallel=args.parallel, prefill=args.prefill)
+    print(f"Stub Ollama listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
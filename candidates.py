@@ -0,0 +1,176 @@
+from sqlglot import exp
+from collections import Counter
+import asyncio
+import re
+import sqlglot
+
+# "SQL Query: ... Description: ...", optionally after "Final Answer:" and with the SQL in a code fence
+_ANSWER = re.compile(r'SQL Query:\s*(.*?)\s*(?:Description:\s*(.*))?\Z', re.S)
+_FENCE = re.compile(r'```(?:sql)?', re.I)
+
+# Stops a model that goes on to make up the next question
+STOP = ["\nQuestion:", "\nUser input:"]
+
+
+def parse_candidate(text):
+    """(sql, description) of a candidate answer; sql is None when the model declined"""
+    text = _FENCE.sub('', text).strip()
+    match = _ANSWER.search(text)
+    if match is None:
+        sql, description = text, ""
+    else:
+        sql, description = match[1].strip(), (match[2] or "").strip()
+    sql = sql.strip().rstrip(';').strip()
+    if not sql or sql.lower() in ('none', 'null', "i don't know"):
+        return None, description
+    return sql, description
+
+
+def read_only_statement(sql, dialect="postgres"):
+    """(parsed statement, None) if sql is a single read-only query, else (None, (reason, message))"""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except sqlglot.errors.SqlglotError as e:
+        return None, ("parse", str(e).splitlines()[0])
+    if len(statements) != 1:
+        return None, ("statements", f"{len(statements)} statements")
+    statement = statements[0]
+    if not isinstance(statement, exp.Query) or statement.find(exp.DML, exp.DDL):
+        return None, ("not_select", "not a read-only query")
+    return statement, None
+
+
+def validate_query(sql, db, clean=None):
+    """
+    None if sql is a single read-only query whose EXPLAIN succeeds against db
+    (after clean if given, i.e. as it will run), else (reason, message).
+    Blocking: runs EXPLAIN on db.
+    """
+    statement, error = read_only_statement(sql)
+    if error is not None:
+        return error
+    query = clean(sql) if clean is not None else statement.sql(dialect=db.dialect)
+    if not query:
+        return "not_select", "prohibited keyword"
+    try:
+        db.run(f"EXPLAIN {query}")
+    except Exception as e:
+        return "explain", str(e).splitlines()[0]
+    return None
+
+
+class CandidateGenerator:
+    """
+    Writes the SQL for a question by asking the LLM for several candidate
+    queries at once instead of letting the agent draft, check and retry one
+    after the other. The candidates differ in their few-shot examples
+    (candidate i > 0 leaves out the i-th closest one) and in temperature
+    (one LLM per temperature, used in turn), so they are distinct LLM calls
+    and not coalesced by the scheduler.
+
+    Each candidate is checked with validate_query as soon as it arrives.
+    The first valid one is the answer and the calls still running are
+    cancelled. If every candidate declines
+    ("SQL Query: None"), the first decline is the answer; if none is valid,
+    generate returns None.
+    """
+
+    def __init__(self, llms, example_selector, db, prompt, example_prompt, count=3, clean=None):
+        self.llms = llms
+        self.example_selector = example_selector
+        self.db = db
+        self.clean = clean
+        self.prompt = prompt
+        self.example_prompt = example_prompt
+        self.count = count
+        self.questions = 0
+        self.answered = 0
+        self.declined = 0
+        self.no_valid = 0
+        self.generated = 0
+        self.cancelled = 0
+        self.invalid = Counter()
+        self.winners = Counter()
+
+    def prompt_inputs(self, question, table_info):
+        """The prompt variables of every candidate (blocking: embeds the question to select the examples)"""
+        examples = self.example_selector.select_examples({"input": question})
+        inputs = []
+        for i in range(self.count):
+            subset = [e for j, e in enumerate(examples) if j != i - 1] if len(examples) > 1 else examples
+            rendered = "\n\n".join(self.example_prompt.format(**e) for e in subset)
+            inputs.append({"input": question, "table_info": table_info, "examples": rendered})
+        return inputs
+
+    def validate(self, sql):
+        """None if the query is valid, else (reason, message) (blocking: runs EXPLAIN on db)"""
+        return validate_query(sql, self.db, self.clean)
+
+    async def _candidate(self, index, inputs, callbacks):
+        chain = self.prompt | self.llms[index % len(self.llms)].bind(stop=STOP)
+        text = await chain.ainvoke(inputs, config={"callbacks": callbacks or []})
+        sql, description = parse_candidate(text)
+        if sql is None:
+            return index, None, description, ("declined", "")
+        error = await asyncio.to_thread(self.validate, sql)
+        return index, sql, description, error
+
+    async def generate(self, question, table_info, callbacks=None, info=None):
+        """The answer ("SQL Query: ...\\nDescription: ...") or None; info gets the candidates' outcomes"""
+        info = {} if info is None else info
+        self.questions += 1
+        inputs = await asyncio.to_thread(self.prompt_inputs, question, table_info)
+        tasks = {asyncio.ensure_future(self._candidate(i, v, callbacks)) for i, v in enumerate(inputs)}
+        self.generated += len(tasks)
+        errors = []
+        failures = []
+        declined = None
+        try:
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        failures.append(task.exception())
+                        error = ("error", str(task.exception()))
+                        self.invalid[error[0]] += 1
+                        errors.append(error)
+                        continue
+                    index, sql, description, error = task.result()
+                    if error is None:
+                        self.answered += 1
+                        self.winners[index] += 1
+                        self.cancelled += len(pending)
+                        info.update(winner=index, invalid=len(errors), cancelled=len(pending))
+                        return f"SQL Query: {sql}\nDescription: {description}"
+                    if error[0] == "declined" and declined is None:
+                        declined = description
+                    self.invalid[error[0]] += 1
+                    errors.append(error)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if len(failures) == len(tasks):
+            # e.g. the scheduler is full or the deadline passed: the agent would fare no better
+            raise failures[0]
+        info.update(winner=None, invalid=len(errors), errors=[f"{r}: {e}" if e else r for r, e in errors])
+        if declined is not None and all(r == "declined" for r, _ in errors):
+            self.declined += 1
+            return f"SQL Query: None\nDescription: {declined}"
+        self.no_valid += 1
+        return None
+
+    def stats(self):
+        return {
+            "candidates": self.count,
+            "questions": self.questions,
+            "answered": self.answered,
+            "declined": self.declined,
+            "no_valid": self.no_valid,
+            "generated": self.generated,
+            "cancelled": self.cancelled,
+            "invalid": dict(self.invalid),
+            "winners": dict(self.winners),
+        }
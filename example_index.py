@@ -0,0 +1,179 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.example_selectors import SemanticSimilarityExampleSelector
+import faiss
+import hashlib
+import json
+import pickle
+import shutil
+import time
+import os
+import pandas as pd
+
+# Bump when the on-disk layout changes so old artifacts are rebuilt
+ARTIFACT_VERSION = 1
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_PATH = os.path.join(current_dir, 'files', 'examples.xlsx')
+INDEX_DIR = os.path.join(current_dir, 'files', 'example_index')
+INPUT_KEYS = ["input"]
+# Older artifacts are kept so appended examples can reuse their vectors
+KEEP_ARTIFACTS = 3
+# Embedded once per load to learn the embedding's dimension
+PROBE = "example index probe"
+
+
+def read_examples(path=EXAMPLES_PATH):
+    return pd.read_excel(path).to_dict(orient='records')
+
+
+def artifact_key(path, model, dimension):
+    """Content hash of the examples file, the embedding model and dimension and the artifact version"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(f"|{model}|{dimension}|{ARTIFACT_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def embedding_dimension(embedding):
+    return len(embedding.embed_query(PROBE))
+
+
+def _example_texts(examples):
+    return [SemanticSimilarityExampleSelector._example_to_text(eg, INPUT_KEYS) for eg in examples]
+
+
+def _selector(vectorstore, k):
+    return SemanticSimilarityExampleSelector(vectorstore=vectorstore, k=k, input_keys=INPUT_KEYS)
+
+
+def _read_meta(folder):
+    with open(os.path.join(folder, 'meta.json'), 'r') as file:
+        return json.load(file)
+
+
+def _load(folder, embedding, dimension):
+    # FAISS.load_local would read index.faiss onto the heap; the index is read
+    # once here, memory-mapped, and the docstore comes from our own pickle
+    path = os.path.join(folder, 'index.faiss')
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except Exception as e:
+        print(f"Warning: could not memory-map example index, using in-memory copy: {str(e)}")
+        index = faiss.read_index(path)
+    if index.d != dimension:
+        # Every similarity search would fail FAISS's dimension assertion
+        raise ValueError(f"index has dimension {index.d}, the embedding {dimension}")
+    with open(os.path.join(folder, 'index.pkl'), 'rb') as file:
+        docstore, index_to_docstore_id = pickle.load(file)
+    return FAISS(embedding, index, docstore, index_to_docstore_id), _read_meta(folder)["examples"]
+
+
+def _save(vectorstore, examples, key, model):
+    folder = os.path.join(INDEX_DIR, key)
+    temp_folder = f"{folder}.tmp{os.getpid()}"
+    vectorstore.save_local(temp_folder)
+    with open(os.path.join(temp_folder, 'meta.json'), 'w') as file:
+        json.dump({
+            "version": ARTIFACT_VERSION,
+            "key": key,
+            "model": model,
+            "dimension": vectorstore.index.d,
+            "count": len(examples),
+            "created": time.time(),
+            "examples": examples,
+        }, file, default=str)
+    if os.path.exists(folder):
+        shutil.rmtree(temp_folder)
+    else:
+        os.replace(temp_folder, folder)
+    _prune()
+    return folder
+
+
+def _prune():
+    folders = [os.path.join(INDEX_DIR, name) for name in os.listdir(INDEX_DIR)]
+    folders = sorted((f for f in folders if os.path.isdir(f)), key=os.path.getmtime, reverse=True)
+    for folder in folders[KEEP_ARTIFACTS:]:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _previous_vectors(examples, model, dimension):
+    """
+    Vectors of the longest saved artifact (same model and dimension) whose
+    examples are a prefix of `examples`, so only rows appended to
+    examples.xlsx need embedding.
+    """
+    if not os.path.isdir(INDEX_DIR):
+        return []
+    best = []
+    for name in os.listdir(INDEX_DIR):
+        folder = os.path.join(INDEX_DIR, name)
+        try:
+            meta = _read_meta(folder)
+        except Exception:
+            continue
+        saved = meta["examples"]
+        if (meta.get("version") != ARTIFACT_VERSION or meta.get("model") != model
+                or len(saved) <= len(best) or len(saved) > len(examples)):
+            continue
+        if _example_texts(saved) != _example_texts(examples[:len(saved)]):
+            continue
+        index = faiss.read_index(os.path.join(folder, 'index.faiss'))
+        if index.d != dimension:
+            continue
+        best = index.reconstruct_n(0, index.ntotal).tolist()
+    return best
+
+
+def _build(examples, embedding, model, dimension):
+    texts = _example_texts(examples)
+    vectors = _previous_vectors(examples, model, dimension)
+    if len(vectors) < len(texts):
+        print(f"Embedding {len(texts) - len(vectors)} of {len(texts)} examples")
+        vectors = vectors + embedding.embed_documents(texts[len(vectors):])
+    return FAISS.from_embeddings(list(zip(texts, vectors)), embedding, metadatas=examples)
+
+
+def load_selector(embedding, model, k=5, path=EXAMPLES_PATH):
+    """
+    Return (example_selector, examples) for the examples file. The FAISS
+    index is loaded from files/example_index/<key> when an artifact for the
+    current file content and embedding model and dimension exists, otherwise
+    it is built (reusing vectors from an older artifact where possible) and
+    saved.
+    """
+    dimension = embedding_dimension(embedding)
+    key = artifact_key(path, model, dimension)
+    folder = os.path.join(INDEX_DIR, key)
+    if os.path.exists(os.path.join(folder, 'meta.json')):
+        try:
+            vectorstore, examples = _load(folder, embedding, dimension)
+            return _selector(vectorstore, k), examples
+        except Exception as e:
+            print(f"Warning: could not load example index {key}, rebuilding: {str(e)}")
+            shutil.rmtree(folder, ignore_errors=True)
+
+    examples = read_examples(path)
+    vectorstore = _build(examples, embedding, model, dimension)
+    try:
+        _save(vectorstore, examples, key, model)
+    except Exception as e:
+        print(f"Warning: could not save example index: {str(e)}")
+    return _selector(vectorstore, k), examples
+
+
+def add_examples(selector, examples, new_examples, embedding, model, path=EXAMPLES_PATH):
+    """
+    Append examples to the live selector and to the examples file, embedding
+    only the new rows, and save the index under the file's new content hash.
+    """
+    texts = _example_texts(new_examples)
+    vectors = embedding.embed_documents(texts)
+    selector.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=new_examples)
+    examples = examples + list(new_examples)
+
+    pd.DataFrame(examples).to_excel(path, index=False)
+    _save(selector.vectorstore, examples, artifact_key(path, model, selector.vectorstore.index.d), model)
+    return examples
@@ -0,0 +1,142 @@
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, String, Text
+from datetime import date, datetime
+from decimal import Decimal
+import os
+
+# Columnar/CSV formats of the stream_format option: media type and file extension
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("text/csv", "csv"),
+}
+
+# Rows per server-side cursor batch; one Arrow record batch / Parquet row group each
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 50000))
+
+
+def _sql_type(column_type):
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, (String, Text)):
+        return pa.string()
+    return None
+
+
+def _value_type(value):
+    if isinstance(value, bool):
+        return pa.bool_()
+    if isinstance(value, int):
+        return pa.int64()
+    if isinstance(value, (float, Decimal)):
+        return pa.float64()
+    if isinstance(value, datetime):
+        return pa.timestamp('us', tz=str(value.tzinfo) if value.tzinfo else None)
+    if isinstance(value, date):
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema(columns, rows, column_types=None):
+    """
+    Arrow schema of a result: from the SQLAlchemy column types when known
+    (fetch-data), otherwise from the first non-null value of each column in
+    the first batch (free-form queries). Columns without either are strings.
+    """
+    column_types = column_types or {}
+    fields = []
+    for i, name in enumerate(columns):
+        arrow_type = _sql_type(column_types[name]) if name in column_types else None
+        if arrow_type is None:
+            value = next((row[i] for row in rows if row[i] is not None), None)
+            arrow_type = _value_type(value) if value is not None else pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _array(values, arrow_type):
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+        # Decimal into float64, or values that don't match the inferred type
+        if pa.types.is_floating(arrow_type):
+            return pa.array([None if v is None else float(v) for v in values], type=arrow_type)
+        if pa.types.is_string(arrow_type):
+            return pa.array([None if v is None else str(v) for v in values], type=arrow_type)
+        raise
+
+
+def record_batch(schema, rows):
+    columns = list(zip(*rows)) if rows else [() for _ in schema]
+    return pa.RecordBatch.from_arrays(
+        [_array(list(values), field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+class _Chunks:
+    """Write-only file object collecting what the Arrow writers produce between batches"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _writer(fmt, sink, schema):
+    if fmt == "arrow":
+        return pa.ipc.new_stream(sink, schema)
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa_csv.CSVWriter(sink, schema)
+
+
+def encode(batches, fmt, column_types=None):
+    """
+    Encode (columns, rows) batches as an Arrow IPC stream, a Parquet file or
+    CSV, yielding the bytes written for each batch. The schema is fixed by
+    the first batch.
+    """
+    sink = _Chunks()
+    writer = None
+    schema = None
+    for columns, rows in batches:
+        if writer is None:
+            schema = arrow_schema(columns, rows, column_types)
+            writer = _writer(fmt, sink, schema)
+        if rows:
+            writer.write_batch(record_batch(schema, rows))
+        data = sink.take()
+        if data:
+            yield data
+    if writer is not None:
+        writer.close()
+        yield sink.take()
@@ -0,0 +1,333 @@
+from sqlglot import exp
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+import numpy as np
+import calendar
+import re
+import sqlglot
+import threading
+
+# Slots recognized in questions, in the order they are looked for. Dates are
+# days, months or years; every date slot spans start..end, and next is the
+# day after it (exclusive upper bounds).
+_MONTH = (r'(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+          r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)')
+MONTHS = {calendar.month_abbr[i].lower(): i for i in range(1, 13)}
+
+
+def _month(name):
+    return MONTHS[name[:3]]
+
+
+def _month_end(year, month):
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+# Words after which a 4-digit number is a year
+_YEAR_CONTEXT = ('in', 'of', 'for', 'year', 'during', 'since', 'until', 'before', 'after')
+
+
+def _day(day):
+    return day, day
+
+
+SLOT_PATTERNS = [
+    ('date', re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b'),
+     lambda m: _day(date(int(m[1]), int(m[2]), int(m[3])))),
+    ('date', re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b'),
+     lambda m: _day(date(int(m[3]), int(m[2]), int(m[1])))),
+    ('date', re.compile(rf'\b(\d{{1,2}})(?:st|nd|rd|th)?\s+{_MONTH}\b,?\s+(\d{{4}})\b'),
+     lambda m: _day(date(int(m[3]), _month(m[2]), int(m[1])))),
+    ('date', re.compile(rf'\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?,\s*(\d{{4}})\b'),
+     lambda m: _day(date(int(m[3]), _month(m[1]), int(m[2])))),
+    ('date', re.compile(rf'\b{_MONTH}\b,?\s+(\d{{4}})\b'),
+     lambda m: (date(int(m[2]), _month(m[1]), 1), _month_end(int(m[2]), _month(m[1])))),
+    # A bare year only after a word that makes it one ("in 2019", "for 2018",
+    # "the year 2020") and not before a currency; "above 2000" is a number
+    ('date', re.compile(r'(?:' + '|'.join(rf'(?<=\b{word} )' for word in _YEAR_CONTEXT)
+                        + r')((?:19|20)\d{2})\b(?!\s*(?:taka|tk|bdt|৳))'),
+     lambda m: (date(int(m[1]), 1, 1), date(int(m[1]), 12, 31))),
+    ('account', re.compile(r'\b\d{9,12}\b'), lambda m: m[0]),
+    ('number', re.compile(r'\b\d+(?:\.\d+)?\b'), lambda m: m[0]),
+]
+
+# SQL date literals: the date, then whatever follows it (e.g. " 00:00:00")
+_DATE_LITERAL = re.compile(r'(\d{4})-(\d{2})-(\d{2})(.*)')
+
+
+def extract_slots(text):
+    """
+    (slots, masked text) of a question: the dates, account numbers and
+    numbers in it, in order, and the question with each replaced by a
+    placeholder so paraphrases with other values embed alike
+    """
+    lowered = text.lower()
+    taken = []
+    slots = []
+    for kind, pattern, parse in SLOT_PATTERNS:
+        for match in pattern.finditer(lowered):
+            if any(match.start() < end and start < match.end() for start, end in taken):
+                continue
+            try:
+                value = parse(match)
+            except (ValueError, KeyError):
+                continue
+            taken.append((match.start(), match.end()))
+            slot = {"kind": kind, "text": text[match.start():match.end()], "span": (match.start(), match.end())}
+            if kind == 'date':
+                slot.update(start=value[0], end=value[1], next=value[1] + timedelta(days=1))
+            else:
+                slot["value"] = value
+            slots.append(slot)
+    slots.sort(key=lambda s: s["span"])
+    masked = text
+    for slot in reversed(slots):
+        start, end = slot["span"]
+        masked = f'{masked[:start]}<{slot["kind"]}>{masked[end:]}'
+    return slots, masked
+
+
+def _slot_key(slot):
+    if slot["kind"] == 'date':
+        return ('date', slot["start"], slot["end"])
+    return (slot["kind"], slot["value"])
+
+
+def slot_keys(text):
+    """The values of the dates, account numbers and numbers in a text, in order"""
+    return [_slot_key(slot) for slot in extract_slots(text)[0]]
+
+
+def _by_kind(slots):
+    groups = {}
+    for slot in slots:
+        groups.setdefault(slot["kind"], []).append(slot)
+    return groups
+
+
+def _role(node):
+    """Which bound of a date range a literal is, from the comparison it sits in"""
+    parent = node.parent
+    while isinstance(parent, (exp.Cast, exp.Paren)):
+        node, parent = parent, parent.parent
+    if isinstance(parent, exp.Between):
+        return 'start' if parent.args.get('low') is node else 'end'
+    if isinstance(parent, (exp.GTE, exp.GT, exp.EQ)):
+        return 'start'
+    if isinstance(parent, exp.LT):
+        return 'next'
+    if isinstance(parent, exp.LTE):
+        return 'end'
+    return None
+
+
+def _is_value(node):
+    """
+    Whether a literal is a value the query filters or limits by: an operand
+    of a comparison, BETWEEN or IN, or the LIMIT. GROUP BY / ORDER BY
+    ordinals and other numbers (e.g. ROUND(x, 2)) are not.
+    """
+    parent = node.parent
+    while isinstance(parent, (exp.Cast, exp.Paren, exp.Neg)):
+        node, parent = parent, parent.parent
+    return isinstance(parent, (exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between, exp.In, exp.Limit))
+
+
+def _same_number(a, b):
+    try:
+        return Decimal(a) == Decimal(b)
+    except InvalidOperation:
+        return False
+
+
+def fill_slots(sql, example_slots, slots):
+    """
+    The example's SQL with the values of the example question's slots
+    replaced by the question's, pairing slots of a kind in order. Only
+    literals the query compares or limits by are replaced. None if the
+    question's slots don't line up with the example's or a changed value
+    can't be found in the SQL; raises sqlglot's ParseError if the example's
+    SQL doesn't parse.
+    """
+    expected, given = _by_kind(example_slots), _by_kind(slots)
+    if {k: len(v) for k, v in expected.items()} != {k: len(v) for k, v in given.items()}:
+        return None
+    pairs = [(kind, i, old, given[kind][i]) for kind, olds in expected.items() for i, old in enumerate(olds)]
+    changed = {(kind, i) for kind, i, old, new in pairs if _slot_key(old) != _slot_key(new)}
+
+    tree = sqlglot.parse_one(sql, read='postgres')
+    used = set()
+    for literal in list(tree.find_all(exp.Literal)):
+        value = literal.this
+        replacement = None
+        date_literal = _DATE_LITERAL.fullmatch(value) if literal.is_string else None
+        if date_literal:
+            try:
+                day = date(int(date_literal[1]), int(date_literal[2]), int(date_literal[3]))
+            except ValueError:
+                continue
+            role = _role(literal)
+            for i, old in enumerate(expected.get('date', [])):
+                roles = [role] if role and old[role] == day else [r for r in ('start', 'end', 'next') if old[r] == day]
+                if roles:
+                    new = given['date'][i]
+                    # BETWEEN ... AND <last day> only covers a single day's midnight
+                    if roles[0] == 'end' and new["start"] == new["end"] and old["start"] != old["end"]:
+                        return None
+                    new = new[roles[0]]
+                    replacement = exp.Literal.string(new.isoformat() + date_literal[4])
+                    used.add(('date', i))
+                    break
+        elif _is_value(literal):
+            for kind in ('account', 'number'):
+                for i, old in enumerate(expected.get(kind, [])):
+                    if value == old["value"] or (not literal.is_string and _same_number(value, old["value"])):
+                        new = given[kind][i]["value"]
+                        replacement = exp.Literal.string(new) if literal.is_string else exp.Literal.number(new)
+                        used.add((kind, i))
+                        break
+                if replacement is not None:
+                    break
+        if replacement is not None:
+            literal.replace(replacement)
+    if not changed <= used:
+        return None
+    return tree.sql(dialect='postgres')
+
+
+def _vocabulary(examples):
+    """String values the examples' SQL filters on (transaction types, channels, statuses)"""
+    values = set()
+    for example in examples:
+        for value in re.findall(r"'([^']*)'", str(example.get('output', ''))):
+            if value.strip() and not re.fullmatch(r'[\d\s:.\-]+', value):
+                values.add(value.strip().lower())
+    return values
+
+
+def _mentions(text, vocabulary):
+    lowered = ' '.join(text.lower().split())
+    return frozenset(v for v in vocabulary if re.search(rf'(?<!\w){re.escape(v)}(?!\w)', lowered))
+
+
+class FastPathRouter:
+    """
+    Answers questions that closely match a few-shot example without the
+    agent. The question, with its dates, account numbers and numbers masked,
+    is compared to the equally masked example questions; if the best cosine
+    similarity reaches the threshold, the example mentions the same filter
+    values (e.g. CASH IN, USSD) and the question's slot values can be put
+    into the example's SQL, that SQL is the answer. No LLM is called, so
+    the SQL is checked like a candidate's: it must parse, and validate (if
+    given to route) must return None for it.
+    """
+
+    def __init__(self, threshold=0.9, enabled=True):
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._table = None
+        self.hits = 0
+        self.filled = 0
+        self.misses = Counter()
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+
+    def _build(self, embedding, examples, vectorstore):
+        entries = []
+        for example in examples:
+            slots, masked = extract_slots(str(example.get('input', '')))
+            entries.append({"example": example, "slots": slots, "masked": masked})
+        # Examples without slots reuse their vectors from the example index
+        index = vectorstore.index
+        aligned = index.ntotal == len(examples)
+        vectors = [index.reconstruct(i).tolist() if aligned and e["masked"] == str(e["example"].get('input', ''))
+                   else None for i, e in enumerate(entries)]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            for i, vector in zip(missing, embedding.embed_documents([entries[i]["masked"] for i in missing])):
+                vectors[i] = vector
+        matrix = np.asarray(vectors, dtype='float32')
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        vocabulary = _vocabulary(examples)
+        for entry in entries:
+            entry["mentions"] = _mentions(str(entry["example"].get('input', '')), vocabulary)
+        return {"examples": examples, "count": len(examples), "entries": entries, "matrix": matrix,
+                "vocabulary": vocabulary}
+
+    def prepare(self, embedding, examples, vectorstore):
+        """The masked example vectors, rebuilt when examples were added or reloaded"""
+        table = self._table
+        if table is None or table["examples"] is not examples or table["count"] != len(examples):
+            with self._lock:
+                table = self._table
+                if table is None or table["examples"] is not examples or table["count"] != len(examples):
+                    table = self._table = self._build(embedding, examples, vectorstore)
+        return table
+
+    def _miss(self, info, reason):
+        with self._lock:
+            self.misses[reason] += 1
+        info["reason"] = reason
+        return None
+
+    def route(self, question, embedding, examples, vectorstore, info=None, validate=None):
+        """
+        The answer ("SQL Query: ...\\nDescription: ...") or None; info gets the
+        similarity and outcome. validate(sql) returns None for a valid query,
+        else (reason, message).
+        """
+        info = {} if info is None else info
+        if not self.enabled or not examples:
+            info["reason"] = "disabled"
+            return None
+        table = self.prepare(embedding, examples, vectorstore)
+        slots, masked = extract_slots(question)
+        vector = np.asarray(embedding.embed_query(masked), dtype='float32')
+        scores = table["matrix"] @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+        best = int(np.argmax(scores))
+        entry = table["entries"][best]
+        info.update(similarity=round(float(scores[best]), 4), example=entry["example"].get('input'))
+        if scores[best] < self.threshold:
+            return self._miss(info, "below_threshold")
+        if _mentions(question, table["vocabulary"]) != entry["mentions"]:
+            return self._miss(info, "different_values")
+        try:
+            sql = fill_slots(' '.join(str(entry["example"]['output']).split()), entry["slots"], slots)
+        except sqlglot.errors.SqlglotError as e:
+            info["error"] = f"parse: {str(e).splitlines()[0]}"
+            return self._miss(info, "invalid")
+        if sql is None:
+            return self._miss(info, "slots")
+        error = validate(sql) if validate is not None else None
+        if error is not None:
+            info["error"] = f"{error[0]}: {error[1]}"
+            return self._miss(info, "invalid")
+
+        filled = [s["text"] for s in slots if _slot_key(s) not in {_slot_key(e) for e in entry["slots"]}]
+        with self._lock:
+            self.hits += 1
+            self.filled += bool(filled)
+        info.update(reason="hit", filled=filled)
+        description = entry["example"].get('description')
+        if not isinstance(description, str) or not description.strip():
+            description = f'Same query as the known question "{entry["example"]["input"]}"'
+            if filled:
+                description += f', for {", ".join(filled)}'
+        return f"SQL Query: {sql}\nDescription: {description}"
+
+    def stats(self):
+        with self._lock:
+            hits, filled, misses = self.hits, self.filled, dict(self.misses)
+        total = hits + sum(misses.values())
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "hits": hits,
+            "filled": filled,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
@@ -49,21 +49,43 @@ const FileUpload = () => {
         severity: 'error'
       });
       return;
-    }    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('table_name', tableName || '');
+    }
 
     setLoading(true);
     try {
-      const response = await axios.post(`${API_URL}/import-file`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
+      let response;
+      if (file.name.toLowerCase().endsWith('.csv')) {
+        // CSV files are sent as the raw body so the server imports while uploading
+        response = await axios.post(`${API_URL}/import-file/stream`, file, {
+          params: { filename: file.name, table_name: tableName || undefined },
+          headers: {
+            'Content-Type': 'application/octet-stream',
+          },
+        });
+      } else {
+        const formData = new FormData();
+        formData.append('file', file);
+        formData.append('table_name', tableName || '');
+        response = await axios.post(`${API_URL}/import-file`, formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data',
+          },
+        });
+      }
+
+      // The import runs in the background; poll the job until it finishes
+      let job = response.data;
+      while (job.status !== 'success' && job.status !== 'error') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = (await axios.get(`${API_URL}/import-jobs/${job.job_id}`)).data;
+      }
+      if (job.status === 'error') {
+        throw new Error(job.result?.message || 'Error importing file');
+      }
 
       setNotification({
         open: true,
-        message: response.data.message,
+        message: job.result.message,
         severity: 'success'
       });
 
@@ -77,7 +99,7 @@ const FileUpload = () => {
     } catch (error) {
       setNotification({
         open: true,
-        message: error.response?.data?.detail || 'Error uploading file',
+        message: error.response?.data?.detail || error.message || 'Error uploading file',
         severity: 'error'
       });
     } finally {
@@ -51,17 +51,14 @@ function Dashboard() {
     const fetchData = async () => {      
       setLoading(true);
       try {
+        // All of the dashboard's queries go out in one batch request; the
+        // backend runs them concurrently and merges the total/max/average
+        // aggregates into a single scan
+        const queries = {};
+
         // Fetch service options first (only on initial load or refresh)
         if (serviceOptions.length === 0) {
-          const serviceQuery = `SELECT "TXN_TYPE" FROM rvb_rvc_remittance_9_jun_15_jun_2025 as remittance GROUP BY "TXN_TYPE"`;
-          const serviceResponse = await axios.post('http://localhost:8000/api/direct-query', {
-            question: serviceQuery
-          });
-          
-          if (serviceResponse.data.data) {
-            const services = serviceResponse.data.data.map(item => item.TXN_TYPE);
-            setServiceOptions(services);
-          }
+          queries.services = `SELECT "TXN_TYPE" FROM rvb_rvc_remittance_9_jun_15_jun_2025 as remittance GROUP BY "TXN_TYPE"`;
         }
 
         // Build WHERE clause for merchant filter
@@ -81,47 +78,48 @@ function Dashboard() {
         const merchantFilters = [dateFilter, serviceFilter].filter(Boolean);
         const merchantWhereClause = merchantFilters.length > 0 ? `WHERE ${merchantFilters.join(' AND ')}` : '';
         
-        // Fetch transaction count data
-        const countQuery = `select "APPROVAL_DATETIME"::date as date, COUNT("TXN_AMT") as total_amount 
+        // Transaction count data
+        queries.count = `select "APPROVAL_DATETIME"::date as date, COUNT("TXN_AMT") as total_amount 
                     from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance
                     ${whereClause}
                     group by "APPROVAL_DATETIME"::date
                     order by date`;
-        
-        const countResponse = await axios.post('http://localhost:8000/api/direct-query', {
-          question: countQuery
-        });        // Fetch merchant data - Always show all merchants for the bar chart, only filter by date and service if needed
-        const merchantQuery = `select "MERCHANT_NAME", SUM("TXN_AMT") as total_amount 
+
+        // Merchant data - Always show all merchants for the bar chart, only filter by date and service if needed
+        queries.merchants = `select "MERCHANT_NAME", SUM("TXN_AMT") as total_amount 
                              from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance
                              ${merchantWhereClause}
                              GROUP BY "MERCHANT_NAME"
                              ORDER BY total_amount DESC
-                             LIMIT 10`;const merchantResponse = await axios.post('http://localhost:8000/api/direct-query', {
-          question: merchantQuery
-        });// Fetch total transaction data
-        const totalTransactionQuery = `select sum("TXN_AMT") as total_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
-        
-        const totalTransactionResponse = await axios.post('http://localhost:8000/api/direct-query', {
-          question: totalTransactionQuery
-        });// Fetch maximum transaction data
-        const maxTransactionQuery = `select max("TXN_AMT") as max_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
-        
-        const maxTransactionResponse = await axios.post('http://localhost:8000/api/direct-query', {
-          question: maxTransactionQuery
-        });        // Fetch average transaction data
-        const avgTransactionQuery = `select avg("TXN_AMT") as avg_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
-        
-        const avgTransactionResponse = await axios.post('http://localhost:8000/api/direct-query', {
-          question: avgTransactionQuery
-        });        if (countResponse.data.data) {
-          const formattedCountData = countResponse.data.data.map(item => ({
+                             LIMIT 10`;
+
+        // Total, maximum and average transaction data
+        queries.total = `select sum("TXN_AMT") as total_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
+        queries.max = `select max("TXN_AMT") as max_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
+        queries.avg = `select avg("TXN_AMT") as avg_amount from rvb_rvc_remittance_9_jun_15_jun_2025 as remittance ${whereClause}`;
+
+        const batchResponse = await axios.post('http://localhost:8000/api/batch-query', { queries });
+        const results = batchResponse.data.results;
+        Object.entries(results).forEach(([name, result]) => {
+          if (result.error) {
+            console.error(`Dashboard query '${name}' failed:`, result.error);
+          }
+        });
+
+        if (results.services && results.services.data) {
+          const services = results.services.data.map(item => item.TXN_TYPE);
+          setServiceOptions(services);
+        }
+
+        if (results.count.data) {
+          const formattedCountData = results.count.data.map(item => ({
             date: new Date(item.date).toLocaleDateString(),
             sqlDate: item.date, // keep the original SQL date
             total_amount: parseFloat(item.total_amount)
           }));
           setTransactionData(formattedCountData);
-        }if (merchantResponse.data.data) {
-          console.log('Raw merchant response:', merchantResponse.data.data);          const formattedMerchantData = merchantResponse.data.data.map(item => {
+        }if (results.merchants.data) {
+          console.log('Raw merchant response:', results.merchants.data);          const formattedMerchantData = results.merchants.data.map(item => {
             const amount = parseFloat(item.total_amount);
             console.log('Processing merchant:', item["MERCHANT_NAME"], 'Amount:', amount);
             return {
@@ -133,14 +131,14 @@ function Dashboard() {
           console.log('Formatted merchant data:', formattedMerchantData);          setMerchantData(formattedMerchantData);
         }
 
-        if (totalTransactionResponse.data.data && totalTransactionResponse.data.data.length > 0) {
-          const totalAmount = parseFloat(totalTransactionResponse.data.data[0].total_amount);
+        if (results.total.data && results.total.data.length > 0) {
+          const totalAmount = parseFloat(results.total.data[0].total_amount);
           setTotalTransaction(totalAmount);
-        }if (maxTransactionResponse.data.data && maxTransactionResponse.data.data.length > 0) {
-          const maxAmount = parseFloat(maxTransactionResponse.data.data[0].max_amount);
+        }if (results.max.data && results.max.data.length > 0) {
+          const maxAmount = parseFloat(results.max.data[0].max_amount);
           setMaxTransaction(maxAmount);
-        }        if (avgTransactionResponse.data.data && avgTransactionResponse.data.data.length > 0) {
-          const avgAmount = parseFloat(avgTransactionResponse.data.data[0].avg_amount);
+        }        if (results.avg.data && results.avg.data.length > 0) {
+          const avgAmount = parseFloat(results.avg.data[0].avg_amount);
           setAvgTransaction(avgAmount);
         }        
         // Remove excessive delay for loading
@@ -18,10 +18,46 @@ import {
   TableContainer,
   TableHead,
   TableRow,
-  Pagination
+  Pagination,
+  ToggleButton,
+  ToggleButtonGroup
 } from '@mui/material';
 import SearchIcon from '@mui/icons-material/Search';
+import DownloadIcon from '@mui/icons-material/Download';
 import axios from 'axios';
+import { tableFromIPC, DataType } from 'apache-arrow';
+
+// Rows of an Arrow table as plain objects; dates and timestamps as ISO strings
+const arrowRows = (table) => {
+  const dateColumns = table.schema.fields
+    .filter((field) => DataType.isDate(field.type) || DataType.isTimestamp(field.type))
+    .map((field) => field.name);
+  return table.toArray().map((row) => {
+    const values = row.toJSON();
+    dateColumns.forEach((name) => {
+      if (values[name] !== null) {
+        values[name] = new Date(Number(values[name])).toISOString().replace('T00:00:00.000Z', '');
+      }
+    });
+    return values;
+  });
+};
+
+// Error detail of a failed request, also when the response was requested as binary
+const errorDetail = async (err) => {
+  const body = err.response?.data;
+  try {
+    if (body instanceof ArrayBuffer) {
+      return JSON.parse(new TextDecoder().decode(body)).detail;
+    }
+    if (body instanceof Blob) {
+      return JSON.parse(await body.text()).detail;
+    }
+  } catch (parseError) {
+    return undefined;
+  }
+  return body?.detail;
+};
 
 function DataPage() {
   const [tables, setTables] = useState([]);
@@ -35,6 +71,10 @@ function DataPage() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [page, setPage] = useState(1);
+  const [hasMore, setHasMore] = useState(false);
+  // Page transport: 'json' rows or an Arrow IPC stream (smaller, typed)
+  const [format, setFormat] = useState('json');
+  const [exporting, setExporting] = useState(false);
   const rowsPerPage = 10;
 
   // For demonstration, we'll add some dummy tables
@@ -48,9 +88,19 @@ function DataPage() {
     // Reset data when table changes
     setData([]);
     setColumns([]);
+    setHasMore(false);
   };
 
-  const handleSearch = async () => {
+  const filters = () => ({
+    table: selectedTable,
+    start_date: startDate || undefined,
+    end_date: endDate || undefined,
+    search: search,
+    acc_no: accNo,
+  });
+
+  // Only one page of rows is requested from the server at a time
+  const handleSearch = async (newPage = 1) => {
     if (!selectedTable) {
       setError('Please select a table first');
       return;
@@ -60,31 +110,76 @@ function DataPage() {
     setError('');
     
     try {
+      if (format === 'arrow') {
+        // One extra row tells whether there is a next page
+        const response = await axios.post('/api/fetch-data', {
+          ...filters(),
+          stream: true,
+          stream_format: 'arrow',
+          limit: rowsPerPage + 1,
+          offset: (newPage - 1) * rowsPerPage
+        }, { responseType: 'arraybuffer' });
+
+        const table = tableFromIPC(new Uint8Array(response.data));
+        const rows = arrowRows(table);
+        setData(rows.slice(0, rowsPerPage));
+        setColumns(table.schema.fields.map((field) => field.name));
+        setHasMore(rows.length > rowsPerPage);
+        setPage(newPage);
+        return;
+      }
+
       const response = await axios.post('/api/fetch-data', {
-        table: selectedTable,
-        start_date: startDate || undefined,
-        end_date: endDate || undefined,
-        search: search,
-        acc_no: accNo
+        ...filters(),
+        limit: rowsPerPage,
+        offset: (newPage - 1) * rowsPerPage
       });
       
       setData(response.data.data);
       setColumns(response.data.columns);
-      setPage(1); // Reset to first page
+      setHasMore(response.data.has_more);
+      setPage(newPage);
     } catch (err) {
       console.error('Error fetching data:', err);
-      setError(err.response?.data?.detail || 'An error occurred while fetching data');
+      setError((await errorDetail(err)) || 'An error occurred while fetching data');
     } finally {
       setLoading(false);
     }
   };
 
+  // Download every row matching the filters, streamed by the server
+  const handleExport = async (exportFormat) => {
+    setExporting(true);
+    setError('');
+
+    try {
+      const response = await axios.post('/api/fetch-data', {
+        ...filters(),
+        stream: true,
+        stream_format: exportFormat
+      }, { responseType: 'blob' });
+
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${selectedTable}.${exportFormat}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error('Error exporting data:', err);
+      setError((await errorDetail(err)) || 'An error occurred while exporting data');
+    } finally {
+      setExporting(false);
+    }
+  };
+
   // Calculate pagination
   const handleChangePage = (event, newPage) => {
-    setPage(newPage);
+    handleSearch(newPage);
   };
 
-  const displayData = data.slice((page - 1) * rowsPerPage, page * rowsPerPage);
+  const displayData = data;
+  const firstRow = (page - 1) * rowsPerPage;
 
   return (
     <div>
@@ -158,11 +253,31 @@ function DataPage() {
           </Grid>
           
           <Grid item xs={12}>
-            <Box sx={{ display: 'flex', justifyContent: 'flex-end' }}>
+            <Box sx={{ display: 'flex', justifyContent: 'flex-end', alignItems: 'center', gap: 2 }}>
+              <ToggleButtonGroup
+                size="small"
+                exclusive
+                value={format}
+                onChange={(event, value) => value && setFormat(value)}
+              >
+                <ToggleButton value="json">JSON</ToggleButton>
+                <ToggleButton value="arrow">Arrow</ToggleButton>
+              </ToggleButtonGroup>
+              {['csv', 'parquet', 'arrow'].map((exportFormat) => (
+                <Button
+                  key={exportFormat}
+                  variant="outlined"
+                  onClick={() => handleExport(exportFormat)}
+                  disabled={exporting || !selectedTable}
+                  startIcon={<DownloadIcon />}
+                >
+                  {exportFormat.toUpperCase()}
+                </Button>
+              ))}
               <Button
                 variant="contained"
                 color="primary"
-                onClick={handleSearch}
+                onClick={() => handleSearch(1)}
                 disabled={loading || !selectedTable}
                 startIcon={loading ? <CircularProgress size={20} color="inherit" /> : <SearchIcon />}
               >
@@ -206,10 +321,10 @@ function DataPage() {
             </Table>
           </TableContainer>
           
-          {data.length > rowsPerPage && (
+          {(page > 1 || hasMore) && (
             <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
               <Pagination
-                count={Math.ceil(data.length / rowsPerPage)}
+                count={hasMore ? page + 1 : page}
                 page={page}
                 onChange={handleChangePage}
                 color="primary"
@@ -219,7 +334,7 @@ function DataPage() {
           
           <Box sx={{ mt: 2 }}>
             <Typography variant="body2" color="text.secondary">
-              Showing {Math.min(displayData.length, rowsPerPage)} of {data.length} results
+              Showing rows {displayData.length ? firstRow + 1 : 0}-{firstRow + displayData.length}{hasMore ? ' (more available)' : ''}
             </Typography>
           </Box>
         </Paper>
@@ -17,7 +17,7 @@ import {
   Card,
   CardContent
 } from '@mui/material';
-import { sendQuery } from '../services/api';
+import { sendQuery, cancelQuery } from '../services/api';
 
 function QueryPage() {
   const [query, setQuery] = useState('');
@@ -28,6 +28,7 @@ function QueryPage() {
   const [rowsPerPage, setRowsPerPage] = useState(10);
   const [startTime, setStartTime] = useState(null);
   const [totalTime, setTotalTime] = useState(null);
+  const [queryId, setQueryId] = useState(null);
 
   const handleQueryChange = (e) => {
     setQuery(e.target.value);
@@ -41,9 +42,11 @@ function QueryPage() {
     setError('');
     setResult(null);
     setStartTime(performance.now());
+    const id = window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+    setQueryId(id);
     
     try {
-      const data = await sendQuery(query);
+      const data = await sendQuery(query, id);
       console.log('API Response:', data);
       setResult(data);
       setTotalTime((performance.now() - startTime) / 1000);
@@ -51,6 +54,16 @@ function QueryPage() {
       setError(err.message || 'An error occurred while processing your query');
     } finally {
       setLoading(false);
+      setQueryId(null);
+    }
+  };
+
+  const handleCancel = async () => {
+    try {
+      await cancelQuery(queryId);
+    } catch (err) {
+      // 404 while the AI is still writing the query: nothing runs yet
+      setError(err.message);
     }
   };
 
@@ -110,6 +123,12 @@ function QueryPage() {
           </Paper>
         )}
         
+        {result.truncated && (
+          <Alert severity="warning" sx={{ mb: 2 }}>
+            Only the first {result.data.length} rows are shown; the result was cut at the server's row limit.
+          </Alert>
+        )}
+
         <TableContainer component={Paper}>
           <Table size="small">
             <TableHead>
@@ -189,7 +208,13 @@ function QueryPage() {
             disabled={loading}
           >
             {loading ? <CircularProgress size={24} /> : 'Submit'}
-          </Button>        </form>
+          </Button>
+          {loading && queryId && (
+            <Button variant="outlined" color="secondary" onClick={handleCancel} sx={{ ml: 2 }}>
+              Cancel
+            </Button>
+          )}
+        </form>
         <Box mt={1} display="flex" justifyContent="flex-end">
               <Typography 
                 variant="caption" 
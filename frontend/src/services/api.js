@@ -13,10 +13,10 @@ const apiClient = axios.create({
   },
 });
 
-// Send query to AI agent
-export const sendQuery = async (question) => {
+// Send query to AI agent; queryId lets the SQL be cancelled while it runs
+export const sendQuery = async (question, queryId) => {
   try {
-    const response = await apiClient.post('/execute-query', { question });
+    const response = await apiClient.post('/execute-query', { question, query_id: queryId });
     return response.data;
   } catch (error) {
     console.error('Error sending query:', error);
@@ -24,6 +24,17 @@ export const sendQuery = async (question) => {
   }
 };
 
+// Cancel the SQL of a query sent with sendQuery
+export const cancelQuery = async (queryId) => {
+  try {
+    const response = await apiClient.post(`/cancel-query/${queryId}`);
+    return response.data;
+  } catch (error) {
+    console.error('Error cancelling query:', error);
+    throw new Error(error.response?.data?.detail || 'Failed to cancel query');
+  }
+};
+
 // API service methods
 const ApiService = {
   // AI Agent queries
@@ -0,0 +1,195 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+import contextlib
+import os
+import threading
+import time
+import uuid
+
+# Limits for the SQL run by execute-query and direct-query (ai.fetch / ai.stream):
+#   QUERY_TIMEOUT     - statement_timeout in seconds; requests may ask for less
+#   QUERY_MAX_ROWS    - row cap of a JSON result; the query runs with LIMIT QUERY_MAX_ROWS + 1
+#   QUERY_MAX_COST    - queries whose EXPLAIN total cost (after the row cap) is above it are
+#                       rejected before they run; 0 turns the check off
+# A limit of 0 means unlimited. EXPLAIN costs are only available on PostgreSQL;
+# on SQLite the timeout and row cap still apply.
+QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 30))
+QUERY_MAX_ROWS = int(os.environ.get('QUERY_MAX_ROWS', 100000))
+QUERY_MAX_COST = float(os.environ.get('QUERY_MAX_COST', 1e7))
+
+# SQLite checks the deadline every this many virtual machine instructions
+SQLITE_PROGRESS_STEPS = 10000
+
+# PostgreSQL error code of a cancelled statement (statement_timeout or pg_cancel_backend)
+QUERY_CANCELED = '57014'
+
+
+class QueryRejected(Exception):
+    """The query's estimated cost is above QUERY_MAX_COST"""
+
+
+class QueryTimeout(Exception):
+    """The query ran longer than its statement timeout"""
+
+
+class QueryCancelled(Exception):
+    """The query was cancelled with cancel()"""
+
+
+class QueryIdInUse(Exception):
+    """Another query is running under the same query_id"""
+
+
+class QueryNotAllowed(Exception):
+    """The statement is not a single read-only query"""
+
+
+# Queries running right now: id -> entry. An entry's lock is held while a
+# cancel is sent, and by the query before it gives its connection back, so a
+# cancel never reaches the next user of the same backend.
+_running = {}
+_running_lock = threading.Lock()
+
+
+def row_limit(limit=None):
+    """LIMIT to run a query with: the requested one, or one row past the cap to detect truncation"""
+    if not QUERY_MAX_ROWS:
+        return limit
+    if limit is None:
+        return QUERY_MAX_ROWS + 1
+    return min(limit, QUERY_MAX_ROWS + 1)
+
+
+def page_limit(limit):
+    """Page size of a paginated request, at most QUERY_MAX_ROWS"""
+    return min(limit, QUERY_MAX_ROWS) if QUERY_MAX_ROWS else limit
+
+
+def timeout_seconds(timeout=None):
+    if timeout and QUERY_TIMEOUT:
+        return min(timeout, QUERY_TIMEOUT)
+    return timeout or QUERY_TIMEOUT or None
+
+
+def estimate(connection, sql):
+    """(total cost, rows) of the query's plan, or (None, None) where EXPLAIN has no costs"""
+    if connection.dialect.name != 'postgresql':
+        return None, None
+    plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()[0]['Plan']
+    return plan['Total Cost'], plan['Plan Rows']
+
+
+def _backend(connection):
+    """What cancel() needs to interrupt the connection: the backend pid, or the sqlite3 connection"""
+    dbapi_connection = connection.connection.dbapi_connection
+    if connection.dialect.name == 'postgresql':
+        if hasattr(dbapi_connection, 'get_backend_pid'):
+            return dbapi_connection.get_backend_pid()
+        return connection.execute(text('SELECT pg_backend_pid()')).scalar()
+    return dbapi_connection
+
+
+def _set_timeout(connection, seconds):
+    if connection.dialect.name == 'postgresql':
+        # Local to the connection's transaction, reset when it goes back to the pool
+        connection.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                           {"ms": str(int(seconds * 1000))})
+    elif connection.dialect.name == 'sqlite':
+        deadline = time.monotonic() + seconds
+        connection.connection.dbapi_connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+
+
+def _clear_timeout(connection):
+    if connection.dialect.name == 'sqlite' and not connection.closed:
+        connection.connection.dbapi_connection.set_progress_handler(None, 0)
+
+
+def _interrupted(error):
+    code = getattr(error.orig, 'pgcode', None)
+    return code == QUERY_CANCELED or 'interrupted' in str(error.orig)
+
+
+@contextlib.contextmanager
+def governed(connection, sql, query_id=None, timeout=None):
+    """
+    Run a query on `connection` under the governor: reject it if its
+    estimated cost is too high, set its statement timeout and register it
+    under query_id (generated if not given) so cancel() can stop it.
+    Yields the registry entry; timeouts and cancels inside raise
+    QueryTimeout / QueryCancelled.
+    """
+    seconds = timeout_seconds(timeout)
+    if seconds:
+        _set_timeout(connection, seconds)
+    try:
+        cost, rows = estimate(connection, sql) if QUERY_MAX_COST else (None, None)
+        if cost is not None and cost > QUERY_MAX_COST:
+            raise QueryRejected(f"Query rejected: estimated cost {cost:.0f} (about {rows} rows) "
+                                f"is above the limit of {QUERY_MAX_COST:.0f}")
+
+        entry = {
+            "query_id": query_id or uuid.uuid4().hex,
+            "sql": sql,
+            "started": time.time(),
+            "timeout": seconds,
+            "estimated_cost": cost,
+            "estimated_rows": rows,
+            "cancelled": False,
+            "engine": connection.engine,
+            "backend": _backend(connection),
+            "lock": threading.Lock(),
+        }
+        with _running_lock:
+            if entry["query_id"] in _running:
+                raise QueryIdInUse(f"Query {entry['query_id']} is already running")
+            _running[entry["query_id"]] = entry
+        try:
+            yield entry
+        except DBAPIError as e:
+            if not _interrupted(e):
+                raise
+            if entry["cancelled"]:
+                raise QueryCancelled(f"Query {entry['query_id']} was cancelled") from e
+            raise QueryTimeout(f"Query exceeded its {seconds:g} s timeout") from e
+        finally:
+            with entry["lock"]:
+                with _running_lock:
+                    _running.pop(entry["query_id"], None)
+    finally:
+        _clear_timeout(connection)
+
+
+def cancel(query_id):
+    """Cancel a running query (pg_cancel_backend on PostgreSQL); False if it isn't running"""
+    with _running_lock:
+        entry = _running.get(query_id)
+    if entry is None:
+        return False
+    with entry["lock"]:
+        with _running_lock:
+            if query_id not in _running:
+                return False
+        entry["cancelled"] = True
+        if isinstance(entry["backend"], int):
+            with entry["engine"].connect() as connection:
+                connection.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": entry["backend"]})
+        else:
+            entry["backend"].interrupt()
+    return True
+
+
+def running():
+    """The queries running right now, oldest first"""
+    now = time.time()
+    with _running_lock:
+        entries = sorted(_running.values(), key=lambda e: e["started"])
+    return [{
+        "query_id": e["query_id"],
+        "sql": e["sql"],
+        "elapsed": now - e["started"],
+        "timeout": e["timeout"],
+        "estimated_cost": e["estimated_cost"],
+        "estimated_rows": e["estimated_rows"],
+        "cancelled": e["cancelled"],
+    } for e in entries]
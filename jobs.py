@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import io
+import threading
+import time
+import uuid
+
+
+class UploadPipe(io.RawIOBase):
+    """
+    Reader over a file that the upload handler is still writing. Reads block
+    until more data arrives or the upload is finished, so an import can start
+    parsing while the rest of the file is still being received.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self._file = open(path, 'rb')
+        self._cond = threading.Condition()
+        self._done = False
+        self._error = None
+
+    def readable(self):
+        return True
+
+    def notify(self):
+        """Called by the writer after each chunk is flushed"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        """Called by the writer once the upload is complete (or failed)"""
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def readinto(self, buffer):
+        while True:
+            count = self._file.readinto(buffer)
+            if count:
+                return count
+            with self._cond:
+                if self._error:
+                    raise IOError(self._error)
+                if self._done:
+                    return self._file.readinto(buffer) or 0
+                self._cond.wait(0.5)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class ImportJobs:
+    """
+    Background file imports with a status record per job. At most max_workers
+    imports run at once; the last `history` jobs are kept for status queries.
+    """
+
+    def __init__(self, max_workers=1, history=100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.history = history
+
+    def create(self, filename, table_name):
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "filename": filename,
+            "table_name": table_name,
+            "status": "uploading",
+            "bytes_received": 0,
+            "rows_imported": 0,
+            "created": time.time(),
+            "finished": None,
+            "result": None,
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def submit(self, job_id, func, *args, cleanup=None):
+        """
+        Run func(*args, progress=callback) in the import pool. func returns the
+        import result dict; its "status" becomes the job status.
+        """
+        def progress(rows):
+            self.update(job_id, rows_imported=rows)
+
+        def run():
+            self.update(job_id, status="running", started=time.time())
+            try:
+                result = func(*args, progress=progress)
+                self.update(job_id, status=result.get("status", "success"), result=result)
+            except Exception as e:
+                self.update(job_id, status="error", result={"status": "error", "message": str(e)})
+            finally:
+                self.update(job_id, finished=time.time())
+                if cleanup:
+                    cleanup()
+
+        with self._lock:
+            if job_id in self._jobs and self._jobs[job_id]["status"] == "uploading":
+                self._jobs[job_id]["status"] = "queued"
+        return self._executor.submit(run)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
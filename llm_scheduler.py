@@ -0,0 +1,268 @@
+from langchain_core.language_models.llms import LLM
+from collections import deque
+from typing import Any, List, Optional
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+
+class SchedulerFull(Exception):
+    """The scheduler queue is at max_queue; the request should be retried later"""
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the LLM answered"""
+
+
+# Priority and deadline of the question being answered. Set around an agent
+# call with request_context() and read by ScheduledLLM for every LLM call the
+# agent makes (contextvars follow the call into LangChain's tasks).
+_request = contextvars.ContextVar('llm_request', default=None)
+
+
+async def in_context(coro, context):
+    """Await coro as a task started from context (a contextvars.copy_context() of another thread)"""
+    return await context.run(asyncio.ensure_future, coro)
+
+
+@contextlib.contextmanager
+def request_context(priority=0, timeout=None):
+    """Higher priority is served first; timeout (seconds) sets the deadline of every LLM call inside"""
+    deadline = time.monotonic() + timeout if timeout else None
+    token = _request.set({"priority": priority, "deadline": deadline})
+    try:
+        yield deadline
+    finally:
+        _request.reset(token)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the LLM server.
+
+    At most max_concurrency calls run at once; up to max_queue more wait,
+    highest priority first (FIFO within a priority), and further calls are
+    rejected with SchedulerFull. A call whose deadline passes while it waits
+    raises DeadlineExceeded. Identical calls (same key) that are queued or
+    running share one LLM call. A call whose callers have all gone (cancelled
+    or timed out) is dropped from the queue, or cancelled if already running.
+
+    The queue lives on one event loop, self.loop: the first one that submits
+    while none runs, or a thread of its own started by run for sync callers.
+    Submits from any other loop are forwarded to it, so every method runs on
+    that loop's thread and no locking is needed beyond binding the loop.
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=32, timeout=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.loop = None
+        self._loop_lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        # key -> entry for every queued or running call
+        self._inflight = {}
+        self._queued = 0
+        self._running = 0
+        self._waits = deque(maxlen=1000)
+        self.stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "rejected": 0,
+            "expired": 0,
+            "cancelled": 0,
+            "completed": 0,
+            "failed": 0,
+        }
+
+    async def submit(self, key, factory, priority=0, deadline=None):
+        """
+        Await factory() (a coroutine function doing the LLM call) once it is
+        admitted. deadline is a time.monotonic() value; the scheduler's
+        default timeout applies when it is None.
+        """
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            if self.loop is None or not self.loop.is_running():
+                self.loop = loop
+        if self.loop is not loop:
+            future = asyncio.run_coroutine_threadsafe(
+                in_context(self.submit(key, factory, priority, deadline), contextvars.copy_context()), self.loop)
+            return await asyncio.wrap_future(future)
+        if deadline is None and self.timeout:
+            deadline = time.monotonic() + self.timeout
+        self.stats["submitted"] += 1
+
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.stats["coalesced"] += 1
+            if entry["task"] is None and priority > entry["priority"]:
+                # Re-queue at the higher priority, the old heap item is skipped
+                entry["priority"] = priority
+                heapq.heappush(self._heap, (-priority, next(self._seq), entry))
+        else:
+            if self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise SchedulerFull(f"LLM queue is full ({self.max_queue} waiting)")
+            entry = {
+                "key": key,
+                "factory": factory,
+                "priority": priority,
+                "deadline": deadline,
+                "enqueued": time.monotonic(),
+                "future": self.loop.create_future(),
+                "task": None,
+                "waiters": 0,
+                "done": False,
+                # The call runs in its first caller's context (trace spans), whoever dispatches it
+                "context": contextvars.copy_context(),
+            }
+            # Nobody may be left to read a failure; mark it retrieved
+            entry["future"].add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = entry
+            self._queued += 1
+            heapq.heappush(self._heap, (-priority, next(self._seq), entry))
+        if entry["deadline"] is not None:
+            entry["deadline"] = None if deadline is None else max(entry["deadline"], deadline)
+
+        entry["waiters"] += 1
+        self._dispatch()
+        try:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            return await asyncio.wait_for(asyncio.shield(entry["future"]), timeout)
+        except asyncio.TimeoutError:
+            self.stats["expired"] += 1
+            raise DeadlineExceeded("LLM deadline exceeded") from None
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not entry["future"].done():
+                self._abandon(entry)
+
+    def run(self, coro):
+        """
+        Run a coroutine for a sync caller (not on self.loop) and return its
+        result. It runs on self.loop, started in a thread of its own if no
+        loop runs yet, and sees the caller's contextvars.
+        """
+        with self._loop_lock:
+            if self.loop is None or not self.loop.is_running():
+                loop = asyncio.new_event_loop()
+                running = threading.Event()
+                loop.call_soon(running.set)
+                threading.Thread(target=loop.run_forever, name='llm-scheduler', daemon=True).start()
+                running.wait()
+                self.loop = loop
+            loop = self.loop
+        return asyncio.run_coroutine_threadsafe(in_context(coro, contextvars.copy_context()), loop).result()
+
+    def _abandon(self, entry):
+        if entry["task"] is None:
+            entry["done"] = True
+            self._queued -= 1
+            entry["future"].cancel()
+        else:
+            # Closing the request makes Ollama stop generating
+            entry["task"].cancel()
+        if self._inflight.get(entry["key"]) is entry:
+            del self._inflight[entry["key"]]
+
+    def _dispatch(self):
+        while self._running < self.max_concurrency and self._heap:
+            _, _, entry = heapq.heappop(self._heap)
+            if entry["done"] or entry["task"] is not None:
+                continue
+            self._queued -= 1
+            if entry["deadline"] is not None and time.monotonic() >= entry["deadline"]:
+                entry["done"] = True
+                self.stats["expired"] += 1
+                self._inflight.pop(entry["key"], None)
+                entry["future"].set_exception(DeadlineExceeded("LLM deadline exceeded while queued"))
+                continue
+            self._waits.append(time.monotonic() - entry["enqueued"])
+            self._running += 1
+            entry["task"] = self.loop.create_task(self._run(entry), context=entry["context"])
+
+    async def _run(self, entry):
+        future = entry["future"]
+        try:
+            result = await entry["factory"]()
+            if not future.done():
+                future.set_result(result)
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+        except Exception as e:
+            self.stats["failed"] += 1
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            entry["done"] = True
+            self._running -= 1
+            if self._inflight.get(entry["key"]) is entry:
+                del self._inflight[entry["key"]]
+            self._dispatch()
+
+    def metrics(self):
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": self._queued,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            **self.stats,
+            "wait_ms_avg": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "wait_ms_p50": waits[len(waits) // 2] * 1000 if waits else 0.0,
+            "wait_ms_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+            "wait_ms_max": waits[-1] * 1000 if waits else 0.0,
+        }
+
+
+class ScheduledLLM(LLM):
+    """Sends every call of the wrapped LLM through an LLMScheduler"""
+
+    llm: Any
+    scheduler: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "scheduled"
+
+    @property
+    def _identifying_params(self):
+        return {"llm": self.llm._identifying_params}
+
+    def _key(self, prompt, stop, kwargs):
+        return (repr(sorted(self.llm._identifying_params.items())), prompt, tuple(stop or ()), repr(sorted(kwargs.items())))
+
+    async def _scheduled(self, prompt, stop, options, kwargs):
+        return await self.scheduler.submit(
+            self._key(prompt, stop, kwargs),
+            lambda: self.llm.ainvoke(prompt, stop=stop, **kwargs),
+            options.get("priority", 0),
+            options.get("deadline"),
+        )
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        return await self._scheduled(prompt, stop, _request.get() or {}, kwargs)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        loop = self.scheduler.loop
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if loop is not None and loop.is_running() and loop is not current:
+            # Sync callers in worker threads queue on the server's event loop
+            future = asyncio.run_coroutine_threadsafe(self._scheduled(prompt, stop, _request.get() or {}, kwargs), loop)
+            return future.result()
+        # No scheduler loop yet (scripts, benchmarks) or called on it: run unscheduled
+        return self.llm.invoke(prompt, stop=stop, **kwargs)
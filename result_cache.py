@@ -0,0 +1,174 @@
+from sqlglot import exp
+from collections import OrderedDict
+from functools import lru_cache
+import re
+import sqlglot
+import sys
+import threading
+import time
+
+# Functions whose result changes between runs of the same query; queries using
+# them are never cached
+VOLATILE = re.compile(r'\b(now|random|rand|setseed|nextval|currval|clock_timestamp|statement_timestamp|timeofday'
+                      r'|transaction_timestamp|current_date|current_time|current_timestamp|localtime|localtimestamp'
+                      r'|gen_random_uuid|uuid_generate_v\d)\b', re.I)
+
+# Rows sampled to estimate the memory of a result
+SIZE_SAMPLE_ROWS = 200
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(sql, dialect='postgres'):
+    """
+    (normalized SQL, tables it reads) of a read-only query, or None if it
+    can't be cached: unparsable, volatile, or not a plain SELECT
+    """
+    if VOLATILE.search(sql):
+        return None
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except sqlglot.errors.ParseError:
+        return None
+    if not isinstance(tree, (exp.Select, exp.Union, exp.Except, exp.Intersect)):
+        return None
+    # Names of CTEs are not tables
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    tables = frozenset(t.name.lower() for t in tree.find_all(exp.Table) if t.name.lower() not in ctes)
+    return tree.sql(dialect=dialect), tables
+
+
+def _value_size(value):
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    # Small ints, floats, dates, Decimals: roughly fixed
+    return 32
+
+
+def result_size(rows):
+    """Approximate bytes held by a list of rows (sampled)"""
+    if not rows:
+        return 64
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    per_row = sum(sys.getsizeof(row) + sum(_value_size(v) for v in row) for row in sample) / len(sample)
+    return int(per_row * len(rows)) + 64
+
+
+class ResultCache:
+    """
+    Query result cache placed in front of ai.fetch.
+
+    Entries are keyed by the normalized SQL (sqlglot) with its limit and
+    offset, and stamped with the data versions of the tables the query reads
+    (functions.table_versions). A lookup only hits when none of those tables
+    changed since, so inserts, updates, imports and deletes through this
+    server are never served stale; changes made by other clients are only
+    bounded by the TTL. Every entry has its own TTL (the default, or the one
+    given to put). Entries are evicted least-recently-used once their
+    estimated size exceeds max_bytes; results bigger than max_entry_bytes
+    are not cached at all.
+    """
+
+    def __init__(self, get_versions, max_bytes=64 << 20, max_entry_bytes=None, ttl=300, enabled=True):
+        self.get_versions = get_versions
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # key -> {"result", "versions", "size", "expires", "hits"}, least recently used first
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+        self.uncacheable = 0
+        self.too_large = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry["size"]
+
+    def lookup(self, sql, limit=None, offset=0):
+        """
+        (key, versions, cached FrozenResult or None). key is None when the
+        query can't be cached; key and versions go to put() after a miss.
+        The versions are taken before the query runs, so a write that
+        commits meanwhile leaves the stored entry stale rather than wrong.
+        """
+        if not self.enabled:
+            return None, None, None
+        normalized = normalize_query(sql)
+        if normalized is None:
+            with self._lock:
+                self.uncacheable += 1
+            return None, None, None
+        text, tables = normalized
+        key = (text, limit, offset)
+        versions = self.get_versions(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["versions"] != versions:
+                    self.stale += 1
+                    self._remove(key)
+                elif time.time() > entry["expires"]:
+                    self.expired += 1
+                    self._remove(key)
+                else:
+                    self._entries.move_to_end(key)
+                    entry["hits"] += 1
+                    self.hits += 1
+                    return key, versions, entry["result"]
+            self.misses += 1
+        return key, versions, None
+
+    def put(self, key, versions, result, ttl=None):
+        """Store a FrozenResult; False if it is over max_entry_bytes"""
+        if key is None:
+            return False
+        size = result_size(result.data)
+        with self._lock:
+            if size > self.max_entry_bytes:
+                self.too_large += 1
+                return False
+            self._remove(key)
+            self._entries[key] = {
+                "result": result,
+                "versions": versions,
+                "size": size,
+                "expires": time.time() + (self.ttl if ttl is None else ttl),
+                "hits": 0,
+            }
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry_bytes": self.max_entry_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+                "too_large": self.too_large,
+            }
@@ -0,0 +1,690 @@
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric, inspect, text
+from sqlalchemy.exc import NoSuchTableError
+from sqlglot import exp
+from functools import lru_cache
+import re
+import sqlglot
+import threading
+import time
+import functions
+
+# Day of TXN_DATE_TIME: the one dimension that isn't a column of the base table
+DAY = 'TXN_DAY'
+DATE_COLUMN = 'TXN_DATE_TIME'
+AMOUNT_COLUMN = 'TXN_AMT'
+COLUMNS = ('STATEMENT_FOR_ACC', 'TXN_TYPE', 'CHANNEL')
+
+# Rollup tables, name suffix -> dimensions. Each row holds the number of
+# transactions and the count, sum, min and max of TXN_AMT of one group, which
+# answers COUNT/SUM/MIN/MAX/AVG grouped by or filtered on any subset of the
+# table's dimensions. Refreshed and applied in this order.
+ROLLUPS = {
+    'type_channel': ('TXN_TYPE', 'CHANNEL'),
+    'account_type': ('STATEMENT_FOR_ACC', 'TXN_TYPE'),
+    'day_type_channel': (DAY, 'TXN_TYPE', 'CHANNEL'),
+    'day_account': (DAY, 'STATEMENT_FOR_ACC'),
+}
+MEASURES = ('txn_count', 'amt_count', 'amt_sum', 'amt_min', 'amt_max')
+
+# Rollup tables are named rollup__<base>__<suffix> and kept out of the schema
+# the agent sees
+PREFIX = 'rollup__'
+
+# A date literal at midnight: TXN_DATE_TIME >= it (or < it) selects whole days
+MIDNIGHT = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:[ T]00:00(?::00(?:\.0+)?)?)?$")
+
+# Clauses a rollup can't answer
+_UNSUPPORTED = ('joins', 'with', 'laterals', 'pivots', 'windows', 'qualify', 'into')
+
+
+def rollup_table(base, suffix):
+    return f'{PREFIX}{base}__{suffix}'
+
+
+def is_rollup(table_name):
+    return table_name.lower().startswith(PREFIX)
+
+
+def _day_expression(node, dialect):
+    """Is node the day of TXN_DATE_TIME: DATE(..), or CAST(.. AS DATE) / ..::date on PostgreSQL"""
+    if isinstance(node, exp.Date) and [key for key, value in node.args.items() if value] == ['this']:
+        inner = node.this
+    # SQLite casts to DATE as a number (the year), not a day
+    elif isinstance(node, exp.Cast) and dialect == 'postgres' and node.to.is_type('date'):
+        inner = node.this
+    else:
+        return False
+    return isinstance(inner, exp.Column) and inner.name.upper() == DATE_COLUMN
+
+
+def _dimension(node, dialect):
+    """The dimension a column or day expression stands for, or None"""
+    if _day_expression(node, dialect):
+        return DAY
+    if isinstance(node, exp.Column) and node.name.upper() in COLUMNS:
+        return node.name.upper()
+    return None
+
+
+def _midnight(node):
+    """The day of a literal at midnight ('2019-03-01', '2019-03-01 00:00:00', cast or not), or None"""
+    if isinstance(node, exp.Cast) and (node.to.is_type('date') or node.to.is_type('timestamp')):
+        node = node.this
+    if not isinstance(node, exp.Literal) or not node.is_string:
+        return None
+    match = MIDNIGHT.match(node.this)
+    return match.group(1) if match else None
+
+
+def _day_bound(column):
+    """
+    TXN_DATE_TIME >= day / < day (either way round) as the same comparison on
+    the day column, or None
+    """
+    comparison = column.parent
+    if isinstance(comparison, exp.Paren):
+        return None
+    if isinstance(comparison, (exp.GTE, exp.LT)) and comparison.this is column:
+        day, operator = _midnight(comparison.expression), type(comparison)
+    elif isinstance(comparison, (exp.LTE, exp.GT)) and comparison.expression is column:
+        day, operator = _midnight(comparison.this), exp.GTE if isinstance(comparison, exp.LTE) else exp.LT
+    else:
+        return None
+    if day is None:
+        return None
+    return comparison, operator(this=_day_column(column), expression=exp.Literal.string(day))
+
+
+def _day_column(node):
+    column = node if isinstance(node, exp.Column) else node.this
+    return exp.Column(this=exp.to_identifier(DAY, quoted=True), table=column.args.get('table'))
+
+
+def _measure(aggregate, dialect, amount_type):
+    """
+    (replacement, dimension) of an aggregate: a replacement over the rollup's
+    measures with dimension None, or (None, dimension) when the aggregate
+    only reads a dimension and runs unchanged. None if no rollup answers it.
+    """
+    argument = aggregate.this
+    if isinstance(aggregate, exp.Count):
+        if isinstance(argument, exp.Distinct):
+            expressions = argument.expressions
+            dimension = _dimension(expressions[0], dialect) if len(expressions) == 1 else None
+            return (None, dimension) if dimension else None
+        if isinstance(argument, exp.Star) or (isinstance(argument, exp.Literal) and not argument.is_string):
+            measure = '"txn_count"'
+        elif isinstance(argument, exp.Column) and argument.name.upper() == AMOUNT_COLUMN:
+            measure = '"amt_count"'
+        else:
+            dimension = _dimension(argument, dialect)
+            if dimension is None:
+                return None
+            column = _day_column(argument) if dimension == DAY else argument.copy()
+            replacement = sqlglot.parse_one('CAST(COALESCE(SUM(CASE WHEN x IS NOT NULL THEN "txn_count" END), 0) AS BIGINT)',
+                                            read='postgres')
+            next(c for c in replacement.find_all(exp.Column) if c.name == 'x').replace(column)
+            return replacement, dimension
+        return sqlglot.parse_one(f'CAST(COALESCE(SUM({measure}), 0) AS BIGINT)', read='postgres'), None
+
+    if isinstance(aggregate, (exp.Min, exp.Max)) and not (isinstance(argument, exp.Column)
+                                                         and argument.name.upper() == AMOUNT_COLUMN):
+        dimension = _dimension(argument, dialect)
+        return (None, dimension) if dimension else None
+    if not isinstance(aggregate, (exp.Sum, exp.Avg, exp.Min, exp.Max)) or aggregate.args.get('expressions'):
+        return None
+    if not isinstance(argument, exp.Column) or argument.name.upper() != AMOUNT_COLUMN:
+        return None
+    if isinstance(aggregate, exp.Min):
+        return sqlglot.parse_one('MIN("amt_min")'), None
+    if isinstance(aggregate, exp.Max):
+        return sqlglot.parse_one('MAX("amt_max")'), None
+    # The sum of sums has the type of SUM(TXN_AMT) again (PostgreSQL widens bigint to numeric)
+    total = f'CAST(SUM("amt_sum") AS {amount_type})' if dialect == 'postgres' and amount_type else 'SUM("amt_sum")'
+    if isinstance(aggregate, exp.Sum):
+        return sqlglot.parse_one(total, read='postgres'), None
+    if dialect == 'postgres':
+        floating = amount_type in ('REAL', 'DOUBLE PRECISION', 'FLOAT')
+        total = f'CAST(SUM("amt_sum") AS {"DOUBLE PRECISION" if floating else "NUMERIC"})'
+    else:
+        # Integer division otherwise
+        total = 'SUM("amt_sum") * 1.0'
+    return exp.paren(sqlglot.parse_one(f'{total} / NULLIF(SUM("amt_count"), 0)', read='postgres')), None
+
+
+def _postgres_name(node):
+    """The column name PostgreSQL gives an unaliased select expression"""
+    if isinstance(node, exp.Column):
+        return node.name
+    if isinstance(node, exp.Cast):
+        return _postgres_name(node.this)
+    if isinstance(node, exp.Anonymous):
+        return node.name.lower()
+    if isinstance(node, exp.Func):
+        return node.sql_name().lower()
+    if isinstance(node, exp.Case):
+        return 'case'
+    if isinstance(node, exp.Paren):
+        return _postgres_name(node.this)
+    return '?column?'
+
+
+def _output_names(tree, sql, dialect):
+    """
+    Names to alias the unaliased select expressions with so the rewritten
+    query keeps its column names; None if they can't be known
+    """
+    names = []
+    for projection in tree.expressions:
+        if isinstance(projection, (exp.Alias, exp.Column)):
+            names.append(None)
+        elif dialect == 'postgres':
+            names.append(_postgres_name(projection))
+        else:
+            # SQLite names them after their text in the query
+            name = projection.sql(dialect=dialect)
+            if name not in sql:
+                return None
+            names.append(name)
+    return names
+
+
+@lru_cache(maxsize=1024)
+def rewrite(sql, base, rollups, columns, amount_type=None, dialect='postgres'):
+    """
+    (sql reading the first of rollups that answers it, that table), or None
+    if none gives the same answer as base.
+
+    rollups is ((table, dimensions), ...) in order of preference and columns
+    the lower-cased column names of base. A query is answered when it is a
+    single SELECT of base that groups (GROUP BY, aggregates or DISTINCT) by
+    dimensions only, filters on dimensions or whole days of TXN_DATE_TIME
+    (>= / < a date at midnight) only, and aggregates TXN_AMT with COUNT,
+    SUM, MIN, MAX and AVG, or dimensions with COUNT(DISTINCT), MIN and MAX.
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except sqlglot.errors.ParseError:
+        return None
+    if not isinstance(tree, exp.Select) or any(tree.args.get(clause) for clause in _UNSUPPORTED):
+        return None
+    source = tree.args.get('from')
+    if source is None or not isinstance(source.this, exp.Table) or source.this.name.lower() != base.lower():
+        return None
+    if any(select is not tree for select in tree.find_all(exp.Select)) or tree.find(exp.Window, exp.Subquery):
+        return None
+    if any(isinstance(projection, exp.Star) for projection in tree.expressions):
+        return None
+    aggregates = list(tree.find_all(exp.AggFunc))
+    # Without grouping each base row is an output row
+    if not (tree.args.get('group') or aggregates or tree.args.get('distinct')):
+        return None
+    names = _output_names(tree, sql, dialect)
+    if names is None:
+        return None
+
+    needed = set()
+    replacements = []
+    for aggregate in aggregates:
+        measure = _measure(aggregate, dialect, amount_type)
+        if measure is None:
+            return None
+        replacement, dimension = measure
+        if dimension:
+            needed.add(dimension)
+        if replacement is not None:
+            replacements.append((aggregate, replacement))
+
+    aliases = {projection.alias.lower() for projection in tree.expressions if isinstance(projection, exp.Alias)}
+    for column in tree.find_all(exp.Column):
+        aggregate = column.find_ancestor(exp.AggFunc)
+        if aggregate is not None:
+            # Dimension aggregates run unchanged, only their day expression is replaced
+            if _day_expression(column.parent, dialect) and not any(a is aggregate for a, _ in replacements):
+                replacements.append((column.parent, _day_column(column.parent)))
+            continue
+        dimension = _dimension(column.parent, dialect) or _dimension(column, dialect)
+        if dimension == DAY:
+            replacements.append((column.parent, _day_column(column.parent)))
+        elif dimension:
+            pass
+        elif column.name.upper() == DATE_COLUMN and column.find_ancestor(exp.Where) is not None:
+            bound = _day_bound(column)
+            if bound is None:
+                return None
+            dimension = DAY
+            replacements.append(bound)
+        elif (not column.table and column.name.lower() in aliases and column.name.lower() not in columns
+              and column.find_ancestor(exp.Where) is None):
+            # A select alias in GROUP BY / HAVING / ORDER BY
+            continue
+        else:
+            return None
+        needed.add(dimension)
+
+    for table, dimensions in rollups:
+        if needed <= set(dimensions):
+            break
+    else:
+        return None
+
+    for node, replacement in replacements:
+        node.replace(replacement)
+    for projection, name in zip(list(tree.expressions), names):
+        if name is not None:
+            projection.replace(exp.alias_(projection.copy(), name, quoted=True))
+    source_table = source.this
+    alias = source_table.args.get('alias') or exp.TableAlias(this=exp.to_identifier(source_table.name))
+    source_table.set('this', exp.to_identifier(table, quoted=True))
+    source_table.set('alias', alias)
+    return tree.sql(dialect=dialect), table
+
+
+class RollupManager:
+    """
+    Rollup tables of the transaction table (ROLLUPS) and the routing of
+    aggregate queries to them.
+
+    A full refresh rebuilds every rollup from the base table. Inserts through
+    functions.execute_sql / execute_batch are applied to the rollups in the
+    same transaction (the write hook), so they stay in step without a scan;
+    updates, deletes, imports and DDL schedule a full refresh in the
+    background, refresh_delay seconds later so a burst of writes shares one.
+    route only rewrites a query while the rollups match the base table's
+    current version stamp (functions.table_versions), so a change that
+    hasn't been applied yet sends queries to the base table rather than
+    giving a stale answer.
+
+    The version stamps only see writes made through this process. Writes
+    from elsewhere (psql, an ETL job, another server worker) are counted by
+    triggers on the base table, which refresh installs: rows inserted and
+    other changes go to a one-row counter table (rollup__<base>__changes).
+    route reads it once the last read is more than max_age seconds old and
+    sends queries to the base table until a refresh if it moved by more
+    than this process's own inserts, or the triggers are gone. Without the
+    triggers (e.g. no privilege to create them) the rollups are only used
+    for max_age seconds after each refresh. Rollups with more than
+    max_ratio of the base table's rows are not used, nor are any while the
+    base table has fewer than min_rows rows (scanning it is as fast).
+    """
+
+    def __init__(self, base='account_statement', db_name=functions.IMPORT_DB, refresh_delay=1.0, max_ratio=0.5,
+                 retry_after=60.0, max_age=5.0, min_rows=20000, enabled=True):
+        self.base = base
+        self.db_name = db_name
+        self.refresh_delay = refresh_delay
+        self.max_ratio = max_ratio
+        self.retry_after = retry_after
+        self.max_age = max_age
+        self.min_rows = min_rows
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._scheduled = False
+        self._failed_at = 0.0
+        # Version stamp of the base table the rollups match, None while stale
+        self.version = None
+        # table -> {"dimensions", "rows"}, empty until the first refresh
+        self.tables = {}
+        self._preference = ()
+        self._columns = frozenset()
+        self._date_type = None
+        self._amount_type = None
+        # The change counters the rollups match (None without the triggers), and when they were last read
+        self._probe_value = None
+        self.checked_at = None
+        self.base_rows = None
+        self.refreshed_at = None
+        self.refresh_seconds = None
+        self.refreshes = 0
+        self.deltas = 0
+        self.routed = {}
+        self.not_routable = 0
+        self.stale = 0
+        self.too_small = 0
+        self.changed_outside = 0
+        self.last_error = None
+
+    def _dialect(self, engine):
+        return 'postgres' if engine.dialect.name == 'postgresql' else engine.dialect.name
+
+    def _select(self, dimensions, columns, dialect):
+        expressions = []
+        for dimension in dimensions:
+            if dimension == DAY:
+                day = exp.cast(exp.column(columns[DATE_COLUMN], quoted=True), 'date').sql(dialect=dialect)
+                expressions.append((day, f'"{DAY}"'))
+            else:
+                expressions.append((f'"{columns[dimension]}"', f'"{columns[dimension]}"'))
+        amount = f'"{columns[AMOUNT_COLUMN]}"'
+        return (f'SELECT {", ".join(f"{e} AS {name}" for e, name in expressions)}, COUNT(*) AS "txn_count", '
+                f'COUNT({amount}) AS "amt_count", SUM({amount}) AS "amt_sum", MIN({amount}) AS "amt_min", '
+                f'MAX({amount}) AS "amt_max" FROM "{self.base}" GROUP BY {", ".join(e for e, _ in expressions)}')
+
+    def _triggers(self):
+        """Names of the counter table and of the triggers that keep it"""
+        changes = rollup_table(self.base, 'changes')
+        return changes, (f'{changes}_insert', f'{changes}_update', f'{changes}_delete')
+
+    def _install(self, engine):
+        """Create the change counter and its triggers on the base table unless they exist; False if that failed"""
+        changes, triggers = self._triggers()
+        try:
+            with engine.begin() as connection:
+                if self._probe(connection) is not None:
+                    return True
+                connection.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS "{changes}" ("inserted" BIGINT NOT NULL, '
+                                           f'"changed" BIGINT NOT NULL)')
+                connection.exec_driver_sql(f'INSERT INTO "{changes}" SELECT 0, 0 WHERE NOT EXISTS '
+                                           f'(SELECT 1 FROM "{changes}")')
+                for trigger in triggers:
+                    connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{trigger}"'
+                                               + (f' ON "{self.base}"' if connection.dialect.name == 'postgresql' else ''))
+                if connection.dialect.name == 'postgresql':
+                    # Once per statement: a bulk insert or COPY adds its row count in one update
+                    for trigger, column, count in [(triggers[0], 'inserted', '(SELECT COUNT(*) FROM "new_rows")'),
+                                                   (triggers[1], 'changed', '1')]:
+                        connection.exec_driver_sql(
+                            f'CREATE OR REPLACE FUNCTION "{trigger}"() RETURNS trigger LANGUAGE plpgsql AS '
+                            f'$$ BEGIN UPDATE "{changes}" SET "{column}" = "{column}" + {count}; RETURN NULL; END $$')
+                    connection.exec_driver_sql(f'CREATE TRIGGER "{triggers[0]}" AFTER INSERT ON "{self.base}" '
+                                               f'REFERENCING NEW TABLE AS "new_rows" FOR EACH STATEMENT '
+                                               f'EXECUTE FUNCTION "{triggers[0]}"()')
+                    connection.exec_driver_sql(f'CREATE TRIGGER "{triggers[1]}" AFTER UPDATE OR DELETE OR TRUNCATE '
+                                               f'ON "{self.base}" FOR EACH STATEMENT EXECUTE FUNCTION "{triggers[1]}"()')
+                else:
+                    # SQLite only has row triggers
+                    for trigger, event, column in zip(triggers, ('INSERT', 'UPDATE', 'DELETE'),
+                                                      ('inserted', 'changed', 'changed')):
+                        connection.exec_driver_sql(f'CREATE TRIGGER "{trigger}" AFTER {event} ON "{self.base}" '
+                                                   f'BEGIN UPDATE "{changes}" SET "{column}" = "{column}" + 1; END')
+            return True
+        except Exception as e:
+            print(f"Warning: could not install the change triggers on {self.base}: {str(e)}")
+            return False
+
+    def _probe(self, connection):
+        """The base table's change counters, None if its triggers or the counter table are missing"""
+        changes, triggers = self._triggers()
+        if connection.dialect.name == 'postgresql':
+            installed = ("SELECT COUNT(*) FROM pg_trigger WHERE tgrelid = to_regclass(:base) "
+                         "AND tgname IN (:t0, :t1)")
+            tables = "SELECT COUNT(*) FROM pg_class WHERE oid = to_regclass(:changes)"
+        else:
+            installed = ("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :name "
+                         "AND name IN (:t0, :t1, :t2)")
+            tables = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :name_changes"
+        params = {"base": f'"{self.base}"', "name": self.base, "changes": f'"{changes}"', "name_changes": changes,
+                  **{f"t{i}": trigger for i, trigger in enumerate(triggers)}}
+        expected = 2 if connection.dialect.name == 'postgresql' else 3
+        row = connection.execute(text(f"SELECT ({installed}), ({tables})"), params).one()
+        if row[0] != expected or not row[1]:
+            return None
+        row = connection.execute(text(f'SELECT "inserted", "changed" FROM "{changes}"')).one()
+        return {"inserted": row[0], "changed": row[1]}
+
+    def _check(self):
+        """Whether the base table is unchanged since the rollups were made, read at most every max_age seconds"""
+        with self._lock:
+            expected, checked_at = self._probe_value, self.checked_at
+        if checked_at is None or time.time() - checked_at <= self.max_age:
+            return True
+        if expected is None:
+            # No triggers to tell: the rollups expire
+            return False
+        now = time.time()
+        try:
+            with functions.get_engine(self.db_name).connect() as connection:
+                probe = self._probe(connection)
+        except Exception as e:
+            print(f"Warning: could not read the change counters of {self.base}: {str(e)}")
+            probe = None
+        with self._lock:
+            # Our own inserts may have moved the expected counters meanwhile
+            if probe is not None and probe == self._probe_value:
+                self.checked_at = now
+                return True
+            # Written to outside this process, or the counters are gone
+            self.version = None
+            self.changed_outside += 1
+        return False
+
+    def _drop(self, engine):
+        with engine.begin() as connection:
+            for suffix in list(ROLLUPS) + ['changes']:
+                connection.execute(text(f'DROP TABLE IF EXISTS "{rollup_table(self.base, suffix)}"'))
+
+    def refresh(self):
+        """Rebuild every rollup table from the base table; returns stats()"""
+        with self._refresh_lock:
+            engine = functions.get_engine(self.db_name)
+            dialect = self._dialect(engine)
+            # Taken first: a change committed during the rebuild leaves the rollups stale, never wrong
+            version = functions.table_versions({self.base.lower()}, self.db_name)
+            start = time.time()
+            with self._lock:
+                self.version = None
+            try:
+                base = functions.get_table(self.base, self.db_name)
+                columns = {column.name.upper(): column.name for column in base.columns}
+                missing = [name for name in COLUMNS + (DATE_COLUMN, AMOUNT_COLUMN) if name not in columns]
+                if missing:
+                    raise ValueError(f"Table '{self.base}' has no column {', '.join(missing)}")
+                installed = self._install(engine)
+                tables = {}
+                with engine.begin() as connection:
+                    if connection.dialect.name == 'sqlite':
+                        # pysqlite only opens a transaction before DML; readers must never miss a table
+                        connection.exec_driver_sql('BEGIN')
+                    # Taken first as well, for the same reason
+                    probed_at = time.time()
+                    probe = self._probe(connection) if installed else None
+                    for suffix, dimensions in ROLLUPS.items():
+                        table = rollup_table(self.base, suffix)
+                        connection.execute(text(f'DROP TABLE IF EXISTS "{table}"'))
+                        connection.execute(text(f'CREATE TABLE "{table}" AS {self._select(dimensions, columns, dialect)}'))
+                        rows = connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                        tables[table] = {"dimensions": dimensions, "rows": rows}
+                    base_rows = connection.execute(text(f'SELECT COUNT(*) FROM "{self.base}"')).scalar()
+                amount_type = None
+                if dialect == 'postgres':
+                    # Only PostgreSQL changes the type of a sum of sums; SQLite columns made by CREATE TABLE AS
+                    # have none
+                    amount = next(c for c in inspect(engine).get_columns(table) if c["name"] == 'amt_sum')["type"]
+                    amount_type = amount.compile(dialect=engine.dialect)
+            except Exception as e:
+                if isinstance(e, NoSuchTableError):
+                    # The base table was deleted
+                    self._drop(engine)
+                print(f"Warning: could not refresh the rollups of {self.base}: {str(e)}")
+                with self._lock:
+                    self.version = None
+                    self.tables = {}
+                    self._preference = ()
+                    self._failed_at = time.time()
+                    self.last_error = str(e)
+                return self.stats()
+
+            for table in tables:
+                functions.bump_table_version(table, self.db_name)
+            usable = [(table, info["dimensions"]) for table, info in tables.items()
+                      if info["rows"] <= max(base_rows, 1) * self.max_ratio]
+            with self._lock:
+                self.version = version
+                self.tables = tables
+                self._preference = tuple(sorted(usable, key=lambda item: tables[item[0]]["rows"]))
+                self._columns = frozenset(name.lower() for name in columns.values())
+                self._date_type = base.columns[columns[DATE_COLUMN]].type
+                self._amount_type = amount_type
+                self._probe_value = probe
+                self.checked_at = probed_at
+                self.base_rows = base_rows
+                self.refreshed_at = time.time()
+                self.refresh_seconds = time.time() - start
+                self.refreshes += 1
+                self.last_error = None
+            print(f"Refreshed {len(tables)} rollups of {self.base} ({base_rows} rows) in {time.time() - start:.2f}s")
+            return self.stats()
+
+    def schedule_refresh(self):
+        """Refresh in the background after refresh_delay seconds, unless one is already scheduled or running"""
+        with self._lock:
+            if not self.enabled or self._scheduled or time.time() - self._failed_at < self.retry_after:
+                return
+            if self._refresh_lock.locked():
+                # Its version and counters were taken first: a change made meanwhile leaves the rollups stale
+                # once it ends, and the next query schedules another
+                return
+            self._scheduled = True
+        threading.Thread(target=self._refresh_later, daemon=True).start()
+
+    def _refresh_later(self):
+        time.sleep(self.refresh_delay)
+        with self._lock:
+            self._scheduled = False
+        self.refresh()
+
+    def _groups(self, rows, base):
+        """{suffix: {key: [rows, amount count, sum, min, max]}} of inserted rows"""
+        table_columns = base.columns
+        columns = {column.name.upper(): column.name for column in table_columns}
+        groups = {suffix: {} for suffix in ROLLUPS}
+        for row in rows:
+            row = {name.upper(): value for name, value in row.items()}
+            amount = row.get(AMOUNT_COLUMN)
+            if isinstance(amount, str):
+                amount = float(amount) if amount.strip() else None
+            values = {}
+            for name in COLUMNS:
+                value = row.get(name)
+                if isinstance(value, str) and isinstance(table_columns[columns[name]].type, (Integer, Numeric, Float)):
+                    value = float(value) if isinstance(table_columns[columns[name]].type, (Numeric, Float)) else int(value)
+                values[name] = value
+            day = row.get(DATE_COLUMN)
+            if isinstance(day, str):
+                day = functions._bind_values(base, {columns[DATE_COLUMN]: day}, 'values')[columns[DATE_COLUMN]] if day else None
+            values[DAY] = day.strftime('%Y-%m-%d') if day is not None else None
+            for suffix, dimensions in ROLLUPS.items():
+                group = groups[suffix].setdefault(tuple(values[d] for d in dimensions), [0, 0, 0.0, None, None])
+                group[0] += 1
+                if amount is not None:
+                    group[1] += 1
+                    group[2] += amount
+                    group[3] = amount if group[3] is None else min(group[3], amount)
+                    group[4] = amount if group[4] is None else max(group[4], amount)
+        return groups
+
+    def _apply(self, connection, rows):
+        base = functions.get_table(self.base, self.db_name)
+        columns = {column.name.upper(): column.name for column in base.columns}
+        same = 'IS NOT DISTINCT FROM' if connection.dialect.name == 'postgresql' else 'IS'
+        for suffix, groups in self._groups(rows, base).items():
+            table = rollup_table(self.base, suffix)
+            dimensions = [f'"{DAY}"' if d == DAY else f'"{columns[d]}"' for d in ROLLUPS[suffix]]
+            where = ' AND '.join(f'{d} {same} :d{i}' for i, d in enumerate(dimensions))
+            update = text(
+                f'UPDATE "{table}" SET "txn_count" = "txn_count" + :count, "amt_count" = "amt_count" + :amt_count, '
+                f'"amt_sum" = CASE WHEN :amt_count = 0 THEN "amt_sum" ELSE COALESCE("amt_sum", 0) + :amt_sum END, '
+                f'"amt_min" = CASE WHEN "amt_min" IS NULL OR "amt_min" > :amt_min THEN :amt_min ELSE "amt_min" END, '
+                f'"amt_max" = CASE WHEN "amt_max" IS NULL OR "amt_max" < :amt_max THEN :amt_max ELSE "amt_max" END '
+                f'WHERE {where}')
+            insert = text(f'INSERT INTO "{table}" ({", ".join(dimensions)}, {", ".join(MEASURES)}) '
+                          f'VALUES ({", ".join(f":d{i}" for i in range(len(dimensions)))}, '
+                          f':count, :amt_count, :amt_sum, :amt_min, :amt_max)')
+            for key, (count, amt_count, amt_sum, amt_min, amt_max) in groups.items():
+                params = {f"d{i}": value for i, value in enumerate(key)}
+                params.update(count=count, amt_count=amt_count, amt_sum=amt_sum if amt_count else None,
+                              amt_min=amt_min, amt_max=amt_max)
+                # Two writers may both insert a group; duplicate groups add up to the same answers
+                if connection.execute(update, params).rowcount == 0:
+                    connection.execute(insert, params)
+
+    def on_write(self, connection, db_name, table_name, function, rows):
+        """functions.write_hooks hook: apply inserts to the rollups, refresh after anything else"""
+        if not self.enabled or db_name != self.db_name:
+            return None
+        if table_name is not None and table_name.lower() != self.base.lower():
+            return None
+        if function != 'insert' or not rows or not self.tables or not isinstance(self._date_type, (Date, DateTime)):
+            return lambda before, after: self.schedule_refresh()
+        try:
+            if connection.dialect.name == 'postgresql':
+                # A failed delta mustn't abort the write's transaction
+                with connection.begin_nested():
+                    self._apply(connection, rows)
+            else:
+                self._apply(connection, rows)
+        except Exception as e:
+            print(f"Warning: could not apply {len(rows)} inserted rows to the rollups: {str(e)}")
+            return lambda before, after: self.schedule_refresh()
+
+        def committed(before, after):
+            for table in self.tables:
+                functions.bump_table_version(table, self.db_name)
+            with self._lock:
+                if self.version is not None and self.version == before:
+                    self.version = after
+                    self.deltas += 1
+                    if self._probe_value is not None:
+                        # Our own inserts went through the triggers too
+                        self._probe_value = {**self._probe_value,
+                                             "inserted": self._probe_value["inserted"] + len(rows)}
+                    self.base_rows += len(rows)
+                    return
+            self.schedule_refresh()
+        return committed
+
+    def route(self, sql, dialect='postgres'):
+        """sql rewritten to read a rollup table when one gives the same answer, else sql unchanged"""
+        if not self.enabled or self.base.lower() not in sql.lower():
+            return sql
+        with self._lock:
+            version, preference = self.version, self._preference
+            columns, amount_type = self._columns, self._amount_type
+        if not self.tables:
+            self.schedule_refresh()
+            return sql
+        if self.base_rows is not None and self.base_rows < self.min_rows:
+            with self._lock:
+                self.too_small += 1
+            return sql
+        rewritten = rewrite(sql, self.base, preference, columns, amount_type, dialect)
+        if rewritten is None:
+            with self._lock:
+                self.not_routable += 1
+            return sql
+        if (version is None or version != functions.table_versions({self.base.lower()}, self.db_name)
+                or not self._check()):
+            with self._lock:
+                self.stale += 1
+            self.schedule_refresh()
+            return sql
+        with self._lock:
+            self.routed[rewritten[1]] = self.routed.get(rewritten[1], 0) + 1
+        return rewritten[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "base": self.base,
+                "current": self.version is not None
+                           and self.version == functions.table_versions({self.base.lower()}, self.db_name),
+                "base_rows": self.base_rows,
+                "min_rows": self.min_rows,
+                "max_age": self.max_age,
+                "checked_at": self.checked_at,
+                "tables": {table: {"dimensions": list(info["dimensions"]), "rows": info["rows"],
+                                   "used": any(table == t for t, _ in self._preference)}
+                           for table, info in self.tables.items()},
+                "refreshes": self.refreshes,
+                "refreshed_at": self.refreshed_at,
+                "refresh_seconds": self.refresh_seconds,
+                "deltas": self.deltas,
+                "routed": dict(self.routed),
+                "not_routable": self.not_routable,
+                "stale": self.stale,
+                "too_small": self.too_small,
+                "changed_outside": self.changed_outside,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,149 @@
+from langchain_community.vectorstores import FAISS
+from sqlalchemy import Date, DateTime, Integer, Numeric, Float, String, Text, text
+import threading
+import time
+import os
+import functions
+import rollups
+
+# Tables described in the prompt per question; with this many tables or fewer
+# every table is included and no embedding is needed
+CONTEXT_TABLES = int(os.environ.get('SCHEMA_CONTEXT_TABLES', 3))
+# Statistics come from the first SAMPLE_ROWS rows of each table
+SAMPLE_ROWS = int(os.environ.get('SCHEMA_CONTEXT_SAMPLE_ROWS', 10000))
+# Text columns with at most MAX_DISTINCT values in the sample list SHOW_VALUES of them
+MAX_DISTINCT = 20
+SHOW_VALUES = 6
+
+# {"version", "db_name", "tables", "contexts": {table: text}, "index": FAISS or None}
+_store = None
+_lock = threading.Lock()
+
+
+def _row_count(connection, engine, table_name):
+    if engine.dialect.name == 'postgresql':
+        # Planner estimate; exact counts are a full scan on large tables
+        estimate = connection.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"), {"name": f'"{table_name}"'}).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return connection.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+
+
+def _short(value):
+    if isinstance(value, float):
+        return f"{value:g}"
+    value = str(value)
+    return value[:-7] if value.endswith('.000000') else value
+
+
+def _column_note(connection, table_name, column):
+    sample = f'(SELECT "{column.name}" AS value FROM "{table_name}" LIMIT {SAMPLE_ROWS}) AS sample'
+    if isinstance(column.type, (String, Text)):
+        values = connection.execute(text(
+            f'SELECT value FROM {sample} WHERE value IS NOT NULL GROUP BY value '
+            f'ORDER BY COUNT(*) DESC LIMIT {MAX_DISTINCT + 1}')).scalars().all()
+        if not values or len(values) > MAX_DISTINCT:
+            return ""
+        shown = ", ".join(f"'{value}'" for value in values[:SHOW_VALUES])
+        return f"values: {shown}{', ...' if len(values) > SHOW_VALUES else ''}"
+    if isinstance(column.type, (Date, DateTime, Integer, Numeric, Float)):
+        low, high = connection.execute(text(f'SELECT MIN(value), MAX(value) FROM {sample}')).one()
+        if low is not None:
+            return f"{_short(low)} .. {_short(high)}"
+    return ""
+
+
+def describe_table(table_name, db_name=functions.IMPORT_DB):
+    """Compact description of a table: row count, column types and representative values"""
+    engine = functions.get_engine(db_name)
+    table = functions.get_table(table_name, db_name)
+    lines = []
+    with engine.connect() as connection:
+        rows = _row_count(connection, engine, table_name)
+        lines.append(f"Table: {table_name} (~{rows:,} rows)")
+        for column in table.columns:
+            try:
+                note = _column_note(connection, table_name, column)
+            except Exception:
+                connection.rollback()
+                note = ""
+            column_type = column.type.compile(dialect=engine.dialect)
+            lines.append(f'  "{column.name}" {column_type}' + (f"  -- {note}" if note else ""))
+    return "\n".join(lines)
+
+
+def _index(contexts, embedding):
+    if len(contexts) <= CONTEXT_TABLES or embedding is None:
+        return None
+    names = list(contexts)
+    return FAISS.from_texts([contexts[name] for name in names], embedding,
+                            metadatas=[{"table": name} for name in names])
+
+
+def _table_names(db_name):
+    # The rollup tables are an implementation detail of ai.fetch
+    return {name for name in functions.get_table_names(db_name) if not rollups.is_rollup(name)}
+
+
+def _build(db_name, embedding):
+    start = time.time()
+    version = functions.schema_version()
+    tables = _table_names(db_name)
+    contexts = {}
+    for table_name in sorted(tables):
+        try:
+            contexts[table_name] = describe_table(table_name, db_name)
+        except Exception as e:
+            print(f"Warning: could not describe table {table_name}: {str(e)}")
+    index = _index(contexts, embedding)
+    print(f"Schema context for {len(contexts)} tables built in {time.time() - start:.2f}s")
+    return {"version": version, "db_name": db_name, "tables": tables, "contexts": contexts, "index": index}
+
+
+def _stale(store, db_name):
+    return (store is None or store["db_name"] != db_name or store["version"] != functions.schema_version()
+            or store["tables"] != _table_names(db_name))
+
+
+def get_store(embedding=None, db_name=functions.IMPORT_DB):
+    """
+    The schema context of every table in db_name, rebuilt when the schema
+    version or the set of tables changes (imports, deletes, custom DDL).
+    """
+    global _store
+    store = _store
+    if _stale(store, db_name) or (store["index"] is None and _index_needed(store, embedding)):
+        with _lock:
+            store = _store
+            if _stale(store, db_name):
+                store = _store = _build(db_name, embedding)
+            elif store["index"] is None and _index_needed(store, embedding):
+                # Built before an embedding was available
+                store = _store = {**store, "index": _index(store["contexts"], embedding)}
+    return store
+
+
+def _index_needed(store, embedding):
+    return embedding is not None and len(store["contexts"]) > CONTEXT_TABLES
+
+
+def select_tables(question, embedding=None, k=CONTEXT_TABLES, db_name=functions.IMPORT_DB):
+    """Names of the k tables most relevant to the question (all of them if there are at most k)"""
+    store = get_store(embedding, db_name)
+    if store["index"] is None:
+        return list(store["contexts"])
+    docs = store["index"].similarity_search(question, k=k)
+    return [doc.metadata["table"] for doc in docs]
+
+
+def table_info(question, embedding=None, k=CONTEXT_TABLES, db_name=functions.IMPORT_DB):
+    """Schema context for the prompt: the descriptions of the tables selected for the question"""
+    store = get_store(embedding, db_name)
+    return "\n\n".join(store["contexts"][name] for name in select_tables(question, embedding, k, db_name))
+
+
+def invalidate():
+    global _store
+    with _lock:
+        _store = None
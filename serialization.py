@@ -0,0 +1,56 @@
+from fastapi.responses import JSONResponse
+from decimal import Decimal
+import orjson
+
+# Row layouts of a JSON result:
+#   records - {"data": [{column: value, ...}, ...], "columns": [...]}
+#   compact - {"columns": [...], "rows": [[value, ...], ...]}
+ROW_FORMATS = ("records", "compact")
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    # orjson handles str/int/float/bool/None, dates and times, UUIDs, numpy
+    # and containers natively; everything else comes through here
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', 'replace')
+    if hasattr(value, '_tuple'):
+        # SQLAlchemy Row
+        return value._tuple()
+    return str(value)
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=_default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson; return it directly to skip FastAPI's jsonable_encoder"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def rows_payload(columns, rows, row_format="records"):
+    """The rows of a result in the requested layout, serialized straight from the DB rows"""
+    columns = list(columns)
+    if row_format == "compact":
+        return {"columns": columns, "rows": [tuple(row) for row in rows]}
+    return {"data": [dict(zip(columns, row)) for row in rows], "columns": columns}
+
+
+def ndjson_lines(columns, rows, row_format="records"):
+    """One NDJSON line per row (an object, or an array for compact), joined per batch"""
+    if row_format == "compact":
+        return b"".join(dumps(tuple(row)) + b"\n" for row in rows)
+    return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def json_items(columns, rows, row_format="records"):
+    """Rows of a batch as comma-separated JSON array items"""
+    if row_format == "compact":
+        return dumps([tuple(row) for row in rows])[1:-1]
+    return dumps([dict(zip(columns, row)) for row in rows])[1:-1]
@@ -0,0 +1,273 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter as MetricCounter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+
+# Per-request spans. A Trace is opened around a request with trace(); the
+# pipeline stages record spans into it with span(), the LangChain callbacks
+# (StageTracer) and the SQLAlchemy events below. The context variables follow
+# the request into asyncio tasks and threadpool workers. Metrics are recorded
+# for every request, traced or not.
+_trace = contextvars.ContextVar('trace', default=None)
+_parent = contextvars.ContextVar('trace_parent', default=None)
+
+# Requests may ask for a sampling profile of their run (profile=true) when
+# PROFILING_ENABLED=1; off by default since the profile samples every thread
+# (other requests' stacks included) and costs CPU while the request runs
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_TOP = 25
+# Statements longer than this are cut in db spans
+STATEMENT_CHARS = 200
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram('pipeline_stage_seconds', 'Duration of a query pipeline stage', ['stage'],
+                          buckets=SECONDS_BUCKETS)
+LLM_TOKENS_PER_SECOND = Histogram('llm_tokens_per_second', 'Generated tokens per second of one LLM call',
+                                  buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500))
+AGENT_ITERATIONS = Histogram('agent_iterations', 'Agent iterations (LLM rounds) per question',
+                             buckets=(1, 2, 3, 4, 5, 10))
+DB_SECONDS = Histogram('db_statement_seconds', 'Duration of one database statement', buckets=SECONDS_BUCKETS)
+ROWS_RETURNED = Histogram('query_rows_returned', 'Rows returned to the client per query',
+                          buckets=(0, 1, 10, 100, 1000, 10000, 100000, 1000000))
+QUESTIONS_ANSWERED = MetricCounter('questions_answered', 'Questions answered, by path (cache, fast_path, agent)',
+                                   ['path'])
+
+
+class Trace:
+    def __init__(self, profile=False):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.profiler = SamplingProfiler() if profile and PROFILING_ENABLED else None
+
+    def add(self, name, start, end, parent=None, **attrs):
+        self.spans.append({
+            "name": name,
+            "parent": parent,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            **attrs,
+        })
+
+    def to_dict(self):
+        result = {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+        if self.profiler is not None:
+            result["profile"] = self.profiler.result()
+        return result
+
+
+@contextlib.contextmanager
+def trace(profile=False):
+    """Collect the spans of everything run inside (and in the tasks and threads it starts)"""
+    current = Trace(profile)
+    token = _trace.set(current)
+    if current.profiler is not None:
+        current.profiler.start()
+    try:
+        yield current
+    finally:
+        if current.profiler is not None:
+            current.profiler.stop()
+        _trace.reset(token)
+
+
+def current():
+    return _trace.get()
+
+
+def _record(name, start, end, **attrs):
+    current = _trace.get()
+    if current is not None:
+        current.add(name, start, end, _parent.get(), **attrs)
+
+
+@contextlib.contextmanager
+def span(stage, **attrs):
+    """Time a pipeline stage; attrs added to the dict yielded are stored with the span"""
+    start = time.perf_counter()
+    token = _parent.set(stage)
+    try:
+        yield attrs
+    finally:
+        _parent.reset(token)
+        end = time.perf_counter()
+        STAGE_SECONDS.labels(stage).observe(end - start)
+        _record(stage, start, end, **attrs)
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus exposition of every metric"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class StageTracer(BaseCallbackHandler):
+    """
+    LangChain callbacks for one agent run: spans for prompt formatting
+    (including the few-shot example selection), every LLM call and every
+    tool call, and the number of agent iterations.
+    """
+
+    # Called on the caller's task/thread, so the context variables apply
+    run_inline = True
+
+    def __init__(self):
+        self.iterations = 0
+        self._runs = {}
+
+    def _start(self, run_id, name, **attrs):
+        self._runs[run_id] = (name, time.perf_counter(), _parent.get(), attrs)
+
+    def _end(self, run_id, **attrs):
+        entry = self._runs.pop(run_id, None)
+        if entry is None:
+            return
+        name, start, parent, start_attrs = entry
+        end = time.perf_counter()
+        STAGE_SECONDS.labels(name).observe(end - start)
+        current = _trace.get()
+        if current is not None:
+            current.add(name, start, end, parent, **start_attrs, **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or ""
+        if name.endswith("PromptTemplate"):
+            self._start(run_id, "prompt")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        # ScheduledLLM's span includes the wait in the LLM queue; the wrapped
+        # model's own call (same callbacks) is the generation itself
+        scheduled = ((serialized or {}).get("id") or [""])[-1] == "ScheduledLLM"
+        self._start(run_id, "llm.scheduled" if scheduled else "llm", prompt_chars=sum(len(p) for p in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        info = {}
+        for generations in response.generations:
+            for generation in generations:
+                info.update(generation.generation_info or {})
+        attrs = {key: info[key] for key in ("prompt_eval_count", "eval_count") if key in info}
+        self._end(run_id, **attrs)
+        # Ollama reports the generated tokens and the time it spent generating them
+        if info.get("eval_count") and info.get("eval_duration"):
+            LLM_TOKENS_PER_SECOND.observe(info["eval_count"] / (info["eval_duration"] / 1e9))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"tool:{(serialized or {}).get('name') or kwargs.get('name') or 'tool'}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_agent_action(self, action, *, run_id, **kwargs):
+        self.iterations += 1
+
+    def on_agent_finish(self, finish, *, run_id, **kwargs):
+        self.iterations += 1
+        AGENT_ITERATIONS.observe(self.iterations)
+
+
+# Every statement on every engine: DB time metric and a "db" span
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("trace_starts", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("trace_starts")
+    if not starts:
+        return
+    start = starts.pop()
+    end = time.perf_counter()
+    DB_SECONDS.observe(end - start)
+    if _trace.get() is not None:
+        _record("db", start, end, statement=" ".join(statement.split())[:STATEMENT_CHARS],
+                rowcount=cursor.rowcount)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start so
+    # the list doesn't grow on pooled connections
+    connection = context.connection
+    starts = connection.info.get("trace_starts") if connection is not None and context.statement else None
+    if not starts:
+        return
+    start = starts.pop()
+    end = time.perf_counter()
+    DB_SECONDS.observe(end - start)
+    if _trace.get() is not None:
+        _record("db", start, end, statement=" ".join(context.statement.split())[:STATEMENT_CHARS],
+                error=type(context.original_exception).__name__)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads every PROFILE_INTERVAL seconds
+    while a traced request runs. Stacks of idle threads are skipped; work of
+    other requests running at the same time is included.
+    """
+
+    IDLE = {"wait", "select", "poll", "_worker", "serve_forever", "_run_once"}
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_name in self.IDLE:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def result(self):
+        """Samples per function (inclusive) and the most frequent stacks, in collapsed (flame graph) format"""
+        functions = Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack.split(";")):
+                functions[function] += count
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "functions": [{"function": f, "samples": n} for f, n in functions.most_common(PROFILE_TOP)],
+            "stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(PROFILE_TOP)],
+        }